@@ -0,0 +1,4 @@
+"""Microbenchmarks for QuoteApp hot paths. Run from the repo root, e.g.
+
+    python -m benchmarks.bench_resolvers
+"""
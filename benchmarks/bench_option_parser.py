@@ -0,0 +1,61 @@
+"""Option parsing: parse_options vs the original regex-only version.
+
+parse_options keeps the regex for question-sized text and switches to the
+linear scanner for long text or a long whitespace run, where the regex goes
+quadratic. The
+randomized parity check between the two lives in tests/test_display_builder.py.
+"""
+
+from __future__ import annotations
+
+import re
+import timeit
+
+from src.app.services.display_builder import parse_options
+
+_LEGACY_OPTION_RE = re.compile(
+    r"(?:^|[\s,;])\s*([A-Z])\s*[).\-]\s*(.+?)(?=\s+[A-Z]\s*[).\-]\s|[,;]\s*[A-Z]\s*[).\-]|\n\s*[A-Z]\s*[).\-]|$)",
+    re.DOTALL,
+)
+
+def _legacy_parse_options(text: str) -> list[dict[str, str]]:
+    matches = _LEGACY_OPTION_RE.findall(text)
+    if not matches:
+        return []
+    for i, (letter, _) in enumerate(matches):
+        if letter != chr(ord("A") + i):
+            return []
+    options = []
+    for letter, label in matches:
+        label = label.strip().rstrip(",")
+        value = re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+        options.append({"key": letter, "label": label, "value": value})
+    return options
+
+
+def main() -> None:
+    typical = (
+        "Which product are you interested in?\n"
+        "A) R-Blade\nB) R-Breeze\nC) K-Bana\nD) X-Blast\nE) Sky-Tilt\nF) Kitchens"
+    )
+    cases = {
+        "typical": typical,
+        "short prose": ("The louvers rotate. " * 20) + "\nA) Yes\nB) No",
+        "long prose": ("The louvers rotate. " * 400) + "\nA) Yes\nB) No",
+        "short whitespace run": "A) x" + " " * 200 + "y",
+        "whitespace run": "A) x" + " " * 5000 + "y",
+        "marker soup": "A) " + "B . " * 2000,
+    }
+    for name, text in cases.items():
+        assert parse_options(text) == _legacy_parse_options(text), name
+        number = 2000 if len(text) < 1000 else 5
+        legacy = min(timeit.repeat(lambda: _legacy_parse_options(text), number=number, repeat=3))
+        current = min(timeit.repeat(lambda: parse_options(text), number=number, repeat=3))
+        print(
+            f"{name:>15} ({len(text):5d} chars): "
+            f"regex only {legacy / number * 1e6:10.1f} µs   parse_options {current / number * 1e6:8.1f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Variable resolution across all registered gates: compiled vs per-call lookup."""
+
+from __future__ import annotations
+
+import json
+import timeit
+
+from src.app.config import settings
+from src.app.gates.registry import DEFAULT_GATE_SEQUENCE, GATE_REGISTRY
+from src.app.gates.session_state import SessionState
+from src.app.services.orchestrator import orchestrator
+
+ROUNDS = 2000
+
+
+def _late_gate_session() -> SessionState:
+    session = SessionState(current_gate=16)
+    session.product_config.update({
+        "product_id": "r_blade",
+        "state": "FL",
+        "total_bays": 2,
+        "structure_type": "freestanding",
+        "quote_summary": {"product": "r_blade", "bays": 2},
+        "gate_2_response": '{"status":"ok","width_ft_assumed":14}',
+        "gate_3_response": '{"status":"ok","total_bays":2}',
+        "bay_logic_context": '{"PRODUCT_ID":"r_blade"}',
+    })
+    return session
+
+
+def _legacy_resolve(gate, session) -> dict[str, str]:
+    var_map: dict[str, str] = {}
+    for var_name, source_key in gate.variables_template.items():
+        if hasattr(settings, source_key):
+            var_map[var_name] = getattr(settings, source_key)
+        elif source_key == "quote_context":
+            summary = session.product_config.get("quote_summary")
+            var_map[var_name] = json.dumps(summary, separators=(",", ":")) if summary else ""
+        elif source_key in session.product_config:
+            var_map[var_name] = str(session.product_config[source_key])
+        else:
+            var_map[var_name] = ""
+    return var_map
+
+
+def main() -> None:
+    session = _late_gate_session()
+    gates = [GATE_REGISTRY[n] for n in DEFAULT_GATE_SEQUENCE]
+    orchestrator.compile()
+
+    for gate in gates:
+        assert orchestrator.resolve_variables(gate, session) == _legacy_resolve(gate, session)
+
+    def compiled():
+        for gate in gates:
+            orchestrator.resolve_variables(gate, session)
+
+    def legacy():
+        for gate in gates:
+            _legacy_resolve(gate, session)
+
+    for name, fn in (("legacy", legacy), ("compiled", compiled)):
+        best = min(timeit.repeat(fn, number=ROUNDS, repeat=5))
+        print(f"{name:>9}: {best / ROUNDS * 1e6:8.2f} µs per {len(gates)}-gate pass")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""SessionState serialization and advancement on a realistic late-gate session."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import timeit
+
+from src.app.gates.registry import DEFAULT_GATE_SEQUENCE
+from src.app.gates.session_state import SessionState
+
+ROUNDS = 5000
+
+
+def _late_gate_session() -> SessionState:
+    """A session at Gate 16 with every earlier gate's data collected."""
+    session = SessionState(current_gate=16)
+    pc = session.product_config
+    pc.update({
+        "product_id": "r_blade",
+        "product_name": "R-Blade",
+        "state": "FL",
+        "width_ft_assumed": 14,
+        "length_ft_assumed": 20,
+        "width_ft_confirmed": 14,
+        "length_ft_confirmed": 20,
+        "comparison_mode": False,
+        "option_keep": {"width_ft": 14, "length_ft": 20, "bays": 2},
+        "option_swap": {"width_ft": 20, "length_ft": 14, "bays": 1},
+        "total_bays": 2,
+        "structure_type": "freestanding",
+    })
+    for number in DEFAULT_GATE_SEQUENCE[: DEFAULT_GATE_SEQUENCE.index(16)]:
+        response = {
+            "status": "ok",
+            "result_single": {f"gate_{number}_choice": "standard", "price": 1250.0},
+            "notes": ["customer confirmed"] * 3,
+        }
+        pc[f"gate_{number}_response"] = json.dumps(response)
+        session.line_items.append({"gate": number, "sku": f"SKU-{number}", "qty": 1, "price": 1250.0})
+        session.subtotals_by_gate[str(number)] = 1250.0
+    return session
+
+
+def _legacy_to_dict(session: SessionState) -> dict:
+    """The previous serializer: a deep copy of every field."""
+    data = dataclasses.asdict(session)
+    for field in dataclasses.fields(SessionState):
+        if not field.init:
+            data.pop(field.name)
+    return data
+
+
+def main() -> None:
+    session = _late_gate_session()
+    blob = json.dumps(session.to_dict())
+    data = json.loads(blob)
+    assert SessionState.from_dict(data).to_dict() == _legacy_to_dict(session)
+
+    cases = {
+        "asdict (old to_dict)": lambda: _legacy_to_dict(session),
+        "to_dict": session.to_dict,
+        "from_dict": lambda: SessionState.from_dict(data),
+        "save: json.dumps(to_dict)": lambda: json.dumps(session.to_dict()),
+        "load: from_dict(json.loads)": lambda: SessionState.from_dict(json.loads(blob)),
+        "next_gate": session.next_gate,
+    }
+    print(f"session blob: {len(blob)} bytes")
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=ROUNDS, repeat=5))
+        print(f"{name:>28}: {best / ROUNDS * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,15 +20,20 @@ echo "==> Installing/updating dependencies..."
 echo "==> Restarting service..."
 systemctl restart quoteapp
 
-echo "==> Waiting for service to start..."
-sleep 2
-
-echo "==> Health check..."
-HTTP_CODE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost:8000/api/v1/health)
+echo "==> Readiness check..."
+# /health/ready checks DB latency, event-loop lag and executor backlog;
+# give the service up to ~30s to come up and settle
+HTTP_CODE="000"
+for _ in $(seq 1 15); do
+    sleep 2
+    HTTP_CODE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost:8000/api/v1/health/ready || true)
+    [ "${HTTP_CODE}" = "200" ] && break
+done
 if [ "${HTTP_CODE}" = "200" ]; then
-    echo "    OK — health endpoint returned 200"
+    echo "    OK — readiness endpoint returned 200"
 else
-    echo "    WARNING — health endpoint returned ${HTTP_CODE}"
+    echo "    WARNING — readiness endpoint returned ${HTTP_CODE}"
+    echo "    Details: curl -s http://localhost:8000/api/v1/health/ready"
     echo "    Check logs: journalctl -u quoteapp -n 50 --no-pager"
     exit 1
 fi
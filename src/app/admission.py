@@ -0,0 +1,195 @@
+"""Admission control and per-client rate limiting.
+
+Turn requests (message send / stream) are shed with 429 + Retry-After when
+the process is already saturated, instead of queueing on executor threads
+and SQLite until the proxy times out: too many turns in flight, too many
+OpenAI calls outstanding, or an event loop lagging behind. A turn counts
+as in flight until its response starts and, when it carries on after that
+(a resumable stream, a deferred gate chain), until that work finishes.
+Independently, every POST that names a ``client_id`` draws from that
+client's token bucket. POST bodies are buffered here, before auth, so
+their size is capped first.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import time
+from typing import Any, Optional
+
+from . import metrics
+from .config import settings
+from .services import openai_service
+from .services.stream_registry import stream_registry
+from .services.task_supervisor import task_supervisor
+from .watchdog import loop_lag
+
+_TURN_PATH = re.compile(r"^/api/v1/conversations/[^/]+/messages(?:/stream)?/?$")
+_MAX_BUCKETS = 10_000
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+# ── Token buckets ───────────────────────────────────────────────────
+
+class TokenBuckets:
+    def __init__(self) -> None:
+        self._buckets: dict[str, tuple[float, float]] = {}   # key → (tokens, updated)
+
+    def take(self, key: str) -> float:
+        """Take one token for `key`; returns 0, or the seconds until one is available."""
+        rate = settings.rate_limit_per_minute / 60.0
+        burst = float(settings.rate_limit_burst)
+        if rate <= 0 or burst <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            return (1.0 - tokens) / rate
+        if len(self._buckets) >= _MAX_BUCKETS and key not in self._buckets:
+            self._prune(now, rate, burst)
+        self._buckets[key] = (tokens - 1.0, now)
+        return 0.0
+
+    def _prune(self, now: float, rate: float, burst: float) -> None:
+        """Forget buckets that have refilled completely (equivalent to new ones)."""
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+
+# ── Middleware ──────────────────────────────────────────────────────
+
+def _overload_reason() -> Optional[str]:
+    if 0 < settings.admission_max_loop_lag_ms <= loop_lag.current_lag * 1000:
+        return "Server is busy (event loop lagging)"
+    if 0 < settings.admission_max_llm_inflight <= openai_service.inflight_calls():
+        return "Server is busy (too many model calls in progress)"
+    return None
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware so streamed responses pass through untouched."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self.buckets = TokenBuckets()
+        self.inflight_turns = 0     # admitted turns whose response has not started
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            body, receive = await self._buffer_body(scope, receive)
+        except _BodyTooLarge:
+            await self._reject(send, "payload_too_large", "Request body is too large", status=413)
+            return
+        client = self._client_key(scope, body)
+        if client is not None:
+            wait = self.buckets.take(client)
+            if wait > 0:
+                await self._reject(send, "rate_limited", "Rate limit exceeded", wait)
+                return
+
+        if not _TURN_PATH.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        reason = _overload_reason()
+        if reason is None and 0 < settings.admission_max_inflight_turns <= self.turns_in_progress():
+            reason = "Server is busy (too many turns in progress)"
+        if reason is not None:
+            await self._reject(send, "overloaded", reason, settings.admission_retry_after_seconds)
+            return
+
+        # From the response start on, a turn that is still running is
+        # counted by the stream registry or the task supervisor instead
+        responding = False
+
+        async def counted_send(message: dict) -> None:
+            nonlocal responding
+            if message["type"] == "http.response.start" and not responding:
+                responding = True
+                self.inflight_turns -= 1
+            await send(message)
+
+        self.inflight_turns += 1
+        metrics.TURNS_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, counted_send)
+        finally:
+            if not responding:
+                self.inflight_turns -= 1
+            metrics.TURNS_INFLIGHT.dec()
+
+    def turns_in_progress(self) -> int:
+        return self.inflight_turns + stream_registry.running() + task_supervisor.running()
+
+    @staticmethod
+    async def _buffer_body(scope: dict, receive: Any) -> tuple[bytes, Any]:
+        """Read the request body and return a receive() that replays it.
+
+        Raises _BodyTooLarge, without reading further, once the body is
+        known to exceed ``admission_max_body_bytes``.
+        """
+        limit = settings.admission_max_body_bytes
+        if limit > 0:
+            for name, value in scope.get("headers", []):
+                if name == b"content-length" and value.isdigit() and int(value) > limit:
+                    raise _BodyTooLarge
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away before sending the body; let the app see it
+                pending = [message]
+                break
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if 0 < limit < size:
+                raise _BodyTooLarge
+            if not message.get("more_body", False):
+                pending = []
+                break
+        body = b"".join(chunks)
+        replay = [{"type": "http.request", "body": body, "more_body": False}, *pending]
+
+        async def replay_receive() -> dict:
+            if replay:
+                return replay.pop(0)
+            return await receive()
+
+        return body, replay_receive
+
+    @staticmethod
+    def _client_key(scope: dict, body: bytes) -> Optional[str]:
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            return None
+        if isinstance(payload, dict) and payload.get("client_id") is not None:
+            return f"client:{payload['client_id']}"
+        return None
+
+    @staticmethod
+    async def _reject(
+        send: Any, code: str, message: str, retry_after: Optional[float] = None, status: int = 429,
+    ) -> None:
+        body = json.dumps({"error": {"code": code, "message": message}}).encode("utf-8")
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+        ]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -2,21 +2,94 @@
 
 from __future__ import annotations
 
-from fastapi import Depends, HTTPException, status
+import hmac
+import secrets
+import time
+
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from .config import settings
+from .database import get_db_connection
 
 _scheme = HTTPBearer()
 
 
+def _token_equals(given: str, expected: str) -> bool:
+    """Constant-time comparison, so response timing reveals nothing of the token."""
+    return hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
 async def require_bearer_token(
     credentials: HTTPAuthorizationCredentials = Depends(_scheme),
 ) -> str:
     """Validate Bearer token and return it."""
-    if credentials.credentials != settings.bearer_token:
+    if not _token_equals(credentials.credentials, settings.bearer_token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={"error": {"code": "unauthorized", "message": "Invalid or missing bearer token"}},
         )
     return credentials.credentials
+
+
+async def require_admin_token(
+    credentials: HTTPAuthorizationCredentials = Depends(_scheme),
+) -> str:
+    """Validate the admin Bearer token (ADMIN_TOKEN, or BEARER_TOKEN if unset)."""
+    expected = settings.admin_token or settings.bearer_token
+    if not _token_equals(credentials.credentials, expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={"error": {"code": "unauthorized", "message": "Invalid or missing admin token"}},
+        )
+    return credentials.credentials
+
+
+# ── WebSocket tickets ───────────────────────────────────────────────
+#
+# Browsers cannot set headers on WebSocket upgrades, and a bearer token in
+# the URL ends up in access logs. A browser instead POSTs (with the bearer
+# token) for a ticket: random, bound to one conversation, valid for a few
+# seconds and redeemable once. Tickets live in the database so any worker
+# can redeem one another worker issued.
+
+
+async def issue_websocket_ticket(conversation_id: str) -> str:
+    ticket = secrets.token_urlsafe(32)
+    now = time.time()
+    async with get_db_connection() as db:
+        await db.execute("DELETE FROM websocket_tickets WHERE expires_at < ?", (now,))
+        await db.execute(
+            "INSERT INTO websocket_tickets (ticket, conversation_id, expires_at) VALUES (?, ?, ?)",
+            (ticket, conversation_id, now + settings.websocket_ticket_ttl_seconds),
+        )
+        await db.commit()
+    return ticket
+
+
+async def _redeem_websocket_ticket(ticket: str, conversation_id: str) -> bool:
+    async with get_db_connection() as db:
+        cursor = await db.execute(
+            "DELETE FROM websocket_tickets WHERE ticket = ? RETURNING conversation_id, expires_at",
+            (ticket,),
+        )
+        row = await cursor.fetchone()
+        await db.commit()
+    return (
+        row is not None
+        and row["conversation_id"] == conversation_id
+        and row["expires_at"] >= time.time()
+    )
+
+
+async def websocket_authorized(websocket: WebSocket, conversation_id: str) -> bool:
+    """Accept a bearer token in the Authorization header or a ``?ticket=``
+    issued for this conversation (see `issue_websocket_ticket`)."""
+    header = websocket.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return _token_equals(token, settings.bearer_token)
+    ticket = websocket.query_params.get("ticket")
+    if not ticket:
+        return False
+    return await _redeem_websocket_ticket(ticket, conversation_id)
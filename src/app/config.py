@@ -16,6 +16,7 @@ class AppSettings(BaseSettings):
 
     # Auth
     bearer_token: str = "changeme"
+    admin_token: Optional[str] = None     # admin endpoints; falls back to bearer_token
 
     # OpenAI
     api_key: Optional[str] = None
@@ -182,9 +183,102 @@ class AppSettings(BaseSettings):
     )
     openai_prompt_version: str = "5"
 
+    # Hot-reloadable gate registry (JSON, see gates/registry.parse_registry)
+    gate_registry_file: Optional[str] = None
+    gate_registry_poll_seconds: float = 5.0
+
+    # Gate scheduling — prefetch upcoming gates whose inputs are satisfied
+    gate_prefetch_enabled: bool = False
+    gate_prefetch_window: int = 3
+    gate_prefetch_ttl_seconds: int = 900
+
+    # Precomputed opening question for the first gate (static inputs only)
+    opening_cache_enabled: bool = False
+    opening_cache_refresh_seconds: int = 3600
+    opening_cache_seed_message: str = "Hi"
+    opening_cache_start_messages: str = "hi,hello,hey,start,begin,new quote,get started"
+
+    # Deferred (background) chain-advance for POST /messages
+    chain_background_timeout_seconds: int = 120
+    next_gate_poll_timeout_seconds: int = 25
+
+    # Resumable SSE turns: events kept in memory per stream (older ones go
+    # to SQLite) and how long a finished stream can still be resumed
+    stream_buffer_events: int = 256
+    stream_retention_seconds: int = 300
+    # With workers > 1, streams are also written through to SQLite at most
+    # stream_flush_ms apart, so a resume or retry on another worker can
+    # follow them (polling every stream_follow_poll_ms)
+    stream_flush_ms: int = 100
+    stream_follow_poll_ms: int = 100
+
+    # Idempotency-Key on message POSTs: how long results are kept, how long
+    # a retry waits for an in-flight original, and the cleanup interval
+    idempotency_ttl_seconds: int = 86400
+    idempotency_wait_seconds: int = 60
+    idempotency_cleanup_seconds: int = 600
+
+    # Gate-response blobs no conversation references any more are deleted
+    # every blob_gc_interval_seconds (0 disables), once unwritten for
+    # blob_gc_grace_seconds (a turn writes its blobs before its state)
+    blob_gc_interval_seconds: int = 3600
+    blob_gc_grace_seconds: int = 3600
+
+    # Multi-worker deployment. WORKERS is also passed to uvicorn --workers by
+    # quoteapp.service; above 1 it turns on cross-worker invalidation
+    # signals. Turns take a per-conversation lease in SQLite; the wait
+    # must outlast chain_background_timeout_seconds (a deferred chain
+    # keeps the lease until it lands).
+    workers: int = 1
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    conversation_lock_ttl_seconds: int = 30
+    conversation_lock_wait_seconds: int = 150
+    invalidation_poll_seconds: float = 0.5
+    invalidation_retention_seconds: int = 300
+
+    # Admission control on turn endpoints (0 disables a check) and per-client
+    # token buckets on POSTs carrying a client_id
+    admission_max_inflight_turns: int = 64
+    admission_max_llm_inflight: int = 32
+    admission_max_loop_lag_ms: int = 500
+    admission_retry_after_seconds: int = 2
+    # POST bodies are buffered before auth runs; larger ones get 413
+    admission_max_body_bytes: int = 262144
+    rate_limit_per_minute: int = 60
+    rate_limit_burst: int = 20
+
+    # Request tracing: slowest traces kept for /api/v1/admin/traces, spans
+    # per trace are capped; OpenTelemetry export needs opentelemetry-api/sdk
+    tracing_enabled: bool = True
+    trace_retain_slowest: int = 20
+    trace_max_spans: int = 500
+    trace_otel_export: bool = False
+
+    # Loop watchdog and readiness (GET /api/v1/health/ready answers 503 when
+    # a threshold is crossed; 0 disables the stall stack dump)
+    loop_stall_dump_seconds: float = 1.0
+    ready_max_loop_lag_ms: int = 1000
+    ready_max_db_latency_ms: int = 500
+    ready_max_executor_queue: int = 32
+
+    # On-demand sampling profiler (POST /api/v1/admin/profile)
+    profile_max_seconds: int = 60
+
+    # Conversation event subscriptions (WebSocket / long-poll)
+    event_subscriber_buffer: int = 100
+    events_poll_timeout_seconds: int = 25
+    websocket_ticket_ttl_seconds: int = 30
+
+    # Upper bound on the quote_context summary passed to gates
+    quote_context_max_chars: int = 2000
+
     # CORS
     cors_origins: str = "http://localhost:3000,http://localhost:3001"
 
+    # Compress JSON responses at least this large when the client accepts it
+    response_compression_min_bytes: int = 1024
+
     # Database
     database_url: str = "data/quoteapp.db"
 
@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
+import functools
 import os
+import re
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Awaitable, Callable
 
 import aiosqlite
 
+from . import metrics
 from .config import settings
+from .tracing import span
 
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS conversations (
@@ -17,6 +22,8 @@ CREATE TABLE IF NOT EXISTS conversations (
     user_id     INTEGER NOT NULL,
     status      TEXT NOT NULL DEFAULT 'active',
     config_json TEXT DEFAULT '{}',
+    version     INTEGER NOT NULL DEFAULT 0,
+    state_version INTEGER NOT NULL DEFAULT 0,
     created_at  TEXT NOT NULL DEFAULT (datetime('now')),
     updated_at  TEXT NOT NULL DEFAULT (datetime('now'))
 );
@@ -28,28 +35,150 @@ CREATE TABLE IF NOT EXISTS messages (
     content         TEXT NOT NULL DEFAULT '',
     response_json   TEXT DEFAULT NULL,
     metadata_json   TEXT DEFAULT '{}',
+    display_json    TEXT DEFAULT NULL,
     created_at      TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
 CREATE INDEX IF NOT EXISTS idx_messages_conversation
     ON messages(conversation_id, created_at);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    hash        TEXT PRIMARY KEY,
+    body        TEXT NOT NULL,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now'))   -- refreshed on every write
+);
+
+CREATE TABLE IF NOT EXISTS stream_events (
+    stream_id   TEXT NOT NULL,
+    conversation_id TEXT DEFAULT NULL,
+    seq         INTEGER NOT NULL,
+    event       TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (stream_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    conversation_id TEXT NOT NULL,
+    key             TEXT NOT NULL,
+    fingerprint     TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    response_json   TEXT DEFAULT NULL,
+    stream_id       TEXT DEFAULT NULL,
+    expires_at      REAL NOT NULL,
+    created_at      TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (conversation_id, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires
+    ON idempotency_keys(expires_at);
+
+CREATE TABLE IF NOT EXISTS conversation_locks (
+    conversation_id TEXT PRIMARY KEY,
+    owner           TEXT NOT NULL,
+    expires_at      REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS websocket_tickets (
+    ticket          TEXT PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    expires_at      REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS opening_responses (
+    cache_key   TEXT PRIMARY KEY,
+    text        TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS maintenance_runs (
+    name         TEXT PRIMARY KEY,
+    owner        TEXT NOT NULL,
+    expires_at   REAL NOT NULL,
+    completed_at REAL DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS invalidations (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic       TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    origin      TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
 """
 
+# Columns added after the first release: (table, column, definition).
+# CREATE TABLE IF NOT EXISTS leaves existing tables alone, so init_db adds
+# any that are missing.
+COLUMN_MIGRATIONS: list[tuple[str, str, str]] = [
+    ("messages", "display_json", "TEXT DEFAULT NULL"),
+    ("conversations", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("conversations", "state_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("stream_events", "conversation_id", "TEXT DEFAULT NULL"),
+]
+
 
 async def init_db() -> None:
-    """Create tables if they don't exist."""
+    """Create tables if they don't exist.
+
+    Safe to run from several workers starting at once: a column another
+    worker added first is left alone.
+    """
     db_path = settings.database_url
     os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-    async with aiosqlite.connect(db_path) as db:
+    async with aiosqlite.connect(db_path, timeout=settings.sqlite_busy_timeout_ms / 1000) as db:
+        if settings.sqlite_wal:
+            # Persistent per database file: readers stop blocking the writer
+            await db.execute("PRAGMA journal_mode=WAL")
         await db.executescript(SCHEMA_SQL)
+        for table, column, definition in COLUMN_MIGRATIONS:
+            cursor = await db.execute(f"PRAGMA table_info({table})")
+            existing = {row[1] for row in await cursor.fetchall()}
+            if column not in existing:
+                try:
+                    await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                except aiosqlite.OperationalError as exc:
+                    if "duplicate column" not in str(exc):
+                        raise
         await db.commit()
 
 
+_TABLE_RE = re.compile(r"\b(?:from|into|update)\s+(\w+)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=256)
+def statement_label(sql: str) -> str:
+    """Metric label for a statement: its verb and first table ("select messages")."""
+    verb = sql.split(None, 1)[0].lower() if sql.strip() else "?"
+    match = _TABLE_RE.search(sql)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def _timed(fn: Callable[..., Awaitable[Any]], label: str | None = None) -> Callable[..., Awaitable[Any]]:
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        statement = label or statement_label(args[0])
+        start = time.perf_counter()
+        try:
+            with span("db", statement=statement):
+                return await fn(*args, **kwargs)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement)
+    return wrapper
+
+
 @asynccontextmanager
 async def get_db_connection() -> AsyncGenerator[aiosqlite.Connection, None]:
-    """Yield an aiosqlite connection with row_factory enabled."""
-    db = await aiosqlite.connect(settings.database_url)
+    """Yield an aiosqlite connection with row_factory enabled and timed statements.
+
+    Writers from other workers are waited on for up to sqlite_busy_timeout_ms.
+    """
+    db = await aiosqlite.connect(
+        settings.database_url, timeout=settings.sqlite_busy_timeout_ms / 1000,
+    )
     db.row_factory = aiosqlite.Row
+    db.execute = _timed(db.execute)
+    db.executemany = _timed(db.executemany)
+    db.commit = _timed(db.commit, "commit")
     try:
         yield db
     finally:
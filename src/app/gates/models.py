@@ -26,4 +26,5 @@ class GateConfig:
     prompt_version: Optional[str] = None
     variables_template: dict[str, str] = dataclasses.field(default_factory=dict)
     tools_required: list[str] = dataclasses.field(default_factory=list)
+    provides: list[str] = dataclasses.field(default_factory=list)  # product_config keys it fills
     status: GateStatus = GateStatus.PLACEHOLDER
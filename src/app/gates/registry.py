@@ -1,8 +1,21 @@
-"""Single source of truth for all 16 gate definitions."""
+"""Single source of truth for all gate definitions.
+
+The built-in registry below is what ships with the code. A versioned
+registry file (``GATE_REGISTRY_FILE``) can override it at runtime; see
+`parse_registry` and `swap_registry`.
+"""
 
 from __future__ import annotations
 
-from ..config import settings
+import contextvars
+import dataclasses
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ..config import AppSettings, settings
 from .models import GateConfig, GateStatus, GateType
 
 GATE_REGISTRY: dict[int, GateConfig] = {
@@ -13,6 +26,7 @@ GATE_REGISTRY: dict[int, GateConfig] = {
         prompt_id=settings.openai_prompt_id_gate1,
         prompt_version=settings.openai_prompt_version,
         variables_template={"product_options": "product_options"},
+        provides=["product_id"],
         status=GateStatus.ACTIVE,
     ),
     2: GateConfig(
@@ -23,6 +37,7 @@ GATE_REGISTRY: dict[int, GateConfig] = {
         variables_template={
             "dimension_context": "dimension_context",
         },
+        provides=["state", "width_ft_assumed", "length_ft_assumed"],
         status=GateStatus.ACTIVE,
     ),
     3: GateConfig(
@@ -33,6 +48,7 @@ GATE_REGISTRY: dict[int, GateConfig] = {
         variables_template={
             "bay_logic_context": "bay_logic_context",
         },
+        provides=["total_bays"],
         status=GateStatus.ACTIVE,
     ),
     4: GateConfig(
@@ -46,6 +62,7 @@ GATE_REGISTRY: dict[int, GateConfig] = {
             "total_bays": "total_bays",
             "base_pricing_context": "gate_3_response",
         },
+        provides=["structure_type"],
         status=GateStatus.ACTIVE,
     ),
     5: GateConfig(
@@ -225,6 +242,14 @@ GATE_REGISTRY: dict[int, GateConfig] = {
         variables_template={
             "orientation_context": "gate_2_response",
         },
+        provides=[
+            "width_ft_confirmed",
+            "length_ft_confirmed",
+            "comparison_mode",
+            "option_keep",
+            "option_swap",
+            "bay_logic_context",
+        ],
         status=GateStatus.ACTIVE,
     ),
     20: GateConfig(
@@ -263,11 +288,235 @@ GATE_REGISTRY: dict[int, GateConfig] = {
 DEFAULT_GATE_SEQUENCE: list[int] = [1, 2, 19, 3, 20, 21, 4, 22, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18]
 
 
+BUILTIN_REGISTRY_VERSION = "builtin"
+
+# How many superseded registry versions stay resolvable for in-flight turns
+_RETAINED_VERSIONS = 8
+
+
+# ── Versioned snapshots (hot reload) ────────────────────────────────
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class RegistrySnapshot:
+    """An immutable gate registry + default sequence, swapped in atomically."""
+    version: str
+    gates: dict[int, GateConfig]
+    sequence: tuple[int, ...]
+    source: str = BUILTIN_REGISTRY_VERSION
+    loaded_at: float = dataclasses.field(default_factory=time.time)
+
+
+_BUILTIN = RegistrySnapshot(
+    version=BUILTIN_REGISTRY_VERSION,
+    gates=GATE_REGISTRY,
+    sequence=tuple(DEFAULT_GATE_SEQUENCE),
+)
+_current: RegistrySnapshot = _BUILTIN
+_retained: OrderedDict[str, RegistrySnapshot] = OrderedDict(
+    [(BUILTIN_REGISTRY_VERSION, _BUILTIN)]
+)
+_active: contextvars.ContextVar[Optional[RegistrySnapshot]] = contextvars.ContextVar(
+    "active_gate_registry", default=None,
+)
+
+
+def current_registry() -> RegistrySnapshot:
+    """The most recently loaded registry (what new turns start with)."""
+    return _current
+
+
+def active_registry() -> RegistrySnapshot:
+    """The registry pinned for the running turn, or the current one."""
+    return _active.get() or _current
+
+
+def registry_for(version: Optional[str]) -> RegistrySnapshot:
+    """Look up a retained registry version, falling back to the current one.
+
+    Conversations are pinned to the version they started on for as long as
+    it is retained (the last `_RETAINED_VERSIONS` loaded in this process).
+    """
+    if version is None:
+        return _current
+    return _retained.get(version, _current)
+
+
+def pin_registry(snapshot: Optional[RegistrySnapshot] = None) -> contextvars.Token:
+    """Pin a registry for the rest of this turn (and tasks it spawns).
+
+    Pair with `unpin_registry`; a turn started before a swap keeps using
+    the version it was pinned to.
+    """
+    return _active.set(snapshot or _current)
+
+
+def unpin_registry(token: contextvars.Token) -> None:
+    try:
+        _active.reset(token)
+    except ValueError:
+        # Async generators can be finalized in a different context
+        _active.set(None)
+
+
+def swap_registry(snapshot: RegistrySnapshot) -> None:
+    """Make `snapshot` current. A single reference assignment, so readers
+    always see either the old or the new registry, never a mix."""
+    global _current
+    _retained[snapshot.version] = snapshot
+    _retained.move_to_end(snapshot.version)
+    while len(_retained) > _RETAINED_VERSIONS:
+        _retained.popitem(last=False)
+    _current = snapshot
+
+
+def retained_versions() -> list[str]:
+    return list(_retained)
+
+
+def _gate_from_dict(number: int, data: dict[str, Any], base: Optional[GateConfig]) -> GateConfig:
+    fields = {f.name for f in dataclasses.fields(GateConfig)}
+    unknown = set(data) - fields
+    if unknown:
+        raise ValueError(f"gate {number}: unknown fields {sorted(unknown)}")
+    values = dict(data)
+    values["number"] = number
+    if "gate_type" in values:
+        values["gate_type"] = GateType(values["gate_type"])
+    if "status" in values:
+        values["status"] = GateStatus(values["status"])
+    if base is not None:
+        return dataclasses.replace(base, **values)
+    for required in ("name", "gate_type"):
+        if required not in values:
+            raise ValueError(f"gate {number}: new gates need {required!r}")
+    return GateConfig(**values)
+
+
+def parse_registry(data: dict[str, Any], source: str) -> RegistrySnapshot:
+    """Build a snapshot from a registry document.
+
+    Format::
+
+        {"version": "2026-10-19.1",
+         "sequence": [1, 2, 19, ...],                       # optional
+         "gates": {"5": {"prompt_id": "pmpt_…", "prompt_version": "3"},
+                   "23": {"name": "…", "gate_type": "universal", …}}}
+
+    Gate entries override the built-in definition field by field; unknown
+    gate numbers define new gates. Raises ValueError on invalid input.
+    """
+    version = data.get("version")
+    if not isinstance(version, str) or not version:
+        raise ValueError("registry file needs a non-empty string 'version'")
+    if version == BUILTIN_REGISTRY_VERSION:
+        raise ValueError(f"version {BUILTIN_REGISTRY_VERSION!r} is reserved")
+
+    gates = dict(GATE_REGISTRY)
+    for key, gate_data in (data.get("gates") or {}).items():
+        number = int(key)
+        if not isinstance(gate_data, dict):
+            raise ValueError(f"gate {number}: expected an object")
+        gates[number] = _gate_from_dict(number, gate_data, gates.get(number))
+
+    sequence = tuple(int(n) for n in data.get("sequence", DEFAULT_GATE_SEQUENCE))
+    missing = [n for n in sequence if n not in gates]
+    if missing:
+        raise ValueError(f"sequence references unknown gates {missing}")
+    return RegistrySnapshot(version=version, gates=gates, sequence=sequence, source=source)
+
+
+def load_registry_file(path: str) -> RegistrySnapshot:
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    if not isinstance(data, dict):
+        raise ValueError("registry file must contain a JSON object")
+    return parse_registry(data, source=path)
+
+
 def get_gate(number: int) -> GateConfig:
     """Return a gate config by number, or raise KeyError."""
-    return GATE_REGISTRY[number]
+    return active_registry().gates[number]
 
 
 def get_active_gates() -> list[GateConfig]:
     """Return only gates that have ACTIVE status (real prompt IDs)."""
-    return [g for g in GATE_REGISTRY.values() if g.status == GateStatus.ACTIVE]
+    return [g for g in active_registry().gates.values() if g.status == GateStatus.ACTIVE]
+
+
+# ── Data dependencies ───────────────────────────────────────────────
+
+_GATE_RESPONSE_KEY = re.compile(r"^gate_(\d+)_response$")
+
+
+def _key_producers(registry: dict[int, GateConfig]) -> dict[str, int]:
+    """Map each product_config key to the gate that fills it."""
+    producers: dict[str, int] = {}
+    for gate in registry.values():
+        for key in gate.provides:
+            producers.setdefault(key, gate.number)
+    return producers
+
+
+def key_producer(source_key: str, registry: dict[int, GateConfig] | None = None) -> int | None:
+    """Return the gate whose output feeds `source_key`, or None.
+
+    Settings values are static and ``quote_context``-style keys without a
+    declared producer are treated as advisory, so neither creates an edge.
+    """
+    registry = active_registry().gates if registry is None else registry
+    if source_key in AppSettings.model_fields:
+        return None
+    m = _GATE_RESPONSE_KEY.match(source_key)
+    if m:
+        return int(m.group(1))
+    return _key_producers(registry).get(source_key)
+
+
+def dependency_keys(gate: GateConfig, registry: dict[int, GateConfig] | None = None) -> dict[str, int]:
+    """Return {variable_name: producing gate} for the gate's data inputs."""
+    deps: dict[str, int] = {}
+    for var_name, source_key in gate.variables_template.items():
+        producer = key_producer(source_key, registry)
+        if producer is not None and producer != gate.number:
+            deps[var_name] = producer
+    return deps
+
+
+def gate_dependencies(number: int, registry: dict[int, GateConfig] | None = None) -> set[int]:
+    """Return the gate numbers whose output the given gate reads."""
+    registry = active_registry().gates if registry is None else registry
+    return set(dependency_keys(registry[number], registry).values())
+
+
+def replay_plan(
+    sequence: list[int],
+    target: int,
+    resume_from: int,
+    changed_keys: set[str],
+    registry: dict[int, GateConfig] | None = None,
+) -> list[int]:
+    """Return the gates to revisit after `target` is re-answered, ending at `resume_from`.
+
+    Only active gates strictly between the two that read a changed key are
+    replayed; a replayed gate's own outputs count as changed for the gates
+    after it. Advisory inputs (see `key_producer`) never trigger a replay.
+    """
+    registry = active_registry().gates if registry is None else registry
+    changed = set(changed_keys)
+    start = sequence.index(target) + 1
+    end = sequence.index(resume_from)
+    plan: list[int] = []
+    for number in sequence[start:end]:
+        gate = registry.get(number)
+        if gate is None or gate.status != GateStatus.ACTIVE:
+            continue
+        if any(
+            source in changed and key_producer(source, registry) is not None
+            for source in gate.variables_template.values()
+        ):
+            plan.append(number)
+            changed.update(gate.provides)
+            changed.add(f"gate_{number}_response")
+    plan.append(resume_from)
+    return plan
@@ -0,0 +1,81 @@
+"""Precompiled per-gate variable resolvers.
+
+Each gate's ``variables_template`` is split once into values that come from
+settings (static for the life of the process) and keys that must be looked
+up in the session's ``product_config``. Resolving a gate then only costs the
+session lookups.
+
+``quote_context`` is not stored in the session: it is the compact JSON of
+``quote_summary``, serialized here on demand (the summary is capped at
+``quote_context_max_chars``, so this is cheaper than any cache key).
+
+Session values may be blob references; the caller passes the function that
+resolves them, so this layer does not depend on the blob store.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+from typing import Any, Callable
+
+from ..config import AppSettings, settings
+from .models import GateConfig
+from .registry import active_registry
+
+_MISSING = object()
+
+QUOTE_SUMMARY_KEY = "quote_summary"
+QUOTE_CONTEXT_KEY = "quote_context"
+
+
+def quote_context(summary: Any) -> str:
+    """Compact JSON of a quote summary ("" before any facts are collected)."""
+    if not isinstance(summary, dict):
+        return ""
+    return json.dumps(summary, separators=(",", ":"))
+
+
+def _as_is(value: Any) -> Any:
+    return value
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class GateResolver:
+    gate: GateConfig
+    static: dict[str, str]                       # var name → settings value
+    dynamic: tuple[tuple[str, str], ...]         # (var name, product_config key)
+
+    def resolve(
+        self, product_config: dict[str, Any], deref: Callable[[Any], Any] = _as_is,
+    ) -> dict[str, str]:
+        """Variable values for the gate; `deref` resolves blob references."""
+        var_map = dict(self.static)
+        for var_name, source_key in self.dynamic:
+            if source_key == QUOTE_CONTEXT_KEY:
+                var_map[var_name] = quote_context(product_config.get(QUOTE_SUMMARY_KEY))
+                continue
+            value = product_config.get(source_key, _MISSING)
+            var_map[var_name] = "" if value is _MISSING else str(deref(value))
+        return var_map
+
+
+def compile_gate(gate: GateConfig, app_settings: AppSettings = settings) -> GateResolver:
+    static: dict[str, str] = {}
+    dynamic: list[tuple[str, str]] = []
+    for var_name, source_key in gate.variables_template.items():
+        # Settings win over session data, as in the original lookup order
+        if hasattr(app_settings, source_key):
+            static[var_name] = getattr(app_settings, source_key)
+        else:
+            dynamic.append((var_name, source_key))
+    return GateResolver(gate=gate, static=static, dynamic=tuple(dynamic))
+
+
+def compile_registry(
+    registry: dict[int, GateConfig] | None = None,
+    app_settings: AppSettings = settings,
+) -> dict[int, GateResolver]:
+    """Compile a resolver for every gate in the registry."""
+    registry = active_registry().gates if registry is None else registry
+    return {number: compile_gate(gate, app_settings) for number, gate in registry.items()}
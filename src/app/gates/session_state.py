@@ -3,55 +3,127 @@
 from __future__ import annotations
 
 import dataclasses
+import functools
 from typing import Any, Optional
 
+from .. import metrics
 from .models import GateStatus
-from .registry import DEFAULT_GATE_SEQUENCE, GATE_REGISTRY
+from .registry import RegistrySnapshot, active_registry, current_registry
 
 
-@dataclasses.dataclass
+@metrics.watch_lru("successor_table")
+@functools.lru_cache(maxsize=64)
+def successor_table(
+    sequence: tuple[int, ...], registry: RegistrySnapshot,
+) -> dict[int, Optional[int]]:
+    """Map each gate in `sequence` to the next ACTIVE gate after it (or None).
+
+    Duplicates resolve to their first occurrence, matching ``list.index``.
+    Cached per (sequence, registry snapshot).
+    """
+    table: dict[int, Optional[int]] = {}
+    next_active: Optional[int] = None
+    for number in reversed(sequence):
+        table[number] = next_active
+        gate_cfg = registry.gates.get(number)
+        if gate_cfg and gate_cfg.status == GateStatus.ACTIVE:
+            next_active = number
+    return table
+
+
+# Prebuild the table for the default sequence
+successor_table(current_registry().sequence, current_registry())
+
+
+@dataclasses.dataclass(slots=True)
 class SessionState:
     current_gate: int = 1
     gate_sequence: list[int] = dataclasses.field(
-        default_factory=lambda: list(DEFAULT_GATE_SEQUENCE)
+        default_factory=lambda: list(active_registry().sequence)
     )
     product_config: dict[str, Any] = dataclasses.field(default_factory=dict)
     line_items: list[dict] = dataclasses.field(default_factory=list)
     subtotals_by_gate: dict[str, float] = dataclasses.field(default_factory=dict)
     flags: list[str] = dataclasses.field(default_factory=list)
+    registry_version: Optional[str] = None     # registry the conversation runs on
+    # Undo record of what each completed gate changed (older sessions: blob
+    # hash of the whole session as it stood on entry to the gate)
+    gate_snapshots: dict[str, Any] = dataclasses.field(default_factory=dict)
+    # Open rewind: {"target", "resume_from", "prior"}; cleared when target completes
+    revision: Optional[dict[str, Any]] = None
+    # Gates to revisit (in order) before normal sequencing resumes
+    replay_queue: list[int] = dataclasses.field(default_factory=list)
+    _successors: Optional[dict[int, Optional[int]]] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False,
+    )
+    # Transient (not serialized): gate-response blobs written this turn but
+    # not yet persisted, and blob bodies hydrated for variable resolution
+    pending_blobs: dict[str, str] = dataclasses.field(
+        default_factory=dict, init=False, repr=False, compare=False,
+    )
+    blobs: dict[str, str] = dataclasses.field(
+        default_factory=dict, init=False, repr=False, compare=False,
+    )
+    # Transient: conversations.state_version this state was read at
+    state_version: int = dataclasses.field(
+        default=0, init=False, repr=False, compare=False,
+    )
 
     def to_dict(self) -> dict[str, Any]:
-        return dataclasses.asdict(self)
+        # Shares the nested containers instead of deep-copying them; the
+        # result is meant to be JSON-encoded straight away.
+        return {
+            "current_gate": self.current_gate,
+            "gate_sequence": self.gate_sequence,
+            "product_config": self.product_config,
+            "line_items": self.line_items,
+            "subtotals_by_gate": self.subtotals_by_gate,
+            "flags": self.flags,
+            "registry_version": self.registry_version,
+            "gate_snapshots": self.gate_snapshots,
+            "revision": self.revision,
+            "replay_queue": self.replay_queue,
+        }
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> SessionState:
         if not data:
             return cls()
+        gate_sequence = data.get("gate_sequence")
+        if gate_sequence is None:
+            gate_sequence = list(active_registry().sequence)
         return cls(
             current_gate=data.get("current_gate", 1),
-            gate_sequence=data.get("gate_sequence", list(DEFAULT_GATE_SEQUENCE)),
+            gate_sequence=gate_sequence,
             product_config=data.get("product_config", {}),
             line_items=data.get("line_items", []),
             subtotals_by_gate=data.get("subtotals_by_gate", {}),
             flags=data.get("flags", []),
+            registry_version=data.get("registry_version"),
+            gate_snapshots=data.get("gate_snapshots", {}),
+            revision=data.get("revision"),
+            replay_queue=data.get("replay_queue", []),
         )
 
+    def _successor_map(self) -> dict[int, Optional[int]]:
+        if self._successors is None:
+            self._successors = successor_table(tuple(self.gate_sequence), active_registry())
+        return self._successors
+
     def next_gate(self) -> Optional[int]:
-        """Return the next active gate number after current_gate, skipping placeholders."""
-        seq = self.gate_sequence
-        try:
-            idx = seq.index(self.current_gate)
-        except ValueError:
-            return None
-        for candidate in seq[idx + 1 :]:
-            gate_cfg = GATE_REGISTRY.get(candidate)
-            if gate_cfg and gate_cfg.status == GateStatus.ACTIVE:
-                return candidate
-        return None
+        """Return the next active gate number after current_gate, skipping placeholders.
+
+        While a revision is being replayed the replay queue takes precedence.
+        """
+        if self.replay_queue:
+            return self.replay_queue[0]
+        return self._successor_map().get(self.current_gate)
 
     def advance(self) -> Optional[int]:
         """Move current_gate to the next active gate. Returns new gate number or None."""
         nxt = self.next_gate()
+        if self.replay_queue:
+            self.replay_queue.pop(0)
         if nxt is not None:
             self.current_gate = nxt
         return nxt
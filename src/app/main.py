@@ -8,16 +8,47 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from .admission import AdmissionMiddleware
 from .config import settings
+from .metrics import MetricsMiddleware
+from .tracing import TracingMiddleware
+from .watchdog import loop_lag
 from .database import init_db
-from .routers import conversations, health, messages
+from .routers import admin, conversations, events, health, messages
+from .services.blob_store import blob_collector
+from .services.conversation_service import ConflictError
+from .services.display_backfill import RUN_LEASE_SECONDS, backfill_once
+from .services.idempotency import idempotency_store
+from .services.invalidation import invalidation_bus
+from .services.opening_cache import opening_cache
+from .services.orchestrator import orchestrator
+from .services.registry_reloader import registry_reloader
+from .services.stream_registry import stream_registry
+from .services.task_supervisor import task_supervisor
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup / shutdown lifecycle."""
     await init_db()
+    await invalidation_bus.start()
+    loop_lag.start()
+    orchestrator.compile()
+    registry_reloader.start()
+    opening_cache.start()
+    task_supervisor.start("display_backfill", backfill_once(), timeout=RUN_LEASE_SECONDS)
+    await stream_registry.purge_stale()
+    idempotency_store.start()
+    blob_collector.start()
     yield
+    await stream_registry.shutdown()
+    await idempotency_store.stop()
+    await blob_collector.stop()
+    await registry_reloader.stop()
+    await opening_cache.stop()
+    await task_supervisor.shutdown()
+    await invalidation_bus.stop()
+    await loop_lag.stop()
 
 
 app = FastAPI(
@@ -26,6 +57,20 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# ── Admission control ───────────────────────────────────────────────
+# Added before CORS so CORS stays outermost and 429s carry its headers
+
+app.add_middleware(AdmissionMiddleware)
+
+# ── Metrics ─────────────────────────────────────────────────────────
+# Outside admission control so rejected requests are counted too
+
+app.add_middleware(MetricsMiddleware)
+
+# ── Tracing ─────────────────────────────────────────────────────────
+
+app.add_middleware(TracingMiddleware)
+
 # ── CORS ────────────────────────────────────────────────────────────
 
 app.add_middleware(
@@ -41,10 +86,22 @@ app.add_middleware(
 app.include_router(health.router)
 app.include_router(conversations.router)
 app.include_router(messages.router)
+app.include_router(events.router)
+app.include_router(events.ws_router)
+app.include_router(admin.router)
 
 
 # ── Global error handler ────────────────────────────────────────────
 
+@app.exception_handler(ConflictError)
+async def conflict_exception_handler(request: Request, exc: ConflictError):
+    """A concurrent request (possibly on another worker) holds or changed the conversation."""
+    return JSONResponse(
+        status_code=409,
+        content={"error": {"code": exc.code, "message": str(exc)}},
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Return errors in the { error: { message } } format the client expects."""
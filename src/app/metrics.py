@@ -0,0 +1,347 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Metrics are plain dicts keyed by label tuples. Every update happens on the
+event-loop thread, so recording is a dict lookup and an add — no locks.
+Values that already live elsewhere (thread counts, queue depths, cache
+sizes) are read by callback at scrape time instead of being mirrored.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import dataclasses
+import math
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+Labels = tuple[str, ...]
+
+# Seconds; covers sub-millisecond SQLite statements up to slow LLM turns
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_metrics: list["_Metric"] = []
+
+
+# ── Metric types ────────────────────────────────────────────────────
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._fn: Optional[Callable[[], Any]] = None
+        _metrics.append(self)
+
+    def set_function(self, fn: Callable[[], Any]) -> None:
+        """Read the value at scrape time: a number, or {labels: number}."""
+        self._fn = fn
+
+    def _values(self) -> dict[Labels, float]:
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[tuple[str, Labels, Labels, float]]:
+        """Yield (name, label names, label values, value)."""
+        if self._fn is not None:
+            value = self._fn()
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            values = self._values()
+        for labels, value in values.items():
+            yield self.name, self.labelnames, labels, value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._counts: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._counts[labels] = self._counts.get(labels, 0.0) + amount
+
+    def _values(self) -> dict[Labels, float]:
+        return self._counts
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._current: dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._current[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._current[labels] = self._current.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def _values(self) -> dict[Labels, float]:
+        return self._current
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels → per-bucket counts (last slot is +Inf), then sum
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterator[tuple[str, Labels, Labels, float]]:
+        names = self.labelnames + ("le",)
+        for labels, series in self._series.items():
+            total = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                total += count
+                yield f"{self.name}_bucket", names, labels + (_format_value(bound),), total
+            yield f"{self.name}_sum", self.labelnames, labels, series[-1]
+            yield f"{self.name}_count", self.labelnames, labels, total
+
+
+# ── Exposition ──────────────────────────────────────────────────────
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format (version 0.0.4)."""
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labelnames, labels, value in metric.samples():
+            if labelnames:
+                pairs = ",".join(
+                    f'{k}="{_escape(str(v))}"' for k, v in zip(labelnames, labels)
+                )
+                lines.append(f"{name}{{{pairs}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Runtime helpers ─────────────────────────────────────────────────
+
+@dataclasses.dataclass(frozen=True)
+class ExecutorStats:
+    threads: int = 0
+    max_workers: int = 0
+    queued: int = 0
+    idle: int = 0
+
+    @property
+    def saturation(self) -> float:
+        """Busy threads as a fraction of the limit (1.0 = every worker busy)."""
+        if not self.max_workers:
+            return 0.0
+        return (self.threads - self.idle) / self.max_workers
+
+
+def executor_stats() -> ExecutorStats:
+    """Thread and queue figures of the loop's default ThreadPoolExecutor.
+
+    asyncio keeps the default executor private; zeros until it exists.
+    """
+    try:
+        executor = asyncio.get_running_loop()._default_executor
+    except (RuntimeError, AttributeError):
+        return ExecutorStats()
+    if executor is None:
+        return ExecutorStats()
+    idle = getattr(executor, "_idle_semaphore", None)
+    return ExecutorStats(
+        threads=len(getattr(executor, "_threads", ())),
+        max_workers=getattr(executor, "_max_workers", 0),
+        queued=executor._work_queue.qsize() if hasattr(executor, "_work_queue") else 0,
+        idle=getattr(idle, "_value", 0),
+    )
+
+
+_lru_caches: dict[str, Callable] = {}
+
+
+def watch_lru(name: str) -> Callable[[Callable], Callable]:
+    """Decorator exposing a functools.lru_cache's hit / miss counts under `name`."""
+    def register(fn: Callable) -> Callable:
+        _lru_caches[name] = fn
+        return fn
+    return register
+
+
+def _lru_stat(field: str) -> dict[Labels, float]:
+    return {(name,): getattr(fn.cache_info(), field) for name, fn in _lru_caches.items()}
+
+
+# ── Metrics ─────────────────────────────────────────────────────────
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "quoteapp_http_request_duration_seconds",
+    "Time to response headers by route template, method and status.",
+    ("method", "route", "status"),
+)
+LLM_CALL_SECONDS = Histogram(
+    "quoteapp_llm_call_duration_seconds",
+    "OpenAI call duration by gate and mode (call / stream).",
+    ("gate", "mode"),
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "quoteapp_llm_first_token_seconds",
+    "Time to the first streamed delta by gate.",
+    ("gate",),
+)
+LLM_TOKENS = Counter(
+    "quoteapp_llm_tokens_total",
+    "Tokens reported by OpenAI by gate and kind (input / output).",
+    ("gate", "kind"),
+)
+LLM_ERRORS = Counter(
+    "quoteapp_llm_errors_total",
+    "OpenAI calls that raised, by gate.",
+    ("gate",),
+)
+LLM_INFLIGHT = Gauge(
+    "quoteapp_llm_inflight",
+    "OpenAI calls queued or running.",
+)
+DB_QUERY_SECONDS = Histogram(
+    "quoteapp_db_query_duration_seconds",
+    "SQLite statement latency by statement kind and table.",
+    ("statement",),
+)
+CACHE_REQUESTS = Counter(
+    "quoteapp_cache_requests_total",
+    "Cache lookups by cache and result (hit / miss).",
+    ("cache", "result"),
+)
+LRU_CACHE_HITS = Counter(
+    "quoteapp_lru_cache_hits_total", "functools.lru_cache hits.", ("cache",),
+)
+LRU_CACHE_MISSES = Counter(
+    "quoteapp_lru_cache_misses_total", "functools.lru_cache misses.", ("cache",),
+)
+SSE_CONNECTIONS = Gauge(
+    "quoteapp_sse_connections",
+    "Open SSE responses.",
+)
+TURN_STREAMS = Gauge(
+    "quoteapp_turn_streams",
+    "Resumable turn streams held in memory (running or retained).",
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "quoteapp_event_subscribers",
+    "WebSocket / long-poll conversation event subscribers.",
+)
+TURNS_INFLIGHT = Gauge(
+    "quoteapp_turns_inflight",
+    "Turn requests admitted and not yet finished.",
+)
+LOOP_LAG_SECONDS = Gauge(
+    "quoteapp_event_loop_lag_seconds",
+    "Most recent event-loop scheduling delay.",
+)
+LOOP_STALLS = Counter(
+    "quoteapp_event_loop_stalls_total",
+    "Times the watchdog found the event loop blocked past loop_stall_dump_seconds.",
+)
+THREADS = Gauge(
+    "quoteapp_threads",
+    "Live Python threads.",
+)
+EXECUTOR_THREADS = Gauge(
+    "quoteapp_executor_threads",
+    "Threads started by the default executor.",
+)
+EXECUTOR_MAX_WORKERS = Gauge(
+    "quoteapp_executor_max_workers",
+    "Default executor thread limit.",
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "quoteapp_executor_queue_depth",
+    "Work items waiting for a default executor thread.",
+)
+EXECUTOR_SATURATION = Gauge(
+    "quoteapp_executor_saturation",
+    "Busy default executor threads as a fraction of max_workers.",
+)
+
+LRU_CACHE_HITS.set_function(lambda: _lru_stat("hits"))
+LRU_CACHE_MISSES.set_function(lambda: _lru_stat("misses"))
+THREADS.set_function(threading.active_count)
+EXECUTOR_THREADS.set_function(lambda: executor_stats().threads)
+EXECUTOR_MAX_WORKERS.set_function(lambda: executor_stats().max_workers)
+EXECUTOR_QUEUE_DEPTH.set_function(lambda: executor_stats().queued)
+EXECUTOR_SATURATION.set_function(lambda: executor_stats().saturation)
+
+
+# ── Middleware ──────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    """Record HTTP latency to response headers, labelled by route template."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> None:
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
+
+        async def send_wrapper(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                record(500)
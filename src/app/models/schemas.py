@@ -49,6 +49,53 @@ class HealthResponse(BaseModel):
     status: str = "ok"
 
 
+class ReadinessCheck(BaseModel):
+    ok: bool
+    value: Optional[float] = None
+    threshold: float
+    detail: Optional[str] = None
+
+
+class ReadinessResponse(BaseModel):
+    status: str                  # "ready" | "not_ready"
+    checks: dict[str, ReadinessCheck]
+
+
+# ── Admin ───────────────────────────────────────────────────────────
+
+class RegistryInfoResponse(BaseModel):
+    version: str
+    source: str
+    loaded_at: float
+    gate_count: int
+    sequence: list[int]
+    retained_versions: list[str]
+
+
+class TraceSpanItem(BaseModel):
+    name: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ms: float              # offset from the start of the trace
+    duration_ms: Optional[float] = None   # None while still open
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+
+class TraceItem(BaseModel):
+    trace_id: str
+    name: str
+    parent_trace_id: Optional[str] = None   # set on detached work (stream, deferred chain)
+    status: Optional[int] = None
+    started_at: float
+    duration_ms: float
+    dropped_spans: int = 0
+    spans: list[TraceSpanItem]
+
+
+class TraceListResponse(BaseModel):
+    traces: list[TraceItem]
+
+
 # ── Conversations ───────────────────────────────────────────────────
 
 class CreateConversationRequest(BaseModel):
@@ -68,12 +115,25 @@ class CancelConversationResponse(BaseModel):
     status: str
 
 
+class RewindRequest(BaseModel):
+    gate_number: int
+
+
+class RewindResponse(BaseModel):
+    conversation_id: str
+    current_gate: int
+    resume_from: int
+
+
 # ── Messages ────────────────────────────────────────────────────────
 
 class SendMessageRequest(BaseModel):
     message: str
     client_id: int
     user_id: int
+    # Return as soon as the current gate is answered; the next gate is
+    # delivered later via GET .../messages/next-gate
+    defer_chain: bool = False
 
 
 class MessageItem(BaseModel):
@@ -84,6 +144,7 @@ class MessageItem(BaseModel):
     content: str
     response: Optional[dict[str, Any]] = None
     metadata: Optional[dict[str, Any]] = None
+    display: Optional[DisplayObject] = None
     created_at: str
 
 
@@ -106,12 +167,39 @@ class ExternalAPIResponse(BaseModel):
     display: Optional[DisplayObject] = None
 
 
+# ── Conversation events ─────────────────────────────────────────────
+
+class ConversationEvent(BaseModel):
+    """One subscription event: a stored message, a status change or a resync."""
+    type: str
+    message: Optional[MessageItem] = None
+    status: Optional[str] = None
+
+
+class ConversationEventsResponse(BaseModel):
+    events: list[ConversationEvent]
+
+
+class WebSocketTicketResponse(BaseModel):
+    ticket: str
+    expires_in: int    # seconds
+
+
 # ── SSE Event Data ──────────────────────────────────────────────────
 
 class StreamChunkData(BaseModel):
     """Data payload inside an SSE `chunk` event."""
     conversation_id: str
     delta: str
+    gate_number: Optional[int] = None   # set for chained gates
+
+
+class StreamGateAdvancedData(BaseModel):
+    """Data payload inside an SSE `gate_advanced` event."""
+    conversation_id: str
+    from_gate: Optional[int] = None
+    gate_number: int
+    gate_name: str
 
 
 class StreamDoneData(BaseModel):
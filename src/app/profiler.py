@@ -0,0 +1,98 @@
+"""On-demand in-process sampling profiler.
+
+A dedicated thread snapshots every other thread's Python stack with
+``sys._current_frames()`` at a fixed interval for a bounded time and
+aggregates them as collapsed stacks (``thread;outer;…;inner count``), the
+input format of flamegraph.pl and speedscope. Nothing runs between
+profiles, so the idle cost is zero; only one profile may run at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Optional
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running."""
+
+
+_lock = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def _stack(frame: Optional[FrameType]) -> list[str]:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class Profile:
+    def __init__(self) -> None:
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self.samples = 0
+        self.duration = 0.0
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text, heaviest stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _sample(seconds: float, interval: float) -> Profile:
+    profile = Profile()
+    me = threading.get_ident()
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            thread = names.get(ident, str(ident)).replace(";", "_").replace(" ", "_")
+            profile.stacks[";".join([thread, *_stack(frame)])] += 1
+        profile.samples += 1
+        time.sleep(interval)
+    profile.duration = time.perf_counter() - start
+    return profile
+
+
+async def run_profile(seconds: float, interval: float) -> Profile:
+    """Sample for `seconds` on a dedicated thread; raises ProfilerBusy if one is running."""
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    loop = asyncio.get_running_loop()
+    done: asyncio.Future[Profile] = loop.create_future()
+
+    def resolve(result: Optional[Profile], exc: Optional[BaseException]) -> None:
+        if done.done():  # the request went away while sampling
+            return
+        if exc is not None:
+            done.set_exception(exc)
+        else:
+            done.set_result(result)
+
+    def target() -> None:
+        try:
+            result = _sample(seconds, interval)
+        except Exception as exc:  # hand any failure back to the awaiting request
+            loop.call_soon_threadsafe(resolve, None, exc)
+        else:
+            loop.call_soon_threadsafe(resolve, result, None)
+        finally:
+            _lock.release()
+
+    threading.Thread(target=target, name="quoteapp-profiler", daemon=True).start()
+    return await done
@@ -0,0 +1,126 @@
+"""Fast JSON encoding for API responses.
+
+Uses orjson when it is installed and the standard library otherwise.
+Handlers on the hot paths return plain dicts built from data the services
+just produced, plus JSON stored in the database spliced in as-is, so
+nothing is decoded or re-encoded a second time on the way out. The one
+exception is stored JSON holding NaN or Infinity, which ``json.dumps``
+writes but JSON does not allow: that is re-encoded with those values as
+``null``, as orjson encodes them.
+The pydantic models in ``models.schemas`` remain the documented shapes.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Iterable
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode `obj` as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+class RawJSON(str):
+    """An already-encoded JSON value, written to the output verbatim."""
+
+
+def raw_or_null(text: str | None) -> RawJSON:
+    """Wrap a stored JSON column value; empty or NULL becomes ``null``."""
+    if not text:
+        return RawJSON("null")
+    if "NaN" in text or "Infinity" in text:
+        # Usually inside a string, but only a decode can tell
+        value = json.loads(text, parse_constant=lambda _: None)
+        return RawJSON(dumps_str(value))
+    return RawJSON(text)
+
+
+def encode_object(fields: dict[str, Any]) -> bytes:
+    """Encode a flat object whose values may be `RawJSON` fragments."""
+    parts = []
+    for key, value in fields.items():
+        encoded = value.encode("utf-8") if isinstance(value, RawJSON) else dumps(value)
+        parts.append(dumps(key) + b":" + encoded)
+    return b"{" + b",".join(parts) + b"}"
+
+
+def encode_array(items: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(items) + b"]"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes with `dumps` and passes pre-encoded bytes through."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+# ── Conditional requests / compression ──────────────────────────────
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 5
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    target = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == target:
+            return True
+    return False
+
+
+def _accepted_encodings(accept_encoding: str | None) -> set[str]:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def compress(body: bytes, accept_encoding: str | None, min_bytes: int) -> tuple[bytes, str | None]:
+    """Compress `body` with the best encoding the client accepts (brotli, then gzip).
+
+    Returns the (possibly unchanged) body and the Content-Encoding to send.
+    """
+    if len(body) < min_bytes:
+        return body, None
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=_BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
@@ -0,0 +1,107 @@
+"""Operator endpoints (admin token required)."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from ..auth import require_admin_token
+from ..config import settings
+from ..gates.registry import RegistrySnapshot, current_registry, retained_versions
+from ..models.schemas import (
+    RegistryInfoResponse,
+    TraceItem,
+    TraceListResponse,
+    TraceSpanItem,
+)
+from ..profiler import ProfilerBusy, run_profile
+from ..services.invalidation import TOPIC_REGISTRY_RELOAD, invalidation_bus
+from ..services.registry_reloader import registry_reloader
+from ..tracing import Trace, slowest_traces
+
+router = APIRouter(
+    prefix="/api/v1/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+
+def _registry_info(snapshot: RegistrySnapshot) -> RegistryInfoResponse:
+    return RegistryInfoResponse(
+        version=snapshot.version,
+        source=snapshot.source,
+        loaded_at=snapshot.loaded_at,
+        gate_count=len(snapshot.gates),
+        sequence=list(snapshot.sequence),
+        retained_versions=retained_versions(),
+    )
+
+
+def _trace_item(trace: Trace) -> TraceItem:
+    def ms(seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    return TraceItem(
+        trace_id=trace.trace_id,
+        name=trace.name,
+        parent_trace_id=trace.parent_trace_id,
+        status=trace.status,
+        started_at=trace.started_at,
+        duration_ms=ms(trace.duration),
+        dropped_spans=trace.dropped,
+        spans=[
+            TraceSpanItem(
+                name=span.name,
+                span_id=span.span_id,
+                parent_id=span.parent_id,
+                start_ms=ms(span.start - trace.start),
+                duration_ms=ms(span.end - span.start) if span.end is not None else None,
+                attributes=span.attributes,
+            )
+            for span in list(trace.spans)
+        ],
+    )
+
+
+@router.get("/registry", response_model=RegistryInfoResponse)
+async def get_registry():
+    return _registry_info(current_registry())
+
+
+@router.post("/registry/reload", response_model=RegistryInfoResponse)
+async def reload_registry():
+    try:
+        snapshot = registry_reloader.reload()
+    except (OSError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": {"code": "registry_invalid", "message": str(exc)}},
+        )
+    await invalidation_bus.publish(TOPIC_REGISTRY_RELOAD, {"version": snapshot.version})
+    return _registry_info(snapshot)
+
+
+@router.get("/traces", response_model=TraceListResponse)
+async def get_traces(limit: int = Query(20, ge=1, le=200)):
+    """The slowest retained request traces, slowest first."""
+    return TraceListResponse(traces=[_trace_item(t) for t in slowest_traces()[:limit]])
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=settings.profile_max_seconds),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    """Sample every thread's stack; returns collapsed stacks for flamegraph tools."""
+    try:
+        result = await run_profile(seconds, interval_ms / 1000)
+    except ProfilerBusy as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": {"code": "profile_in_progress", "message": str(exc)}},
+        )
+    return PlainTextResponse(
+        result.collapsed(),
+        headers={
+            "X-Profile-Samples": str(result.samples),
+            "X-Profile-Seconds": f"{result.duration:.3f}",
+        },
+    )
@@ -1,4 +1,4 @@
-"""Conversation create / cancel endpoints."""
+"""Conversation create / cancel / rewind endpoints."""
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
@@ -8,8 +8,12 @@ from ..models.schemas import (
     CreateConversationResponse,
     CancelConversationResponse,
     ErrorResponse,
+    RewindRequest,
+    RewindResponse,
 )
 from ..services import conversation_service as conv_svc
+from ..services import quote_service
+from ..services.gate_scheduler import gate_scheduler
 
 router = APIRouter(
     prefix="/api/v1/conversations",
@@ -45,9 +49,35 @@ async def cancel_conversation(
         result = await conv_svc.hard_delete_conversation(conversation_id)
     else:
         result = await conv_svc.cancel_conversation(conversation_id)
+    await gate_scheduler.discard_everywhere(conversation_id)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": {"code": "not_found", "message": "Conversation not found"}},
         )
     return result
+
+
+@router.post(
+    "/{conversation_id}/rewind",
+    response_model=RewindResponse,
+)
+async def rewind_conversation(conversation_id: str, body: RewindRequest):
+    conv = await conv_svc.get_conversation(conversation_id)
+    if conv is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "not_found", "message": "Conversation not found"}},
+        )
+    if conv["status"] != "active":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": {"code": "conversation_inactive", "message": "Conversation is not active"}},
+        )
+    try:
+        return await quote_service.rewind_conversation(conversation_id, body.gate_number)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": {"code": "rewind_unavailable", "message": str(e)}},
+        )
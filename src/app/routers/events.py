@@ -0,0 +1,159 @@
+"""Conversation event subscriptions: WebSocket with a long-poll fallback.
+
+Both deliver ``{"type": "message", "message": {...}}`` for every stored
+message (same fields as the message listing), ``{"type": "status", ...}``
+when the conversation is cancelled, and ``{"type": "resync"}`` when a slow
+subscriber overflowed its buffer and should re-read the listing.
+
+Browsers, which cannot send an Authorization header on the upgrade, first
+POST ``.../events/ticket`` and open the WebSocket with ``?ticket=``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+
+from ..auth import issue_websocket_ticket, require_bearer_token, websocket_authorized
+from ..config import settings
+from ..models.schemas import ConversationEventsResponse, MessageItem, WebSocketTicketResponse
+from ..responses import FastJSONResponse, dumps_str
+from ..services import conversation_service as conv_svc
+from ..services.event_bus import event_bus
+
+_PATH = "/api/v1/conversations/{conversation_id}/events"
+_CATCH_UP_LIMIT = 200
+
+router = APIRouter(
+    tags=["events"],
+    dependencies=[Depends(require_bearer_token)],
+)
+
+# WebSockets authenticate by hand (see auth.websocket_authorized)
+ws_router = APIRouter(tags=["events"])
+
+
+def _message_event(row: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "type": "message",
+        "message": {field: row.get(field) for field in MessageItem.model_fields},
+    }
+
+
+async def _catch_up(conversation_id: str, after: Optional[str]) -> list[dict[str, Any]]:
+    """Messages stored after `after` (none when the client has no cursor)."""
+    if after is None:
+        return []
+    rows = await conv_svc.get_messages(conversation_id, after=after, limit=_CATCH_UP_LIMIT)
+    return [_message_event(row) for row in rows]
+
+
+def _is_duplicate(event: dict[str, Any], seen: set[str]) -> bool:
+    return event.get("type") == "message" and event["message"]["id"] in seen
+
+
+@router.get(
+    _PATH,
+    response_model=ConversationEventsResponse,
+    responses={204: {"description": "No events before the timeout; poll again"}},
+)
+async def poll_events(
+    conversation_id: str,
+    after: Optional[str] = Query(None, description="Id of the last message the client has"),
+    timeout: Optional[float] = Query(None, ge=0, le=60),
+):
+    """Long-poll fallback: return pending events, waiting up to `timeout` for one."""
+    conv = await conv_svc.get_conversation_version(conversation_id)
+    if conv is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "not_found", "message": "Conversation not found"}},
+        )
+    if timeout is None:
+        timeout = settings.events_poll_timeout_seconds
+
+    # Subscribe before reading the catch-up so nothing falls in between
+    with event_bus.subscription(conversation_id) as sub:
+        events = await _catch_up(conversation_id, after)
+        if not events:
+            first = await sub.get(timeout)
+            if first is None:
+                return Response(status_code=status.HTTP_204_NO_CONTENT)
+            events = [first]
+        seen = {e["message"]["id"] for e in events if e["type"] == "message"}
+        events.extend(e for e in sub.drain() if not _is_duplicate(e, seen))
+    return FastJSONResponse({"events": events})
+
+
+@router.post(_PATH + "/ticket", response_model=WebSocketTicketResponse)
+async def create_events_ticket(conversation_id: str):
+    """Single-use ticket for opening the events WebSocket from a browser."""
+    if await conv_svc.get_conversation_version(conversation_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "not_found", "message": "Conversation not found"}},
+        )
+    ticket = await issue_websocket_ticket(conversation_id)
+    return FastJSONResponse(
+        {"ticket": ticket, "expires_in": settings.websocket_ticket_ttl_seconds},
+    )
+
+
+async def _until_disconnect(websocket: WebSocket) -> None:
+    """Consume (and ignore) client frames until the socket closes."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@ws_router.websocket(_PATH)
+async def conversation_events_ws(
+    websocket: WebSocket,
+    conversation_id: str,
+    after: Optional[str] = None,
+):
+    if not await websocket_authorized(websocket, conversation_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="unauthorized")
+        return
+    if await conv_svc.get_conversation_version(conversation_id) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="not_found")
+        return
+    await websocket.accept()
+
+    with event_bus.subscription(conversation_id) as sub:
+        receiver = asyncio.ensure_future(_until_disconnect(websocket))
+        getter: Optional[asyncio.Future] = None
+        try:
+            seen: set[str] = set()
+            for event in await _catch_up(conversation_id, after):
+                seen.add(event["message"]["id"])
+                await websocket.send_text(dumps_str(event))
+
+            while True:
+                getter = asyncio.ensure_future(sub.get())
+                done, _ = await asyncio.wait(
+                    {getter, receiver}, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if receiver in done:
+                    break
+                event = getter.result()
+                if not _is_duplicate(event, seen):
+                    await websocket.send_text(dumps_str(event))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+            if getter is not None:
+                getter.cancel()
@@ -1,8 +1,20 @@
-"""Health check endpoint (no auth required)."""
+"""Health / readiness checks (no auth required) and metrics (admin token)."""
 
-from fastapi import APIRouter
+import asyncio
+import logging
+import time
 
-from ..models.schemas import HealthResponse
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from ..auth import require_admin_token
+from ..config import settings
+from ..database import get_db_connection
+from ..metrics import executor_stats, render
+from ..models.schemas import HealthResponse, ReadinessCheck, ReadinessResponse
+from ..watchdog import loop_lag
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["health"])
 
@@ -10,3 +22,62 @@ router = APIRouter(tags=["health"])
 @router.get("/api/v1/health", response_model=HealthResponse)
 async def health_check():
     return HealthResponse(status="ok")
+
+
+async def _check_database() -> ReadinessCheck:
+    threshold = settings.ready_max_db_latency_ms
+    start = time.perf_counter()
+    try:
+        async with get_db_connection() as db:
+            cursor = await asyncio.wait_for(db.execute("SELECT 1"), timeout=threshold * 4 / 1000)
+            await cursor.fetchone()
+    except Exception as exc:
+        return ReadinessCheck(ok=False, threshold=threshold, detail=f"{type(exc).__name__}: {exc}")
+    elapsed = (time.perf_counter() - start) * 1000
+    return ReadinessCheck(ok=elapsed <= threshold, value=round(elapsed, 2), threshold=threshold)
+
+
+def _check_event_loop() -> ReadinessCheck:
+    threshold = settings.ready_max_loop_lag_ms
+    lag = loop_lag.peak_lag * 1000
+    return ReadinessCheck(ok=lag <= threshold, value=round(lag, 2), threshold=threshold)
+
+
+def _check_executor() -> ReadinessCheck:
+    threshold = settings.ready_max_executor_queue
+    stats = executor_stats()
+    return ReadinessCheck(
+        ok=stats.queued <= threshold,
+        value=stats.queued,
+        threshold=threshold,
+        detail=f"{stats.threads - stats.idle}/{stats.max_workers} threads busy",
+    )
+
+
+@router.get(
+    "/api/v1/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse}},
+)
+async def readiness_check():
+    """503 when the database is slow, the loop is lagging or the executor is backed up."""
+    checks = {
+        "database": await _check_database(),
+        "event_loop": _check_event_loop(),
+        "executor": _check_executor(),
+    }
+    failing = [name for name, check in checks.items() if not check.ok]
+    if failing:
+        logger.warning("Readiness failing: %s", ", ".join(failing))
+    body = ReadinessResponse(status="not_ready" if failing else "ready", checks=checks)
+    return JSONResponse(body.model_dump(), status_code=503 if failing else 200)
+
+
+@router.get(
+    "/api/v1/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin_token)],
+)
+async def metrics():
+    """Prometheus text exposition of the in-process metrics registry."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
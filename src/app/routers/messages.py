@@ -3,24 +3,45 @@
 from __future__ import annotations
 
 import json
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from sse_starlette.sse import EventSourceResponse
 
+from .. import metrics
 from ..auth import require_bearer_token
+from ..config import settings
 from ..models.schemas import (
-    DisplayObject,
+    ErrorResponse,
     ExternalAPIResponse,
     MessageListResponse,
-    MessageItem,
     SendMessageRequest,
-    StreamChunkData,
-    StreamDoneData,
+)
+from ..responses import (
+    FastJSONResponse,
+    compress,
+    dumps_str,
+    encode_array,
+    encode_object,
+    etag_matches,
+    raw_or_null,
 )
 from ..services import conversation_service as conv_svc
 from ..services import quote_service
 from ..services.display_builder import build_error_display
+from ..services.idempotency import (
+    IdempotencyError,
+    IdempotencyRecord,
+    fingerprint as idempotency_fingerprint,
+    idempotency_store,
+)
+from ..services.stream_registry import (
+    SpilledStream,
+    TurnStream,
+    format_event_id,
+    parse_event_id,
+    stream_registry,
+)
 
 router = APIRouter(
     prefix="/api/v1/conversations/{conversation_id}/messages",
@@ -44,103 +65,305 @@ async def _require_active_conversation(conversation_id: str) -> dict:
     return conv
 
 
+def _external_payload(conversation_id: str, msg: dict) -> dict[str, Any]:
+    """ExternalAPIResponse-shaped dict for a message the service just produced."""
+    meta = msg.get("metadata") or {}
+    return {
+        "conversation_id": conversation_id,
+        "message_id": msg["id"],
+        "role": msg["role"],
+        "content": msg["content"],
+        "response": msg.get("response"),
+        "metadata": meta,
+        "created_at": msg["created_at"],
+        "gate_number": meta.get("gate_number"),
+        "gate_name": meta.get("gate_name"),
+        "display": msg.get("display"),
+    }
+
+
+# Marks a response served from an earlier request with the same Idempotency-Key
+_REPLAYED = {"Idempotent-Replayed": "true"}
+
+
+def _external_response(conversation_id: str, msg: dict) -> FastJSONResponse:
+    return FastJSONResponse(_external_payload(conversation_id, msg))
+
+
+def _openai_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, conv_svc.ConflictError):
+        # Lost a race with another request on this conversation, not an upstream failure
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": {"code": exc.code, "message": str(exc)}},
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail={
+            "error": {"code": "openai_error", "message": str(exc)},
+            "display": build_error_display("openai_error", str(exc)),
+        },
+    )
+
+
+async def _claim_idempotency_key(
+    conversation_id: str, key: str, endpoint: str, body: SendMessageRequest,
+) -> Optional[IdempotencyRecord]:
+    """`idempotency_store.begin` with its errors mapped to API errors."""
+    try:
+        return await idempotency_store.begin(
+            conversation_id, key, idempotency_fingerprint(endpoint, body.model_dump()),
+        )
+    except IdempotencyError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"error": {"code": e.code, "message": e.message}},
+        )
+    except Exception as exc:
+        # The original attempt failed in this process
+        raise _openai_error(exc)
+
+
 @router.post("", response_model=ExternalAPIResponse, status_code=status.HTTP_200_OK)
-async def send_message(conversation_id: str, body: SendMessageRequest):
+async def send_message(
+    conversation_id: str,
+    body: SendMessageRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
     await _require_active_conversation(conversation_id)
 
+    if idempotency_key:
+        record = await _claim_idempotency_key(conversation_id, idempotency_key, "send", body)
+        if record is not None:
+            return FastJSONResponse(record.response, headers=_REPLAYED)
+
+    completed = False
     try:
-        msg = await quote_service.handle_message(conversation_id, body.message)
+        msg = await quote_service.handle_message(
+            conversation_id, body.message, defer_chain=body.defer_chain,
+        )
+        payload = _external_payload(conversation_id, msg)
+        if idempotency_key:
+            await idempotency_store.complete(conversation_id, idempotency_key, payload)
+        completed = True
     except Exception as exc:
+        if idempotency_key:
+            await idempotency_store.abandon(conversation_id, idempotency_key, exc)
+            completed = True
+        raise _openai_error(exc)
+    finally:
+        if idempotency_key and not completed:
+            await idempotency_store.abandon(conversation_id, idempotency_key)
+
+    return FastJSONResponse(payload)
+
+
+@router.get(
+    "/next-gate",
+    response_model=ExternalAPIResponse,
+    responses={204: {"description": "Next gate not ready yet; poll again"}},
+)
+async def get_next_gate(
+    conversation_id: str,
+    after: Optional[str] = Query(None, description="Message id of the deferred reply"),
+    timeout: Optional[float] = Query(None, ge=0, le=60),
+):
+    """Long-poll for the next gate after a ``defer_chain`` send."""
+    conv = await conv_svc.get_conversation(conversation_id)
+    if conv is None:
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail={
-                "error": {"code": "openai_error", "message": str(exc)},
-                "display": build_error_display("openai_error", str(exc)),
-            },
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "not_found", "message": "Conversation not found"}},
         )
-
-    meta = msg.get("metadata") or {}
-    raw_display = msg.get("display")
-    display = DisplayObject(**raw_display) if raw_display else None
-    return ExternalAPIResponse(
-        conversation_id=conversation_id,
-        message_id=msg["id"],
-        role=msg["role"],
-        content=msg["content"],
-        response=msg.get("response"),
-        metadata=meta,
-        created_at=msg["created_at"],
-        gate_number=meta.get("gate_number"),
-        gate_name=meta.get("gate_name"),
-        display=display,
-    )
+    if timeout is None:
+        timeout = settings.next_gate_poll_timeout_seconds
+    msg = await quote_service.wait_for_next_gate(conversation_id, after, timeout)
+    if msg is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return _external_response(conversation_id, msg)
 
 
-@router.get("", response_model=MessageListResponse)
+@router.get(
+    "",
+    response_model=MessageListResponse,
+    responses={304: {"description": "Unchanged since the ETag in If-None-Match"}},
+)
 async def get_messages(
+    request: Request,
     conversation_id: str,
     after: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=200),
 ):
-    conv = await conv_svc.get_conversation(conversation_id)
+    conv = await conv_svc.get_conversation_version(conversation_id)
     if conv is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": {"code": "not_found", "message": "Conversation not found"}},
         )
 
-    rows = await conv_svc.get_messages(conversation_id, after=after, limit=limit)
-    items = [
-        MessageItem(
-            id=r["id"],
-            conversation_id=r["conversation_id"],
-            role=r["role"],
-            content=r["content"],
-            response=r.get("response"),
-            metadata=r.get("metadata"),
-            created_at=r["created_at"],
-        )
+    # The conversation version changes with every message, state update and
+    # status change, so an unchanged ETag means an unchanged listing
+    headers = {"ETag": f'W/"{conv["version"]}"', "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Stored JSON columns are spliced into the body without decoding
+    rows = await conv_svc.get_message_rows(conversation_id, after=after, limit=limit)
+    items = encode_array(
+        encode_object({
+            "id": r["id"],
+            "conversation_id": r["conversation_id"],
+            "role": r["role"],
+            "content": r["content"],
+            "response": raw_or_null(r["response_json"]),
+            "metadata": raw_or_null(r["metadata_json"]),
+            "display": raw_or_null(r["display_json"]),
+            "created_at": r["created_at"],
+        })
         for r in rows
-    ]
-    return MessageListResponse(conversation_status=conv["status"], messages=items)
+    )
+    body = encode_object({"conversation_status": conv["status"]})
+    body, encoding = compress(
+        body[:-1] + b',"messages":' + items + b"}",
+        request.headers.get("accept-encoding"),
+        settings.response_compression_min_bytes,
+    )
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return FastJSONResponse(body, headers=headers)
 
 
-@router.post("/stream", status_code=status.HTTP_200_OK)
-async def send_message_stream(conversation_id: str, body: SendMessageRequest):
-    await _require_active_conversation(conversation_id)
+async def _turn_events(conversation_id: str, message: str) -> AsyncIterator[tuple[str, str]]:
+    """Run a streamed turn, yielding (SSE event name, JSON data) pairs."""
+    try:
+        async for event in quote_service.handle_message_stream(conversation_id, message):
+            # Payloads follow StreamChunkData / StreamGateAdvancedData /
+            # StreamDoneData, encoded directly from the service's dicts
+            if event["type"] == "chunk":
+                data = {
+                    "conversation_id": conversation_id,
+                    "delta": event["delta"],
+                    "gate_number": event.get("gate_number"),
+                }
+                yield "chunk", dumps_str(data)
+            elif event["type"] == "gate_advanced":
+                data = {
+                    "conversation_id": conversation_id,
+                    "from_gate": event.get("from_gate"),
+                    "gate_number": event["gate_number"],
+                    "gate_name": event["gate_name"],
+                }
+                yield "gate_advanced", dumps_str(data)
+            elif event["type"] == "done":
+                data = _external_payload(conversation_id, event["message"])
+                del data["role"], data["created_at"]
+                yield "done", dumps_str(data)
+    except Exception as exc:
+        code = exc.code if isinstance(exc, conv_svc.ConflictError) else "openai_error"
+        yield "error", dumps_str({
+            "error": {"code": code, "message": str(exc)},
+            "display": build_error_display(code, str(exc)),
+        })
 
+
+def _sse_response(stream: TurnStream | SpilledStream, after: int) -> EventSourceResponse:
     async def event_generator():
+        metrics.SSE_CONNECTIONS.inc()
         try:
-            async for event in quote_service.handle_message_stream(
-                conversation_id, body.message
-            ):
-                if event["type"] == "chunk":
-                    data = StreamChunkData(
-                        conversation_id=conversation_id,
-                        delta=event["delta"],
-                    )
-                    yield {"event": "chunk", "data": data.model_dump_json()}
-                elif event["type"] == "done":
-                    msg = event["message"]
-                    meta = msg.get("metadata") or {}
-                    raw_display = msg.get("display")
-                    display = DisplayObject(**raw_display) if raw_display else None
-                    data = StreamDoneData(
-                        conversation_id=conversation_id,
-                        message_id=msg["id"],
-                        content=msg["content"],
-                        response=msg.get("response"),
-                        metadata=meta,
-                        gate_number=meta.get("gate_number"),
-                        gate_name=meta.get("gate_name"),
-                        display=display,
-                    )
-                    yield {"event": "done", "data": data.model_dump_json()}
-        except Exception as exc:
-            error_data = json.dumps({
-                "error": {"code": "openai_error", "message": str(exc)},
-                "display": build_error_display("openai_error", str(exc)),
-            })
-            yield {"event": "error", "data": error_data}
-
-    return EventSourceResponse(event_generator())
+            async for seq, event, data in stream.events_after(after):
+                yield {"id": format_event_id(stream.stream_id, seq), "event": event, "data": data}
+        finally:
+            metrics.SSE_CONNECTIONS.dec()
+
+    return EventSourceResponse(event_generator(), headers={"X-Stream-Id": stream.stream_id})
+
+
+async def _record_stream_result(
+    conversation_id: str, key: str, source: AsyncIterator[tuple[str, str]],
+) -> AsyncIterator[tuple[str, str]]:
+    """Pass events through, storing the ``done`` payload under the idempotency key."""
+    done_data = None
+    try:
+        async for event, data in source:
+            if event == "done":
+                done_data = data
+            yield event, data
+    finally:
+        if done_data is not None:
+            await idempotency_store.complete(conversation_id, key, json.loads(done_data))
+        else:
+            await idempotency_store.abandon(conversation_id, key)
+
+
+async def _replay_stream(conversation_id: str, record: IdempotencyRecord) -> EventSourceResponse:
+    """Serve a retried stream POST from the original stream (on any worker)
+    or its stored result."""
+    stream = None
+    if record.stream_id and record.response is None:
+        stream = await stream_registry.find(conversation_id, record.stream_id, known=True)
+    elif record.stream_id:
+        stream = stream_registry.get(conversation_id, record.stream_id)
+    if stream is not None:
+        response = _sse_response(stream, 0)
+    elif record.response is not None:
+        async def stored():
+            yield {"event": "done", "data": dumps_str(record.response)}
+        response = EventSourceResponse(stored())
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": {
+                "code": "idempotency_in_progress",
+                "message": "A request with this Idempotency-Key is still being processed",
+            }},
+        )
+    response.headers.update(_REPLAYED)
+    return response
+
+
+@router.post("/stream", status_code=status.HTTP_200_OK)
+async def send_message_stream(
+    conversation_id: str,
+    body: SendMessageRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
+    """Stream a turn. Event ids are ``<stream_id>:<seq>``; the turn keeps
+    running if the client disconnects and can be resumed (see below).
+    A repeated ``Idempotency-Key`` attaches to the original stream."""
+    await _require_active_conversation(conversation_id)
+
+    source = _turn_events(conversation_id, body.message)
+    if idempotency_key:
+        record = await _claim_idempotency_key(conversation_id, idempotency_key, "stream", body)
+        if record is not None:
+            return await _replay_stream(conversation_id, record)
+        source = _record_stream_result(conversation_id, idempotency_key, source)
+    stream = stream_registry.start(conversation_id, source)
+    if idempotency_key:
+        await idempotency_store.attach_stream(conversation_id, idempotency_key, stream.stream_id)
+    return _sse_response(stream, 0)
+
+
+@router.get(
+    "/stream/{stream_id}",
+    status_code=status.HTTP_200_OK,
+    responses={404: {"model": ErrorResponse, "description": "Unknown or expired stream"}},
+)
+async def resume_message_stream(
+    conversation_id: str,
+    stream_id: str,
+    last_event_id: Optional[str] = Header(None),
+):
+    """Replay a streamed turn after ``Last-Event-ID`` and follow it to the end.
+    With several workers a stream produced by another one is followed from
+    the database (see ``stream_registry``)."""
+    stream = await stream_registry.find(conversation_id, stream_id)
+    if stream is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": {"code": "stream_not_found", "message": "Stream not found or expired"}},
+        )
+    last_stream, seq = parse_event_id(last_event_id)
+    if last_stream not in (None, stream_id):
+        seq = 0
+    return _sse_response(stream, seq)
@@ -0,0 +1,243 @@
+"""Content-addressed storage for gate responses.
+
+Each gate response is stored once in the ``blobs`` table keyed by the
+SHA-256 of its JSON body. Session state keeps small references instead of
+the response itself:
+
+    {"$blob": "sha256:…"}                          whole body (a JSON string)
+    {"$blob": "sha256:…", "$path": ["result_single", "items"]}
+                                                   a nested value inside it
+
+Bodies are immutable, so the in-process LRU cache never needs invalidating
+(and is safe to use from several workers sharing one database).
+
+Bodies are shared by every conversation that produced the same response,
+so they are deleted only once no conversation's state references them
+(`collect_garbage`, and `delete_unreferenced` on a hard delete). A turn
+writes its blobs before the state that references them, so only blobs
+not written for ``blob_gc_grace_seconds`` are candidates.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+import aiosqlite
+
+from .. import metrics
+from ..config import settings
+from ..database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+BLOB_REF_KEY = "$blob"
+BLOB_PATH_KEY = "$path"
+
+_CACHE_MAX = 2048
+_GC_BATCH = 500
+
+_DIGEST_RE = re.compile(r"sha256:[0-9a-f]{64}")
+
+_bodies: OrderedDict[str, str] = OrderedDict()
+_decoded: OrderedDict[str, Any] = OrderedDict()
+
+
+def blob_hash(body: str) -> str:
+    return "sha256:" + hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def make_ref(digest: str, path: Optional[list[str]] = None) -> dict[str, Any]:
+    ref: dict[str, Any] = {BLOB_REF_KEY: digest}
+    if path:
+        ref[BLOB_PATH_KEY] = path
+    return ref
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+def referenced_digests(state_json: str | None) -> set[str]:
+    """Every blob hash mentioned in a serialized session state."""
+    return set(_DIGEST_RE.findall(state_json or ""))
+
+
+def _lru_put(cache: OrderedDict, key: str, value: Any) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _CACHE_MAX:
+        cache.popitem(last=False)
+
+
+def remember(digest: str, body: str) -> None:
+    """Add a body to the in-process cache."""
+    _lru_put(_bodies, digest, body)
+
+
+def cached(digest: str) -> Optional[str]:
+    body = _bodies.get(digest)
+    if body is not None:
+        _bodies.move_to_end(digest)
+        metrics.CACHE_REQUESTS.inc("blob", "hit")
+    else:
+        metrics.CACHE_REQUESTS.inc("blob", "miss")
+    return body
+
+
+def _decode(digest: str, body: str) -> Any:
+    value = _decoded.get(digest)
+    if value is None:
+        value = json.loads(body)
+        _lru_put(_decoded, digest, value)
+    return value
+
+
+def deref(value: Any, blobs: dict[str, str]) -> Any:
+    """Resolve a blob reference against hydrated bodies; other values pass through.
+
+    A whole-body reference yields the JSON string; a path reference yields
+    the nested (decoded) value. Unknown blobs resolve to "".
+    """
+    if not is_ref(value):
+        return value
+    digest = value[BLOB_REF_KEY]
+    body = blobs.get(digest) or cached(digest)
+    if body is None:
+        return ""
+    path = value.get(BLOB_PATH_KEY)
+    if not path:
+        return body
+    node = _decode(digest, body)
+    for part in path:
+        if not isinstance(node, dict):
+            return ""
+        node = node.get(part)
+    return node
+
+
+async def put_many(blobs: dict[str, str]) -> None:
+    """Persist bodies; an existing hash only has its write time refreshed."""
+    if not blobs:
+        return
+    async with get_db_connection() as db:
+        await db.executemany(
+            """
+            INSERT INTO blobs (hash, body) VALUES (?, ?)
+            ON CONFLICT(hash) DO UPDATE SET created_at = excluded.created_at
+            """,
+            list(blobs.items()),
+        )
+        await db.commit()
+    for digest, body in blobs.items():
+        remember(digest, body)
+
+
+async def get_many(digests: Iterable[str]) -> dict[str, str]:
+    """Fetch bodies by hash, from the cache first and then the database."""
+    found: dict[str, str] = {}
+    missing: list[str] = []
+    for digest in set(digests):
+        body = cached(digest)
+        if body is None:
+            missing.append(digest)
+        else:
+            found[digest] = body
+    if missing:
+        placeholders = ",".join("?" * len(missing))
+        async with get_db_connection() as db:
+            cursor = await db.execute(
+                f"SELECT hash, body FROM blobs WHERE hash IN ({placeholders})",
+                missing,
+            )
+            for row in await cursor.fetchall():
+                found[row["hash"]] = row["body"]
+                remember(row["hash"], row["body"])
+    return found
+
+
+# ── Garbage collection ──────────────────────────────────────────────
+
+
+def _grace() -> str:
+    return f"-{int(settings.blob_gc_grace_seconds)} seconds"
+
+
+async def delete_unreferenced(db: aiosqlite.Connection, digests: Iterable[str]) -> None:
+    """Within the caller's transaction, delete those of `digests` that no
+    conversation references and that were not written recently."""
+    digests = list(digests)
+    for start in range(0, len(digests), _GC_BATCH):
+        batch = digests[start : start + _GC_BATCH]
+        placeholders = ",".join("?" * len(batch))
+        await db.execute(
+            f"""
+            DELETE FROM blobs
+            WHERE hash IN ({placeholders})
+              AND created_at < datetime('now', ?)
+              AND NOT EXISTS (
+                  SELECT 1 FROM conversations WHERE instr(config_json, blobs.hash) > 0
+              )
+            """,
+            (*batch, _grace()),
+        )
+
+
+async def collect_garbage() -> int:
+    """Delete every blob no conversation references any more. Returns the count."""
+    async with get_db_connection() as db:
+        referenced: set[str] = set()
+        cursor = await db.execute("SELECT config_json FROM conversations")
+        for row in await cursor.fetchall():
+            referenced |= referenced_digests(row["config_json"])
+        cursor = await db.execute(
+            "SELECT hash FROM blobs WHERE created_at < datetime('now', ?)", (_grace(),),
+        )
+        unreferenced = [row["hash"] for row in await cursor.fetchall() if row["hash"] not in referenced]
+        removed = 0
+        for start in range(0, len(unreferenced), _GC_BATCH):
+            batch = unreferenced[start : start + _GC_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            # Re-checked at delete time: a turn may have written one since
+            cursor = await db.execute(
+                f"DELETE FROM blobs WHERE hash IN ({placeholders}) AND created_at < datetime('now', ?)",
+                (*batch, _grace()),
+            )
+            removed += cursor.rowcount
+        await db.commit()
+    return removed
+
+
+class BlobCollector:
+    """Runs `collect_garbage` every ``blob_gc_interval_seconds``."""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and settings.blob_gc_interval_seconds > 0:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.blob_gc_interval_seconds)
+            try:
+                removed = await collect_garbage()
+                if removed:
+                    logger.info("Deleted %d unreferenced blobs", removed)
+            except Exception:
+                logger.exception("Blob garbage collection failed")
+
+
+blob_collector = BlobCollector()
@@ -0,0 +1,170 @@
+"""Cross-process advisory lock per conversation, backed by SQLite.
+
+Every worker sharing the database serialises turns on a conversation
+through a lease row in ``conversation_locks``. The holder renews the lease
+while it works; a worker that dies leaves a lease that simply expires.
+A turn that defers its gate chain hands the lock to the background task,
+so the next turn, on whichever worker, waits for the chain to land.
+
+A holder that stalls past the lease can find it taken by another turn.
+The renewer then cancels the holding task, so it stops before its next
+write, and `guard` turns that cancellation into ConversationLockLostError.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+from ..config import settings
+from ..database import get_db_connection
+from .conversation_service import ConflictError
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationBusyError(ConflictError):
+    code = "conversation_busy"
+
+
+class ConversationLockLostError(ConflictError):
+    code = "conversation_lock_lost"
+
+
+class ConversationLock:
+    def __init__(self, conversation_id: str, owner: str) -> None:
+        self.conversation_id = conversation_id
+        self.owner = owner
+        self._renewer: Optional[asyncio.Task] = None
+        self._holder: Optional[asyncio.Task] = None
+        self._handed_off = False
+        self._released = False
+        self.lost = False
+
+    def _start_renewing(self) -> None:
+        self._holder = asyncio.current_task()
+        self._renewer = asyncio.ensure_future(self._renew())
+
+    async def _renew(self) -> None:
+        interval = max(1.0, settings.conversation_lock_ttl_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with get_db_connection() as db:
+                    cursor = await db.execute(
+                        "UPDATE conversation_locks SET expires_at = ? WHERE conversation_id = ? AND owner = ?",
+                        (time.time() + settings.conversation_lock_ttl_seconds,
+                         self.conversation_id, self.owner),
+                    )
+                    await db.commit()
+            except Exception:
+                logger.exception("renewing lock on %s failed", self.conversation_id)
+                continue
+            if cursor.rowcount == 0:
+                logger.warning("lock on %s expired and was taken over", self.conversation_id)
+                self.lost = True
+                if self._holder is not None:
+                    self._holder.cancel()
+                return
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """Raise ConversationLockLostError where the holder was cancelled for a lost lease."""
+        try:
+            yield
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if not self.lost or task is not self._holder:
+                raise
+            task.uncancel()
+            raise ConversationLockLostError(
+                "The conversation was taken over by another turn; retry the turn"
+            ) from None
+
+    async def release(self) -> None:
+        """Give the lease back; does nothing once handed off to a background task."""
+        if not self._handed_off:
+            await self._release()
+
+    async def _release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._renewer is not None:
+            self._renewer.cancel()
+        async with get_db_connection() as db:
+            await db.execute(
+                "DELETE FROM conversation_locks WHERE conversation_id = ? AND owner = ?",
+                (self.conversation_id, self.owner),
+            )
+            await db.commit()
+
+    def released_after(self, coro: Awaitable[Any]) -> Awaitable[Any]:
+        """Hand the lock to `coro`: it is released when `coro` finishes, not before."""
+        self._handed_off = True
+
+        async def run() -> Any:
+            self._holder = asyncio.current_task()
+            try:
+                with self.guard():
+                    return await coro
+            finally:
+                await self._release()
+
+        return run()
+
+
+class ConversationLocks:
+    def __init__(self) -> None:
+        # Unique per process so a restarted worker never inherits a lease
+        self._owner_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def acquire(
+        self, conversation_id: str, timeout: Optional[float] = None,
+    ) -> ConversationLock:
+        """Wait for the conversation's lease; raises ConversationBusyError on timeout."""
+        owner = f"{self._owner_prefix}-{uuid.uuid4().hex[:8]}"
+        wait = settings.conversation_lock_wait_seconds if timeout is None else timeout
+        deadline = time.monotonic() + wait
+        delay = 0.02
+        while True:
+            now = time.time()
+            async with get_db_connection() as db:
+                cursor = await db.execute(
+                    """
+                    INSERT INTO conversation_locks (conversation_id, owner, expires_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(conversation_id) DO UPDATE
+                        SET owner = excluded.owner, expires_at = excluded.expires_at
+                        WHERE conversation_locks.expires_at < ?
+                    """,
+                    (conversation_id, owner, now + settings.conversation_lock_ttl_seconds, now),
+                )
+                await db.commit()
+            if cursor.rowcount == 1:
+                lock = ConversationLock(conversation_id, owner)
+                lock._start_renewing()
+                return lock
+            if time.monotonic() + delay > deadline:
+                raise ConversationBusyError(
+                    "Another turn is still running for this conversation"
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, conversation_id: str) -> AsyncIterator[ConversationLock]:
+        lock = await self.acquire(conversation_id)
+        try:
+            with lock.guard():
+                yield lock
+        finally:
+            await lock.release()
+
+
+conversation_locks = ConversationLocks()
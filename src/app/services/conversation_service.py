@@ -10,6 +10,18 @@ from typing import Any, Optional
 import aiosqlite
 
 from ..database import get_db_connection
+from . import blob_store
+from .event_bus import event_bus
+from .invalidation import TOPIC_CONVERSATION_EVENT, invalidation_bus
+
+
+class ConflictError(Exception):
+    """A concurrent change got there first (surfaced as HTTP 409)."""
+    code = "conflict"
+
+
+class SessionConflictError(ConflictError):
+    code = "session_conflict"
 
 
 def _new_id(prefix: str) -> str:
@@ -49,6 +61,16 @@ async def get_conversation(conversation_id: str) -> dict[str, Any] | None:
         return dict(row)
 
 
+async def get_conversation_version(conversation_id: str) -> dict[str, Any] | None:
+    """Return just {status, version}; version changes whenever the conversation does."""
+    async with get_db_connection() as db:
+        cursor = await db.execute(
+            "SELECT status, version FROM conversations WHERE id = ?", (conversation_id,)
+        )
+        row = await cursor.fetchone()
+        return dict(row) if row is not None else None
+
+
 async def cancel_conversation(conversation_id: str) -> dict[str, Any] | None:
     now = datetime.now(timezone.utc).isoformat()
     async with get_db_connection() as db:
@@ -59,27 +81,43 @@ async def cancel_conversation(conversation_id: str) -> dict[str, Any] | None:
         if row is None:
             return None
         await db.execute(
-            "UPDATE conversations SET status = 'cancelled', updated_at = ? WHERE id = ?",
+            "UPDATE conversations SET status = 'cancelled', updated_at = ?, version = version + 1 WHERE id = ?",
             (now, conversation_id),
         )
+        event = {"type": "status", "status": "cancelled"}
+        await invalidation_bus.stage(
+            db, TOPIC_CONVERSATION_EVENT, {"conversation_id": conversation_id, "event": event},
+        )
         await db.commit()
+    event_bus.publish(conversation_id, event)
     return {"conversation_id": conversation_id, "status": "cancelled"}
 
 
+# Rows keyed by conversation, deleted along with it
+_DEPENDENT_TABLES = (
+    "messages", "stream_events", "idempotency_keys", "conversation_locks", "websocket_tickets",
+)
+
+
 async def hard_delete_conversation(conversation_id: str) -> dict[str, Any] | None:
+    """Delete the conversation, every row keyed by it, and the blobs only it referenced."""
     async with get_db_connection() as db:
         cursor = await db.execute(
-            "SELECT id FROM conversations WHERE id = ?", (conversation_id,)
+            "SELECT config_json FROM conversations WHERE id = ?", (conversation_id,)
         )
         row = await cursor.fetchone()
         if row is None:
             return None
-        await db.execute(
-            "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
-        )
+        for table in _DEPENDENT_TABLES:
+            await db.execute(
+                f"DELETE FROM {table} WHERE conversation_id = ?", (conversation_id,)
+            )
         await db.execute(
             "DELETE FROM conversations WHERE id = ?", (conversation_id,)
         )
+        await blob_store.delete_unreferenced(
+            db, blob_store.referenced_digests(row["config_json"]),
+        )
         await db.commit()
     return {"conversation_id": conversation_id, "status": "deleted"}
 
@@ -93,14 +131,26 @@ async def add_message(
     content: str,
     response_json: dict[str, Any] | None = None,
     metadata_json: dict[str, Any] | None = None,
+    display_json: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     msg_id = _new_id("msg")
     now = datetime.now(timezone.utc).isoformat()
+    msg = {
+        "id": msg_id,
+        "conversation_id": conversation_id,
+        "role": role,
+        "content": content,
+        "response": response_json,
+        "metadata": metadata_json or {},
+        "display": display_json,
+        "created_at": now,
+    }
+    event = {"type": "message", "message": msg}
     async with get_db_connection() as db:
         await db.execute(
             """
-            INSERT INTO messages (id, conversation_id, role, content, response_json, metadata_json, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO messages (id, conversation_id, role, content, response_json, metadata_json, display_json, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 msg_id,
@@ -109,26 +159,28 @@ async def add_message(
                 content,
                 json.dumps(response_json) if response_json else None,
                 json.dumps(metadata_json or {}),
+                json.dumps(display_json) if display_json else None,
                 now,
             ),
         )
+        await db.execute(
+            "UPDATE conversations SET version = version + 1 WHERE id = ?",
+            (conversation_id,),
+        )
+        await invalidation_bus.stage(
+            db, TOPIC_CONVERSATION_EVENT, {"conversation_id": conversation_id, "event": event},
+        )
         await db.commit()
-    return {
-        "id": msg_id,
-        "conversation_id": conversation_id,
-        "role": role,
-        "content": content,
-        "response": response_json,
-        "metadata": metadata_json or {},
-        "created_at": now,
-    }
+    event_bus.publish(conversation_id, event)
+    return msg
 
 
-async def get_messages(
+async def get_message_rows(
     conversation_id: str,
     after: str | None = None,
     limit: int = 50,
 ) -> list[dict[str, Any]]:
+    """Return message rows with the *_json columns still encoded."""
     async with get_db_connection() as db:
         if after:
             cursor = await db.execute(
@@ -151,43 +203,81 @@ async def get_messages(
                 """,
                 (conversation_id, limit),
             )
-        rows = await cursor.fetchall()
-        results = []
-        for row in rows:
-            d = dict(row)
-            d["response"] = json.loads(d.pop("response_json")) if d.get("response_json") else None
-            d["metadata"] = json.loads(d.pop("metadata_json")) if d.get("metadata_json") else None
-            results.append(d)
-        return results
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def get_messages(
+    conversation_id: str,
+    after: str | None = None,
+    limit: int = 50,
+) -> list[dict[str, Any]]:
+    results = []
+    for d in await get_message_rows(conversation_id, after=after, limit=limit):
+        d["response"] = json.loads(d.pop("response_json")) if d.get("response_json") else None
+        d["metadata"] = json.loads(d.pop("metadata_json")) if d.get("metadata_json") else None
+        d["display"] = json.loads(d.pop("display_json")) if d.get("display_json") else None
+        results.append(d)
+    return results
 
 
 async def get_session_state(conversation_id: str) -> dict[str, Any]:
     """Read session state from the conversation's config_json column."""
+    state, _ = await get_versioned_session_state(conversation_id)
+    return state
+
+
+async def get_versioned_session_state(conversation_id: str) -> tuple[dict[str, Any], int]:
+    """Session state plus the state_version to pass back to `update_session_state`."""
     async with get_db_connection() as db:
         cursor = await db.execute(
-            "SELECT config_json FROM conversations WHERE id = ?",
+            "SELECT config_json, state_version FROM conversations WHERE id = ?",
             (conversation_id,),
         )
         row = await cursor.fetchone()
         if row is None:
-            return {}
+            return {}, 0
         raw = row["config_json"]
-        if not raw:
-            return {}
-        return json.loads(raw)
+        return (json.loads(raw) if raw else {}), row["state_version"]
+
+
+async def get_registry_version(conversation_id: str) -> str | None:
+    """The gate registry version recorded in the conversation's session state."""
+    async with get_db_connection() as db:
+        cursor = await db.execute(
+            "SELECT json_extract(config_json, '$.registry_version') AS version "
+            "FROM conversations WHERE id = ?",
+            (conversation_id,),
+        )
+        row = await cursor.fetchone()
+        return row["version"] if row is not None else None
 
 
 async def update_session_state(
-    conversation_id: str, state_dict: dict[str, Any]
+    conversation_id: str,
+    state_dict: dict[str, Any],
+    expected_version: int | None = None,
 ) -> None:
-    """Write session state back to the conversation's config_json column."""
+    """Write session state back to the conversation's config_json column.
+
+    With `expected_version` the write only applies if nobody else has
+    written since that version was read; otherwise SessionConflictError.
+    """
     now = datetime.now(timezone.utc).isoformat()
+    sql = (
+        "UPDATE conversations SET config_json = ?, updated_at = ?, version = version + 1, "
+        "state_version = state_version + 1 WHERE id = ?"
+    )
+    params: tuple[Any, ...] = (json.dumps(state_dict), now, conversation_id)
+    if expected_version is not None:
+        sql += " AND state_version = ?"
+        params += (expected_version,)
     async with get_db_connection() as db:
-        await db.execute(
-            "UPDATE conversations SET config_json = ?, updated_at = ? WHERE id = ?",
-            (json.dumps(state_dict), now, conversation_id),
-        )
+        cursor = await db.execute(sql, params)
         await db.commit()
+    if expected_version is not None and cursor.rowcount == 0:
+        raise SessionConflictError(
+            "Session state was changed by another request; retry the turn"
+        )
 
 
 async def get_conversation_history(conversation_id: str) -> list[dict[str, str]]:
@@ -199,3 +289,10 @@ async def get_conversation_history(conversation_id: str) -> list[dict[str, str]]
         )
         rows = await cursor.fetchall()
         return [{"role": row["role"], "content": row["content"]} for row in rows]
+
+
+# Events for this worker's subscribers that were written by another worker
+invalidation_bus.subscribe(
+    TOPIC_CONVERSATION_EVENT,
+    lambda payload: event_bus.publish(payload["conversation_id"], payload["event"]),
+)
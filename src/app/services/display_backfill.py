@@ -0,0 +1,115 @@
+"""Fill in display_json for assistant messages stored before it existed.
+
+Runs in the background on the first worker to start after a deploy (the
+others see the claim in ``maintenance_runs`` and skip it) and can also be
+run by hand:
+
+    python -m src.app.services.display_backfill
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any
+
+from ..database import get_db_connection, init_db
+from . import maintenance
+from .display_builder import build_display, build_error_display
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+RUN_NAME = "display_backfill"
+# How long a claim holds before another worker may take over a run that
+# died; also the supervisor timeout for the run itself
+RUN_LEASE_SECONDS = 3600.0
+
+
+def rebuild_display(row: dict[str, Any]) -> dict[str, Any]:
+    """Reconstruct the display a stored assistant message was served with."""
+    parsed = json.loads(row["response_json"]) if row["response_json"] else None
+    metadata = json.loads(row["metadata_json"]) if row["metadata_json"] else {}
+    if "gate_number" not in metadata and metadata.get("next_gate_error"):
+        # Failed background chain (see quote_service._deliver_next_gate)
+        return build_error_display("openai_error", metadata["next_gate_error"])
+    return build_display(
+        parsed=parsed if isinstance(parsed, dict) else None,
+        raw_text=row["content"],
+        # Chained deliveries were rendered without their own advance metadata
+        metadata={} if "chained_from_gate" in metadata else metadata,
+        gate_number=metadata.get("gate_number", 0),
+        gate_name=metadata.get("gate_name", ""),
+    )
+
+
+async def backfill_displays(batch_size: int = BATCH_SIZE) -> int:
+    """Store a display for every assistant message missing one. Returns the count."""
+    total = 0
+    while True:
+        async with get_db_connection() as db:
+            cursor = await db.execute(
+                """
+                SELECT id, conversation_id, content, response_json, metadata_json FROM messages
+                WHERE role = 'assistant' AND display_json IS NULL
+                LIMIT ?
+                """,
+                (batch_size,),
+            )
+            rows = await cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                try:
+                    display = rebuild_display(dict(row))
+                except (ValueError, TypeError, KeyError) as e:
+                    logger.warning("Display backfill failed for %s: %s", row["id"], e)
+                    display = build_error_display("display_unavailable", "Display unavailable")
+                updates.append((json.dumps(display), row["id"]))
+            await db.executemany(
+                "UPDATE messages SET display_json = ? WHERE id = ?", updates,
+            )
+            # Cached reads of these conversations are keyed on their version
+            await db.executemany(
+                "UPDATE conversations SET version = version + 1 WHERE id = ?",
+                [(cid,) for cid in {row["conversation_id"] for row in rows}],
+            )
+            await db.commit()
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+        await asyncio.sleep(0)
+    if total:
+        logger.info("Backfilled display for %d messages", total)
+    return total
+
+
+async def backfill_once() -> int:
+    """`backfill_displays` unless another worker has claimed or completed it.
+
+    A worker that dies mid-run leaves a claim that expires, and the next
+    worker to start picks the run up again.
+    """
+    owner = await maintenance.claim(RUN_NAME, RUN_LEASE_SECONDS)
+    if owner is None:
+        return 0
+    try:
+        total = await backfill_displays()
+    except BaseException:
+        # Let the next worker to start retry rather than wait out the lease
+        await maintenance.release(RUN_NAME, owner)
+        raise
+    await maintenance.complete(RUN_NAME, owner)
+    return total
+
+
+async def _main() -> None:
+    await init_db()
+    count = await backfill_displays()
+    print(f"Backfilled {count} messages")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -5,12 +5,99 @@ from __future__ import annotations
 import re
 from typing import Any, Optional
 
-# Regex: "A) Label" or "A. Label" or "A- Label" anywhere in text
-# Lookahead detects next option separated by comma, newline, or space
+# Options: "A) label" up to the next marker. Fast for question-sized text,
+# but each lookahead rescans the whitespace ahead of it, so time grows with
+# the square of the longest whitespace run.
 _OPTION_RE = re.compile(
     r"(?:^|[\s,;])\s*([A-Z])\s*[).\-]\s*(.+?)(?=\s+[A-Z]\s*[).\-]\s|[,;]\s*[A-Z]\s*[).\-]|\n\s*[A-Z]\s*[).\-]|$)",
     re.DOTALL,
 )
+# The regex is used for question-sized text without a long whitespace run;
+# longer text goes to the linear scanner, which is also the faster of the
+# two on long prose
+_MAX_REGEX_CHARS = 512
+_MAX_REGEX_WS_RUN = 16
+_LONG_WS_RE = re.compile(r"\s{%d}" % (_MAX_REGEX_WS_RUN + 1))
+
+# Option markers: a capital letter followed by ")", "." or "-" ("A)", "B .").
+# Neither pattern can backtrack, so the scan below is linear in the text.
+_MARKER_RE = re.compile(r"[A-Z]\s*[).\-]")
+_WS_RE = re.compile(r"\s*")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Characters that may precede an option marker
+_OPTION_PREFIX = ",;"
+
+
+def _regex_options(text: str) -> Optional[list[tuple[str, str]]]:
+    """(letter, raw label) pairs via `_OPTION_RE`; None if the letters skip."""
+    matches = _OPTION_RE.findall(text)
+    for i, (letter, _) in enumerate(matches):
+        if letter != chr(ord("A") + i):
+            return None
+    return matches
+
+
+def _scan_options(text: str) -> Optional[list[tuple[str, str]]]:
+    """Split text into (letter, raw label) pairs in a single left-to-right pass.
+
+    Gives the same pairs as `_regex_options` in time linear in the text. An
+    option is a marker at the start of the text or after whitespace,
+    "," or ";"; its label runs to the next marker preceded by "," / ";",
+    a newline, or whitespace (in which case the marker must itself be
+    followed by whitespace), or to the end of the text. Returns None as soon
+    as a letter breaks the A, B, C... sequence.
+    """
+    n = len(text)
+    markers: list[tuple[int, int, int]] = []     # (letter, separator, run start)
+    prev_end = 0
+    for m in _MARKER_RE.finditer(text):
+        r = m.start()
+        gap = text[prev_end:r]
+        markers.append((r, m.end() - 1, prev_end + len(gap.rstrip())))
+        prev_end = m.end()
+
+    def _terminates_at(j: int, label_start: int) -> Optional[int]:
+        """Earliest label end that marker j allows, or None."""
+        r, sep, run = markers[j]
+        if run - 1 > label_start and text[run - 1] in _OPTION_PREFIX:
+            return run - 1
+        if run < r and sep + 1 < n and text[sep + 1].isspace():
+            return run
+        newline = text.find("\n", run, r)
+        return newline if newline >= 0 else None
+
+    matches: list[tuple[str, str]] = []
+    pos = 0
+    i = 0
+    while i < len(markers):
+        r, sep, _ = markers[i]
+        i += 1
+        # Needs a prefix character at or after the search position (or the
+        # start of the text) and at least one character of label
+        if r < pos or (r == pos and r > 0) or sep + 1 >= n:
+            continue
+        if r > 0 and not (text[r - 1].isspace() or text[r - 1] in _OPTION_PREFIX):
+            continue
+        if text[r] != chr(ord("A") + len(matches)):
+            return None
+
+        label_start = _WS_RE.match(text, sep + 1).end()
+        if label_start == n:
+            label_start = n - 1
+        end = None
+        while i < len(markers) and markers[i][0] <= label_start:
+            i += 1
+        while i < len(markers):
+            end = _terminates_at(i, label_start)
+            if end is not None:
+                break
+            i += 1
+        if end is None:
+            end = n - 1 if text.endswith("\n") and n - 1 > label_start else n
+        matches.append((text[r], text[label_start:end]))
+        pos = end
+    return matches
 
 
 def parse_options(text: str) -> list[dict[str, str]]:
@@ -19,20 +106,17 @@ def parse_options(text: str) -> list[dict[str, str]]:
     Validates that letters start from A and are consecutive to avoid false positives.
     Returns list of {"key": "A", "label": "R-Blade", "value": "r_blade"}.
     """
-    matches = _OPTION_RE.findall(text)
+    if len(text) <= _MAX_REGEX_CHARS and not _LONG_WS_RE.search(text):
+        matches = _regex_options(text)
+    else:
+        matches = _scan_options(text)
     if not matches:
         return []
 
-    # Validate consecutive letters starting from A
-    for i, (letter, _) in enumerate(matches):
-        expected = chr(ord("A") + i)
-        if letter != expected:
-            return []
-
     options = []
     for letter, label in matches:
         label = label.strip().rstrip(",")
-        value = re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+        value = _NON_ALNUM_RE.sub("_", label.lower()).strip("_")
         options.append({"key": letter, "label": label, "value": value})
     return options
 
@@ -85,6 +169,13 @@ def build_display(
         # Parse options from the next gate's message
         options = parse_options(message)
         status = _resolve_status(next_resp if isinstance(next_resp, dict) else None)
+    elif advanced_to and metadata.get("pending_next_gate"):
+        # Gate advanced; the next gate is being fetched in the background
+        eff_gate_number = advanced_to
+        eff_gate_name = f"Gate {advanced_to}"
+        message = "Moving to next step..."
+        options = []
+        status = "pending"
     elif advanced_to and next_gate_error:
         # Gate advanced but auto-fetch failed
         eff_gate_number = advanced_to
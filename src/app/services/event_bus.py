@@ -0,0 +1,97 @@
+"""In-process publish/subscribe for conversation events.
+
+`conversation_service` publishes every stored message; WebSocket and
+long-poll subscribers (see ``routers.events``) receive them without polling
+the database. Each subscriber has a bounded queue: when a slow consumer
+falls behind, the oldest events are dropped and it is told to resync from
+the message listing instead of growing memory without limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from typing import Any, Iterator, Optional
+
+from .. import metrics
+from ..config import settings
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscription:
+    """One subscriber's view of a conversation's event stream."""
+
+    __slots__ = ("conversation_id", "_queue", "_lagged")
+
+    def __init__(self, conversation_id: str, maxsize: int) -> None:
+        self.conversation_id = conversation_id
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize)
+        self._lagged = False
+
+    def offer(self, event: dict[str, Any]) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._lagged = True
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict[str, Any]]:
+        """Next event, `RESYNC_EVENT` after an overflow, or None on timeout."""
+        if self._lagged:
+            self._lagged = False
+            return RESYNC_EVENT
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self) -> list[dict[str, Any]]:
+        """Return whatever is queued right now without waiting."""
+        events = [RESYNC_EVENT] if self._lagged else []
+        self._lagged = False
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return events
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[Subscription]] = {}
+
+    def subscribe(self, conversation_id: str, maxsize: Optional[int] = None) -> Subscription:
+        sub = Subscription(conversation_id, maxsize or settings.event_subscriber_buffer)
+        self._subscribers.setdefault(conversation_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.conversation_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.conversation_id]
+
+    @contextlib.contextmanager
+    def subscription(self, conversation_id: str) -> Iterator[Subscription]:
+        sub = self.subscribe(conversation_id)
+        try:
+            yield sub
+        finally:
+            self.unsubscribe(sub)
+
+    def publish(self, conversation_id: str, event: dict[str, Any]) -> int:
+        """Deliver `event` to every subscriber of the conversation; returns the count."""
+        subs = self._subscribers.get(conversation_id)
+        if not subs:
+            return 0
+        for sub in tuple(subs):
+            sub.offer(event)
+        return len(subs)
+
+    def subscriber_count(self, conversation_id: Optional[str] = None) -> int:
+        if conversation_id is not None:
+            return len(self._subscribers.get(conversation_id, ()))
+        return sum(len(subs) for subs in self._subscribers.values())
+
+
+event_bus = EventBus()
+metrics.EVENT_SUBSCRIBERS.set_function(event_bus.subscriber_count)
@@ -0,0 +1,220 @@
+"""Dependency-aware prefetching of gates a chain is about to reach.
+
+A gate call is sent the conversation history, so a prefetch can only be
+used if no user message arrives in between: that is, along a run of gates
+that answer without asking anything and so chain straight on. The
+scheduler learns which gates do that from their chained outcomes, and
+while the chain resolves one of them it fetches the following gates of
+the run concurrently, as long as every gate they depend on has completed.
+The chain in ``quote_service`` still consumes results strictly in sequence
+order, and only uses a prefetch if its data inputs and history are still
+those of the call it would make now. Advisory inputs (``quote_context``)
+are left out of that comparison: they grow after every gate, and replay
+planning ignores them for the same reason.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import time
+from typing import AsyncGenerator, Optional
+
+from .. import metrics
+from ..config import settings
+from ..gates.models import GateConfig, GateStatus
+from ..gates.registry import active_registry, dependency_keys, gate_dependencies
+from ..gates.session_state import SessionState
+from . import conversation_service as conv_svc
+from . import openai_service
+from .invalidation import TOPIC_PREFETCH_DISCARD, invalidation_bus
+from .orchestrator import orchestrator
+
+
+History = list[dict[str, str]]
+
+
+@dataclasses.dataclass
+class _Prefetch:
+    task: asyncio.Task   # resolves to (history it was sent, response text)
+    fingerprint: tuple
+    created_at: float
+
+
+def _fingerprint(gate: GateConfig, variables: dict[str, str]) -> tuple:
+    """Identify a prefetch by prompt and the data inputs it was sent with."""
+    inputs = sorted((name, variables.get(name)) for name in dependency_keys(gate))
+    return (gate.prompt_id, gate.prompt_version, tuple(inputs))
+
+
+async def _call(gate: GateConfig, variables: dict[str, str], history: History) -> str:
+    return await openai_service.call_prompt(
+        prompt_id=gate.prompt_id,
+        messages=history,
+        variables=variables or None,
+        version=gate.prompt_version,
+    )
+
+
+async def _prefetch(
+    conversation_id: str, gate: GateConfig, variables: dict[str, str],
+) -> tuple[History, str]:
+    history = await conv_svc.get_conversation_history(conversation_id)
+    return history, await _call(gate, variables, history)
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+class GateScheduler:
+    """Per-process store of in-flight / completed gate prefetches."""
+
+    def __init__(self) -> None:
+        self._pending: dict[str, dict[int, _Prefetch]] = {}
+        # Prompt → whether its last chained call completed the gate unasked
+        self._auto_completes: dict[tuple, bool] = {}
+
+    def record_outcome(self, gate: GateConfig, advanced: bool) -> None:
+        """Note whether a chained call to `gate` completed it without a question."""
+        self._auto_completes[(gate.prompt_id, gate.prompt_version)] = advanced
+
+    def _auto_completes_gate(self, gate: GateConfig) -> bool:
+        return self._auto_completes.get((gate.prompt_id, gate.prompt_version), False)
+
+    def ready_gates(self, session: SessionState) -> list[int]:
+        """Upcoming active gates the chain reaches with no user turn in between
+        (every active gate before them auto-completes) and whose dependencies
+        have all completed."""
+        seq = session.gate_sequence
+        try:
+            idx = seq.index(session.current_gate)
+        except ValueError:
+            return []
+        completed = set(seq[:idx])
+        registry = active_registry().gates
+        ready: list[int] = []
+        previous = registry.get(session.current_gate)
+        for number in seq[idx + 1 :]:
+            if len(ready) >= settings.gate_prefetch_window:
+                break
+            gate = registry.get(number)
+            if gate is None or gate.status != GateStatus.ACTIVE:
+                continue
+            if previous is None or not self._auto_completes_gate(previous):
+                break
+            if gate_dependencies(number) <= completed:
+                ready.append(number)
+            previous = gate
+        return ready
+
+    def prefetch_ready(self, conversation_id: str, session: SessionState) -> list[int]:
+        """Start background fetches for every ready gate not already pending."""
+        self._sweep()
+        pending = self._pending.setdefault(conversation_id, {})
+        started: list[int] = []
+        for number in self.ready_gates(session):
+            if number in pending:
+                continue
+            gate = active_registry().gates[number]
+            variables = orchestrator.resolve_variables(gate, session)
+            task = asyncio.ensure_future(_prefetch(conversation_id, gate, variables))
+            task.add_done_callback(_consume_exception)
+            pending[number] = _Prefetch(task, _fingerprint(gate, variables), time.monotonic())
+            started.append(number)
+        return started
+
+    async def fetch(
+        self, conversation_id: str, gate: GateConfig, variables: dict[str, str],
+    ) -> str:
+        """Return the gate's response from a matching prefetch or a fresh call.
+
+        The opening cache is not consulted: its answers were built without
+        any conversation history, which a chained gate always has.
+        """
+        history = await conv_svc.get_conversation_history(conversation_id)
+        text = await self._use_prefetch(conversation_id, gate, variables, history)
+        if text is not None:
+            return text
+        return await _call(gate, variables, history)
+
+    async def stream(
+        self, conversation_id: str, gate: GateConfig, variables: dict[str, str],
+    ) -> AsyncGenerator[str, None]:
+        """Streaming counterpart of `fetch`: prefetched text arrives as one delta."""
+        history = await conv_svc.get_conversation_history(conversation_id)
+        text = await self._use_prefetch(conversation_id, gate, variables, history)
+        if text is not None:
+            yield text
+            return
+        async for delta in openai_service.stream_prompt(
+            prompt_id=gate.prompt_id,
+            messages=history,
+            variables=variables or None,
+            version=gate.prompt_version,
+        ):
+            yield delta
+
+    async def _use_prefetch(
+        self,
+        conversation_id: str,
+        gate: GateConfig,
+        variables: dict[str, str],
+        history: History,
+    ) -> Optional[str]:
+        """Take the gate's prefetch and return its text if it is still the
+        answer to (variables, history); None means make the call."""
+        entry = self._take(conversation_id, gate.number)
+        text: Optional[str] = None
+        if entry is not None:
+            if entry.fingerprint == _fingerprint(gate, variables) and not self._expired(entry):
+                try:
+                    sent, result = await entry.task
+                except Exception:
+                    pass  # fall back to a fresh call
+                else:
+                    if sent == history:
+                        text = result
+            else:
+                entry.task.cancel()
+        metrics.CACHE_REQUESTS.inc("prefetch", "miss" if text is None else "hit")
+        return text
+
+    async def discard_everywhere(self, conversation_id: str) -> None:
+        """`discard` here and in every other worker."""
+        self.discard(conversation_id)
+        await invalidation_bus.publish(TOPIC_PREFETCH_DISCARD, {"conversation_id": conversation_id})
+
+    def discard(self, conversation_id: str) -> None:
+        """Cancel and forget every prefetch for a conversation."""
+        for entry in self._pending.pop(conversation_id, {}).values():
+            entry.task.cancel()
+
+    def _take(self, conversation_id: str, number: int) -> Optional[_Prefetch]:
+        pending = self._pending.get(conversation_id)
+        if not pending:
+            return None
+        entry = pending.pop(number, None)
+        if not pending:
+            del self._pending[conversation_id]
+        return entry
+
+    @staticmethod
+    def _expired(entry: _Prefetch) -> bool:
+        return time.monotonic() - entry.created_at > settings.gate_prefetch_ttl_seconds
+
+    def _sweep(self) -> None:
+        """Drop expired prefetches (abandoned conversations)."""
+        for conv_id in list(self._pending):
+            pending = self._pending[conv_id]
+            for number in [n for n, e in pending.items() if self._expired(e)]:
+                pending.pop(number).task.cancel()
+            if not pending:
+                del self._pending[conv_id]
+
+
+gate_scheduler = GateScheduler()
+invalidation_bus.subscribe(
+    TOPIC_PREFETCH_DISCARD, lambda payload: gate_scheduler.discard(payload["conversation_id"]),
+)
@@ -0,0 +1,226 @@
+"""Idempotency keys for message POSTs.
+
+A client (or gateway) retrying ``POST /messages`` with the same
+``Idempotency-Key`` gets the stored result of the first attempt instead of
+a second user message, a second LLM call and possibly a double gate
+advance. A retry that arrives while the first attempt is still running
+attaches to it: through an in-process future when the same worker owns the
+key, otherwise by polling the table. Keys are scoped to the conversation,
+bound to a fingerprint of the request, and expire after
+``idempotency_ttl_seconds``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Optional
+
+from ..config import settings
+from ..database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL = 0.25
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_COMPLETED = "completed"
+
+
+class IdempotencyError(Exception):
+    """Raised when a key cannot be honoured; `status_code`/`code` map to the API error."""
+
+    def __init__(self, status_code: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+@dataclasses.dataclass(frozen=True)
+class IdempotencyRecord:
+    status: str
+    response: Optional[dict[str, Any]] = None
+    stream_id: Optional[str] = None
+
+
+def fingerprint(endpoint: str, body: dict[str, Any]) -> str:
+    canonical = json.dumps([endpoint, body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _record(row: Any) -> IdempotencyRecord:
+    return IdempotencyRecord(
+        status=row["status"],
+        response=json.loads(row["response_json"]) if row["response_json"] else None,
+        stream_id=row["stream_id"],
+    )
+
+
+class IdempotencyStore:
+    def __init__(self) -> None:
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def begin(
+        self, conversation_id: str, key: str, request_fingerprint: str,
+    ) -> Optional[IdempotencyRecord]:
+        """Claim `key` for this request.
+
+        Returns None when the caller now owns the key and must finish with
+        `complete`/`attach_stream` or `abandon`. Otherwise returns the record
+        of the earlier attempt, waiting for it first if it is still running.
+        Re-raises the earlier attempt's error if it failed in this process.
+        """
+        now = time.time()
+        async with get_db_connection() as db:
+            await db.execute(
+                "DELETE FROM idempotency_keys WHERE conversation_id = ? AND key = ? AND expires_at < ?",
+                (conversation_id, key, now),
+            )
+            cursor = await db.execute(
+                """
+                INSERT OR IGNORE INTO idempotency_keys
+                    (conversation_id, key, fingerprint, status, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (conversation_id, key, request_fingerprint, STATUS_IN_PROGRESS,
+                 now + settings.idempotency_ttl_seconds),
+            )
+            await db.commit()
+            if cursor.rowcount == 1:
+                self._inflight[(conversation_id, key)] = asyncio.get_running_loop().create_future()
+                return None
+            row = await self._fetch(db, conversation_id, key)
+
+        if row is None:
+            # Owner abandoned it between our insert and select; try again
+            return await self.begin(conversation_id, key, request_fingerprint)
+        if row["fingerprint"] != request_fingerprint:
+            raise IdempotencyError(
+                422, "idempotency_key_mismatch",
+                "Idempotency-Key was already used with a different request",
+            )
+        record = _record(row)
+        if record.status == STATUS_COMPLETED or record.stream_id is not None:
+            return record
+        return await self._wait(conversation_id, key, request_fingerprint)
+
+    async def _wait(self, conversation_id: str, key: str, request_fingerprint: str) -> IdempotencyRecord:
+        deadline = time.monotonic() + settings.idempotency_wait_seconds
+        future = self._inflight.get((conversation_id, key))
+        if future is not None:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(future), settings.idempotency_wait_seconds,
+                )
+            except asyncio.TimeoutError:
+                pass
+        else:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(_POLL_INTERVAL)
+                async with get_db_connection() as db:
+                    row = await self._fetch(db, conversation_id, key)
+                if row is None:
+                    return await self.begin(conversation_id, key, request_fingerprint)
+                record = _record(row)
+                if record.status == STATUS_COMPLETED or record.stream_id is not None:
+                    return record
+        raise IdempotencyError(
+            409, "idempotency_in_progress",
+            "A request with this Idempotency-Key is still being processed",
+        )
+
+    @staticmethod
+    async def _fetch(db: Any, conversation_id: str, key: str) -> Any:
+        cursor = await db.execute(
+            "SELECT * FROM idempotency_keys WHERE conversation_id = ? AND key = ?",
+            (conversation_id, key),
+        )
+        return await cursor.fetchone()
+
+    def _resolve(self, conversation_id: str, key: str, record: IdempotencyRecord, done: bool) -> None:
+        future = self._inflight.get((conversation_id, key))
+        if future is not None and not future.done():
+            future.set_result(record)
+        if done:
+            self._inflight.pop((conversation_id, key), None)
+
+    async def attach_stream(self, conversation_id: str, key: str, stream_id: str) -> None:
+        """Record the stream serving `key`; retries attach to it from now on."""
+        async with get_db_connection() as db:
+            await db.execute(
+                "UPDATE idempotency_keys SET stream_id = ? WHERE conversation_id = ? AND key = ?",
+                (stream_id, conversation_id, key),
+            )
+            await db.commit()
+        self._resolve(
+            conversation_id, key,
+            IdempotencyRecord(status=STATUS_IN_PROGRESS, stream_id=stream_id), done=False,
+        )
+
+    async def complete(self, conversation_id: str, key: str, response: dict[str, Any]) -> None:
+        async with get_db_connection() as db:
+            await db.execute(
+                """
+                UPDATE idempotency_keys SET status = ?, response_json = ?
+                WHERE conversation_id = ? AND key = ?
+                """,
+                (STATUS_COMPLETED, json.dumps(response), conversation_id, key),
+            )
+            await db.commit()
+        self._resolve(
+            conversation_id, key,
+            IdempotencyRecord(status=STATUS_COMPLETED, response=response), done=True,
+        )
+
+    async def abandon(self, conversation_id: str, key: str, exc: Optional[BaseException] = None) -> None:
+        """Release a key whose request failed, so a later retry recomputes."""
+        async with get_db_connection() as db:
+            await db.execute(
+                "DELETE FROM idempotency_keys WHERE conversation_id = ? AND key = ?",
+                (conversation_id, key),
+            )
+            await db.commit()
+        future = self._inflight.pop((conversation_id, key), None)
+        if future is not None and not future.done():
+            future.set_exception(exc or RuntimeError("Request abandoned"))
+            # Retrieved here so an unawaited failure isn't logged as lost
+            future.exception()
+
+    async def purge_expired(self) -> int:
+        async with get_db_connection() as db:
+            cursor = await db.execute(
+                "DELETE FROM idempotency_keys WHERE expires_at < ?", (time.time(),),
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    # ── Cleanup loop ────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                removed = await self.purge_expired()
+                if removed:
+                    logger.info("Purged %d expired idempotency keys", removed)
+            except Exception:
+                logger.exception("Idempotency key cleanup failed")
+            await asyncio.sleep(settings.idempotency_cleanup_seconds)
+
+
+idempotency_store = IdempotencyStore()
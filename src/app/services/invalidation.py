@@ -0,0 +1,125 @@
+"""Cross-worker signals through an ``invalidations`` table.
+
+With several workers on one database, in-process state (event-bus
+subscribers, the gate registry, prefetched gate responses) can go stale
+when another worker changes things. Writers append a row per signal;
+every worker polls for rows from other workers and hands them to the
+handlers subscribed to the topic. With a single worker nothing is
+written or polled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+import aiosqlite
+
+from ..config import settings
+from ..database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict[str, Any]], Any]
+
+TOPIC_CONVERSATION_EVENT = "conversation_event"
+TOPIC_REGISTRY_RELOAD = "registry_reload"
+TOPIC_PREFETCH_DISCARD = "prefetch_discard"
+
+
+class InvalidationBus:
+    def __init__(self) -> None:
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: dict[str, list[Handler]] = {}
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.workers > 1
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        """Call `handler(payload)` (sync or async) for signals from other workers."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def stage(self, db: aiosqlite.Connection, topic: str, payload: dict[str, Any]) -> None:
+        """Queue a signal on an open connection; it is sent when that transaction commits."""
+        if self.enabled:
+            await db.execute(
+                "INSERT INTO invalidations (topic, payload, origin, created_at) VALUES (?, ?, ?, ?)",
+                (topic, json.dumps(payload), self.origin, time.time()),
+            )
+
+    async def publish(self, topic: str, payload: dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        async with get_db_connection() as db:
+            await self.stage(db, topic, payload)
+            await db.commit()
+
+    async def start(self) -> None:
+        """Start polling from the newest existing signal (older ones are history)."""
+        if not self.enabled or self._task is not None:
+            return
+        async with get_db_connection() as db:
+            cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM invalidations")
+            self._last_id = (await cursor.fetchone())[0]
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.invalidation_poll_seconds)
+            try:
+                await self.poll()
+                if time.monotonic() - last_purge >= settings.invalidation_retention_seconds:
+                    last_purge = time.monotonic()
+                    await self._purge()
+            except Exception:
+                logger.exception("invalidation poll failed")
+
+    async def poll(self) -> int:
+        """Dispatch signals written by other workers since the last poll."""
+        async with get_db_connection() as db:
+            cursor = await db.execute(
+                "SELECT id, topic, payload, origin FROM invalidations WHERE id > ? ORDER BY id ASC",
+                (self._last_id,),
+            )
+            rows = await cursor.fetchall()
+        dispatched = 0
+        for row in rows:
+            self._last_id = row["id"]
+            if row["origin"] == self.origin:
+                continue
+            payload = json.loads(row["payload"])
+            for handler in self._handlers.get(row["topic"], ()):
+                try:
+                    result = handler(payload)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception:
+                    logger.exception("invalidation handler for %s failed", row["topic"])
+            dispatched += 1
+        return dispatched
+
+    async def _purge(self) -> None:
+        async with get_db_connection() as db:
+            await db.execute(
+                "DELETE FROM invalidations WHERE created_at < ?",
+                (time.time() - settings.invalidation_retention_seconds,),
+            )
+            await db.commit()
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,58 @@
+"""Deployment-wide maintenance runs, claimed through lease rows.
+
+Work that should happen once for every worker sharing the database (the
+display backfill, warming the opening cache) first claims a row in
+``maintenance_runs``. The first worker to claim it does the work; the
+others see the claim and skip it. A claim expires after its lease, so a
+worker that dies mid-run, or periodic work whose period is over, is picked
+up by whichever worker tries next. A completed run is never claimed again.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from typing import Optional
+
+from ..database import get_db_connection
+
+
+async def claim(name: str, lease_seconds: float) -> Optional[str]:
+    """Claim run `name` for `lease_seconds`; returns the owner token, or None
+    if another worker holds it or it has completed."""
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    now = time.time()
+    async with get_db_connection() as db:
+        cursor = await db.execute(
+            """
+            INSERT INTO maintenance_runs (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE maintenance_runs.completed_at IS NULL
+                  AND maintenance_runs.expires_at < ?
+            """,
+            (name, owner, now + lease_seconds, now),
+        )
+        await db.commit()
+    return owner if cursor.rowcount == 1 else None
+
+
+async def complete(name: str, owner: str) -> None:
+    """Mark the run done for good."""
+    async with get_db_connection() as db:
+        await db.execute(
+            "UPDATE maintenance_runs SET completed_at = ? WHERE name = ? AND owner = ?",
+            (time.time(), name, owner),
+        )
+        await db.commit()
+
+
+async def release(name: str, owner: str) -> None:
+    """Drop an unfinished claim so the next worker to try can run it now."""
+    async with get_db_connection() as db:
+        await db.execute(
+            "DELETE FROM maintenance_runs WHERE name = ? AND owner = ? AND completed_at IS NULL",
+            (name, owner),
+        )
+        await db.commit()
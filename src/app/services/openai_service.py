@@ -8,12 +8,17 @@ don't block the FastAPI event loop.
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
+import time
 from typing import Any, AsyncGenerator, Optional
 
 from openai import OpenAI
 
+from .. import metrics
 from ..config import settings
+from ..gates.registry import RegistrySnapshot, active_registry
+from ..tracing import span
 
 
 def _build_client() -> OpenAI:
@@ -22,6 +27,33 @@ def _build_client() -> OpenAI:
 
 _client: OpenAI | None = None
 
+# Calls currently queued for or running on OpenAI (read by admission control)
+_inflight = 0
+
+
+def inflight_calls() -> int:
+    return _inflight
+
+
+metrics.LLM_INFLIGHT.set_function(inflight_calls)
+
+
+@functools.lru_cache(maxsize=8)
+def _prompt_gates(registry: RegistrySnapshot) -> dict[str, str]:
+    return {gate.prompt_id: str(number) for number, gate in registry.gates.items() if gate.prompt_id}
+
+
+def _gate_label(prompt_id: str) -> str:
+    """Metric label for a prompt: the gate that uses it in the active registry."""
+    return _prompt_gates(active_registry()).get(prompt_id, "unknown")
+
+
+def _record_usage(gate: str, usage: Any) -> None:
+    if usage is None:
+        return
+    metrics.LLM_TOKENS.inc(gate, "input", amount=getattr(usage, "input_tokens", 0) or 0)
+    metrics.LLM_TOKENS.inc(gate, "output", amount=getattr(usage, "output_tokens", 0) or 0)
+
 
 def get_client() -> OpenAI:
     global _client
@@ -35,8 +67,8 @@ def _call_prompt_sync(
     messages: list[dict[str, str]],
     variables: dict[str, str] | None = None,
     version: str | None = None,
-) -> str:
-    """Synchronous call to OpenAI Prompts API. Returns the output text."""
+) -> tuple[str, Any]:
+    """Synchronous call to OpenAI Prompts API. Returns the output text and usage."""
     client = get_client()
     prompt_payload: dict[str, Any] = {"id": prompt_id}
     # if version:
@@ -49,7 +81,7 @@ def _call_prompt_sync(
         stream=False,
         store=True,
     )
-    return response.output_text
+    return response.output_text, getattr(response, "usage", None)
 
 
 async def call_prompt(
@@ -59,15 +91,29 @@ async def call_prompt(
     version: str | None = None,
 ) -> str:
     """Async wrapper: run the sync OpenAI call in a thread executor."""
+    global _inflight
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        None,
-        _call_prompt_sync,
-        prompt_id,
-        messages,
-        variables,
-        version,
-    )
+    gate = _gate_label(prompt_id)
+    start = time.perf_counter()
+    _inflight += 1
+    try:
+        with span("call_prompt", gate=gate, prompt_id=prompt_id):
+            text, usage = await loop.run_in_executor(
+                None,
+                _call_prompt_sync,
+                prompt_id,
+                messages,
+                variables,
+                version,
+            )
+    except Exception:
+        metrics.LLM_ERRORS.inc(gate)
+        raise
+    finally:
+        _inflight -= 1
+        metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - start, gate, "call")
+    _record_usage(gate, usage)
+    return text
 
 
 def _stream_prompt_sync(
@@ -75,8 +121,12 @@ def _stream_prompt_sync(
     messages: list[dict[str, str]],
     variables: dict[str, str] | None = None,
     version: str | None = None,
+    usage: list[Any] | None = None,
 ):
-    """Synchronous generator that yields text deltas from OpenAI streaming."""
+    """Synchronous generator that yields text deltas from OpenAI streaming.
+
+    The final usage report, if any, is appended to `usage`.
+    """
     client = get_client()
     prompt_payload: dict[str, Any] = {"id": prompt_id}
     # if version:
@@ -91,6 +141,8 @@ def _stream_prompt_sync(
     for event in stream:
         if event.type == "response.output_text.delta":
             yield event.delta
+        elif event.type == "response.completed" and usage is not None:
+            usage.append(getattr(event.response, "usage", None))
 
 
 async def stream_prompt(
@@ -103,12 +155,18 @@ async def stream_prompt(
     import queue
     import threading
 
+    global _inflight
     q: queue.Queue[str | None] = queue.Queue()
+    usage: list[Any] = []
+    failed: list[BaseException] = []
 
     def _producer():
         try:
-            for delta in _stream_prompt_sync(prompt_id, messages, variables, version):
+            for delta in _stream_prompt_sync(prompt_id, messages, variables, version, usage):
                 q.put(delta)
+        except BaseException as exc:
+            failed.append(exc)
+            raise
         finally:
             q.put(None)  # sentinel
 
@@ -116,8 +174,26 @@ async def stream_prompt(
     thread.start()
 
     loop = asyncio.get_event_loop()
-    while True:
-        item = await loop.run_in_executor(None, q.get)
-        if item is None:
-            break
-        yield item
+    gate = _gate_label(prompt_id)
+    start = time.perf_counter()
+    first = True
+    _inflight += 1
+    try:
+        with span("stream_prompt", gate=gate, prompt_id=prompt_id) as current:
+            while True:
+                item = await loop.run_in_executor(None, q.get)
+                if item is None:
+                    break
+                if first:
+                    first = False
+                    elapsed = time.perf_counter() - start
+                    metrics.LLM_FIRST_TOKEN_SECONDS.observe(elapsed, gate)
+                    if current is not None:
+                        current.attributes["first_token_ms"] = round(elapsed * 1000, 1)
+                yield item
+    finally:
+        _inflight -= 1
+        metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - start, gate, "stream")
+        if failed:
+            metrics.LLM_ERRORS.inc(gate)
+        _record_usage(gate, usage[0] if usage else None)
@@ -0,0 +1,185 @@
+"""Precomputed opening question for the first gate, when its inputs are static.
+
+Gate 1 resolves every variable from settings (``product_options``), so its
+opening question is the same for every conversation. The response is
+precomputed per (prompt_id, prompt version, variables) from a bare start
+message, so it is only served at that point: when the whole conversation
+so far is one hello / start message, which only ever reaches the first
+gate of the sequence. Later static gates (Gate 2) are never warmed.
+
+Off by default (``opening_cache_enabled``). One worker per registry
+version and refresh period computes the responses, under a
+``maintenance_runs`` claim, and stores them in ``opening_responses``;
+every worker loads them from there. A changed prompt id or version simply
+misses the cache until the next warm, which a registry reload triggers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Any, Optional
+
+from .. import metrics
+from ..config import settings
+from ..database import get_db_connection
+from ..gates.models import GateConfig, GateStatus
+from ..gates.registry import current_registry
+from ..gates.resolvers import compile_gate
+from . import maintenance, openai_service
+
+logger = logging.getLogger(__name__)
+
+# How often every worker re-reads the stored responses (and tries to claim
+# the refresh once the current period is over)
+_LOAD_INTERVAL_SECONDS = 60.0
+
+
+@dataclasses.dataclass(frozen=True)
+class _Entry:
+    text: str
+    created_at: float
+
+
+def _cache_key(gate: GateConfig, variables: dict[str, str]) -> tuple[str, str, str]:
+    digest = hashlib.sha256(
+        json.dumps(variables, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return (gate.prompt_id or "", gate.prompt_version or "", digest)
+
+
+def _stored_key(key: tuple[str, str, str]) -> str:
+    return "|".join(key)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9 ]+", "", text.lower()).strip()
+
+
+class OpeningCache:
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, str, str], _Entry] = {}
+        self._warm_tasks: set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def servable_gates() -> list[tuple[GateConfig, dict[str, str]]]:
+        """The first active gate of the sequence, with its settings values,
+        if every variable it reads comes from settings."""
+        registry = current_registry()
+        for number in registry.sequence:
+            gate = registry.gates.get(number)
+            if gate is None or gate.status != GateStatus.ACTIVE or not gate.prompt_id:
+                continue
+            resolver = compile_gate(gate)
+            return [] if resolver.dynamic else [(gate, dict(resolver.static))]
+        return []
+
+    def get(self, gate: GateConfig, variables: dict[str, str]) -> Optional[str]:
+        """Return the cached opening response, if one is loaded."""
+        if not settings.opening_cache_enabled:
+            return None
+        entry = self._entries.get(_cache_key(gate, variables))
+        metrics.CACHE_REQUESTS.inc("opening", "miss" if entry is None else "hit")
+        return entry.text if entry is not None else None
+
+    def get_for_start(
+        self, gate: GateConfig, variables: dict[str, str], history: list[dict[str, Any]],
+    ) -> Optional[str]:
+        """Serve the opening response when the conversation so far is a single
+        hello / start message, the input the cached response was built from."""
+        if len(history) != 1 or history[0]["role"] != "user":
+            return None
+        starts = {
+            _normalize(m) for m in settings.opening_cache_start_messages.split(",")
+        }
+        if _normalize(history[0]["content"]) not in starts:
+            return None
+        return self.get(gate, variables)
+
+    async def warm(self) -> None:
+        """Compute and store the servable responses if this worker claims this
+        period's refresh for the current registry, then load what is stored."""
+        current = {_cache_key(gate, variables): (gate, variables) for gate, variables in self.servable_gates()}
+        if current:
+            run = f"opening_cache:{current_registry().version}"
+            owner = await maintenance.claim(run, settings.opening_cache_refresh_seconds)
+            if owner is not None:
+                await asyncio.gather(
+                    *(self._refresh(gate, variables, key) for key, (gate, variables) in current.items())
+                )
+        await self._load(current)
+
+    def schedule_warm(self) -> None:
+        """`warm` in the background (after a registry reload)."""
+        if not settings.opening_cache_enabled:
+            return
+        # Hold a reference: the loop only keeps a weak one to running tasks
+        task = asyncio.ensure_future(self.warm())
+        self._warm_tasks.add(task)
+        task.add_done_callback(self._warm_tasks.discard)
+
+    def start(self) -> None:
+        """Start the background load / refresh loop."""
+        if settings.opening_cache_enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm()
+            except Exception:
+                logger.exception("opening cache warm failed")
+            await asyncio.sleep(min(_LOAD_INTERVAL_SECONDS, settings.opening_cache_refresh_seconds))
+
+    async def _load(self, current: dict[tuple[str, str, str], Any]) -> None:
+        """Replace the in-memory entries with the stored responses for `current`."""
+        entries: dict[tuple[str, str, str], _Entry] = {}
+        if current:
+            stored = {_stored_key(key): key for key in current}
+            placeholders = ",".join("?" * len(stored))
+            async with get_db_connection() as db:
+                cursor = await db.execute(
+                    f"SELECT cache_key, text, created_at FROM opening_responses "
+                    f"WHERE cache_key IN ({placeholders})",
+                    list(stored),
+                )
+                for row in await cursor.fetchall():
+                    entries[stored[row["cache_key"]]] = _Entry(row["text"], row["created_at"])
+        self._entries = entries
+
+    async def _refresh(self, gate: GateConfig, variables: dict[str, str], key) -> None:
+        try:
+            text = await openai_service.call_prompt(
+                prompt_id=gate.prompt_id,
+                messages=[{"role": "user", "content": settings.opening_cache_seed_message}],
+                variables=variables or None,
+                version=gate.prompt_version,
+            )
+        except Exception as exc:
+            logger.warning("opening cache refresh failed for gate %s: %s", gate.number, exc)
+            return
+        async with get_db_connection() as db:
+            await db.execute(
+                """
+                INSERT INTO opening_responses (cache_key, text, created_at) VALUES (?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE
+                    SET text = excluded.text, created_at = excluded.created_at
+                """,
+                (_stored_key(key), text.strip(), time.time()),
+            )
+            await db.commit()
+
+
+opening_cache = OpeningCache()
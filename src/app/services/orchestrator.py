@@ -2,25 +2,233 @@
 
 from __future__ import annotations
 
+import copy
+import difflib
+import functools
 import json
+import re
 from typing import Any, Optional
 
+from .. import metrics
 from ..config import settings
 from ..gates.models import GateConfig, GateStatus
-from ..gates.registry import get_gate
+from ..gates.registry import active_registry, current_registry, get_gate, replay_plan
+from ..gates.resolvers import (
+    QUOTE_CONTEXT_KEY,
+    QUOTE_SUMMARY_KEY,
+    GateResolver,
+    compile_gate,
+    compile_registry,
+)
 from ..gates.session_state import SessionState
+from . import blob_store
 from . import conversation_service as conv_svc
+from .display_builder import parse_options
+
+# Gate 1 answers like "A", "b)", "option c" → option key
+_OPTION_KEY_RE = re.compile(r"^(?:option\s+)?([a-z])\s*[).\-]?$")
+
+# Structured values kept inline in product_config because composite contexts
+# read them directly; every other nested value becomes a blob reference
+_INLINE_STRUCTURED_KEYS = {"option_keep", "option_swap"}
+
+_SCALAR_TYPES = (str, int, float, bool)
+
+# quote summary: facts pinned against size trimming (and never namespaced),
+# and the longest string value copied in (longer text stays in the gate
+# response blob)
+_QUOTE_PINNED_KEYS = ("product_id", "product_name")
+_QUOTE_FACT_MAX_CHARS = 200
+
+# Gate whose responses may ask to rewind to an earlier gate
+_REVISIONS_GATE = 17
+_REVISION_TARGET_KEY = "revision_target_gate"
+
+# Minimum similarity for a fuzzy product-name match, how far ahead the best
+# candidate must be of the runner-up to count as unambiguous, and how much
+# longer or shorter than the name the answer may be
+_FUZZY_CUTOFF = 0.8
+_FUZZY_MARGIN = 0.1
+_FUZZY_MAX_LENGTH_DIFF = 1
+
+
+_MISSING = object()
+
+# Session lists / dicts besides product_config that a gate may change
+_SESSION_EXTRAS = ("line_items", "subtotals_by_gate", "flags")
+
+
+def _undo_record(
+    before: dict[str, Any], after: dict[str, Any], ordered: bool = False,
+) -> dict[str, Any]:
+    """What turns `after` back into `before`: prior values of changed keys,
+    keys that were added, and for `ordered` dicts the key order if it moved."""
+    restore = {k: v for k, v in before.items() if after.get(k, _MISSING) != v}
+    added = [k for k in after if k not in before]
+    record: dict[str, Any] = {}
+    if restore:
+        record["set"] = restore
+    if added:
+        record["unset"] = added
+    if ordered:
+        # Order `_apply_undo` produces without help: keys still present keep
+        # their place, removed ones come back at the end
+        naive = [k for k in after if k in before]
+        naive += [k for k in restore if k not in after]
+        if naive != list(before):
+            record["order"] = list(before)
+    return record
+
+
+def _apply_undo(current: dict[str, Any], record: dict[str, Any]) -> dict[str, Any]:
+    unset = set(record.get("unset", ()))
+    result = {k: v for k, v in current.items() if k not in unset}
+    result.update(record.get("set", {}))
+    order = record.get("order")
+    if order is not None:
+        # Keys the record does not know about (a redo applied over a
+        # re-answered gate) keep their place after the ordered ones
+        result = {**{k: result[k] for k in order if k in result}, **result}
+    return result
+
+
+def _compact(text: str) -> str:
+    """Lowercase and drop everything but letters/digits ("Sky-Tilt" → "skytilt")."""
+    return re.sub(r"[^a-z0-9]+", "", text.lower())
+
+
+@metrics.watch_lru("dimension_rules")
+@functools.lru_cache(maxsize=4)
+def _dimension_rules(dimension_context: str) -> dict[str, Any]:
+    """Parse the dimension_context setting once per distinct value (read-only)."""
+    return json.loads(dimension_context)
+
+
+@metrics.watch_lru("product_options")
+@functools.lru_cache(maxsize=4)
+def _product_options(options_text: str) -> tuple[dict[str, str], ...]:
+    """Parse the Gate 1 option list once per distinct settings value."""
+    return tuple(parse_options(options_text))
+
+
+def match_product_option(text: str, options_text: str) -> Optional[dict[str, str]]:
+    """Resolve a Gate 1 answer against the product option list.
+
+    Accepts the letter key ("A", "b)"), the product name in any spelling
+    ("r-blade", "Sky Tilt") or a close misspelling ("r-blaed"), and nothing
+    else: the whole answer has to be the pick. Questions, negations and
+    longer sentences ("what is r-blade?", "not sky tilt") go to the prompt.
+    Returns the matching option dict, or None.
+    """
+    options = _product_options(options_text)
+    answer = text.strip().lower().rstrip(".!")
+    if not options or not answer or answer.endswith("?"):
+        return None
+
+    # Letter key
+    m = _OPTION_KEY_RE.match(answer)
+    if m:
+        key = m.group(1).upper()
+        for opt in options:
+            if opt["key"] == key:
+                return opt
+        return None
+
+    # Exact name, ignoring case / spacing / punctuation
+    compact = _compact(answer)
+    for opt in options:
+        if compact in (_compact(opt["label"]), _compact(opt["value"])):
+            return opt
+
+    # Fuzzy spelling of the whole answer: a letter more or less at most,
+    # so extra words ("no kbana") never count as a misspelling
+    scored = sorted(
+        (
+            (difflib.SequenceMatcher(None, compact, _compact(opt["label"])).ratio(), i)
+            for i, opt in enumerate(options)
+            if abs(len(compact) - len(_compact(opt["label"]))) <= _FUZZY_MAX_LENGTH_DIFF
+        ),
+        reverse=True,
+    )
+    if not scored:
+        return None
+    best_score, best_idx = scored[0]
+    runner_up = scored[1][0] if len(scored) > 1 else 0.0
+    if best_score >= _FUZZY_CUTOFF and best_score - runner_up >= _FUZZY_MARGIN:
+        return options[best_idx]
+    return None
 
 
 class GateOrchestrator:
     """Stateless helper that loads/saves session state and resolves gates."""
 
+    # Resolvers are cached per GateConfig object, so gates from a reloaded
+    # registry compile on first use while older versions stay valid
+    _MAX_RESOLVERS = 256
+
+    def __init__(self) -> None:
+        self._resolvers: dict[int, GateResolver] = {}
+
+    def compile(self) -> None:
+        """Precompile variable resolvers for every gate in the current registry."""
+        if len(self._resolvers) > self._MAX_RESOLVERS:
+            self._resolvers.clear()
+        for resolver in compile_registry(current_registry().gates).values():
+            self._resolvers[id(resolver.gate)] = resolver
+
+    def _resolver(self, gate: GateConfig) -> GateResolver:
+        resolver = self._resolvers.get(id(gate))
+        if resolver is None or resolver.gate is not gate:
+            if len(self._resolvers) > self._MAX_RESOLVERS:
+                self._resolvers.clear()
+            resolver = compile_gate(gate)
+            self._resolvers[id(gate)] = resolver
+        return resolver
+
     async def load_session(self, conversation_id: str) -> SessionState:
-        data = await conv_svc.get_session_state(conversation_id)
-        return SessionState.from_dict(data)
+        data, version = await conv_svc.get_versioned_session_state(conversation_id)
+        session = SessionState.from_dict(data)
+        session.state_version = version
+        await self._hydrate(session)
+        return session
+
+    async def _hydrate(self, session: SessionState) -> None:
+        """Load the blob bodies referenced from product_config into session.blobs."""
+        digests = [
+            v[blob_store.BLOB_REF_KEY]
+            for v in session.product_config.values()
+            if blob_store.is_ref(v) and v[blob_store.BLOB_REF_KEY] not in session.blobs
+        ]
+        if digests:
+            session.blobs.update(await blob_store.get_many(digests))
+
+    @staticmethod
+    def _store_blob(session: SessionState, body: str) -> str:
+        """Stage `body` for persistence with the session; returns its digest."""
+        digest = blob_store.blob_hash(body)
+        session.pending_blobs[digest] = body
+        session.blobs[digest] = body
+        blob_store.remember(digest, body)
+        return digest
+
+    async def _read_blob(self, session: SessionState, digest: str) -> Optional[str]:
+        body = session.blobs.get(digest)
+        if body is None:
+            body = (await blob_store.get_many([digest])).get(digest)
+        return body
 
     async def save_session(self, conversation_id: str, session: SessionState) -> None:
-        await conv_svc.update_session_state(conversation_id, session.to_dict())
+        # Turns are pinned to registry_for(session.registry_version), so this
+        # records the version a new conversation starts on and otherwise only
+        # changes if the recorded version was evicted
+        session.registry_version = active_registry().version
+        if session.pending_blobs:
+            await blob_store.put_many(session.pending_blobs)
+            session.pending_blobs.clear()
+        await conv_svc.update_session_state(
+            conversation_id, session.to_dict(), expected_version=session.state_version,
+        )
+        session.state_version += 1
 
     async def resolve_gate(self, conversation_id: str) -> tuple[GateConfig, SessionState]:
         """Load session and return the current gate config (replaces _pick_prompt)."""
@@ -38,16 +246,30 @@ class GateOrchestrator:
 
     def resolve_variables(self, gate: GateConfig, session: SessionState) -> dict[str, str]:
         """Map the gate's variables_template to actual values."""
-        var_map: dict[str, str] = {}
-        for var_name, source_key in gate.variables_template.items():
-            # Check settings first, then session product_config
-            if hasattr(settings, source_key):
-                var_map[var_name] = getattr(settings, source_key)
-            elif source_key in session.product_config:
-                var_map[var_name] = str(session.product_config[source_key])
-            else:
-                var_map[var_name] = ""
-        return var_map
+        blobs = session.blobs
+        return self._resolver(gate).resolve(
+            session.product_config, lambda value: blob_store.deref(value, blobs),
+        )
+
+    def match_local_response(
+        self, gate: GateConfig, user_message: str,
+    ) -> Optional[dict[str, Any]]:
+        """Answer a gate turn without the LLM when the input is unambiguous.
+
+        Only Gate 1 (product selection) is handled: a clear pick from
+        ``product_options`` yields a completed response with ``product_id``
+        and no follow-up question, so ``should_advance`` fires directly.
+        """
+        if gate.number != 1:
+            return None
+        option = match_product_option(user_message, settings.product_options)
+        if option is None:
+            return None
+        return {
+            "status": "ok",
+            "product_id": option["value"],
+            "product_name": option["label"],
+        }
 
     def should_advance(self, parsed: Optional[dict[str, Any]]) -> bool:
         """Decide whether the conversation should advance to the next gate."""
@@ -62,22 +284,83 @@ class GateOrchestrator:
         return False
 
     def collect_data(self, session: SessionState, parsed: dict[str, Any]) -> None:
-        """Store relevant fields from a gate response into session.product_config."""
-        skip_keys = {"status", "question", "questions", "warnings"}
+        """Store relevant fields from a gate response into session.product_config.
+
+        The full response is stored once as a content-addressed blob; scalar
+        facts are copied into product_config and nested values become
+        references into that blob.
+        """
+        digest = self._store_blob(session, json.dumps(parsed))
+
+        facts: dict[str, Any] = {}
+
+        def _fact(value: Any, path: list[str], key: str) -> Any:
+            if isinstance(value, _SCALAR_TYPES):
+                facts[key] = value
+                return value
+            if key in _INLINE_STRUCTURED_KEYS:
+                return value
+            return blob_store.make_ref(digest, path)
+
+        skip_keys = {"status", "question", "questions", "warnings",
+                     QUOTE_SUMMARY_KEY, QUOTE_CONTEXT_KEY}
         for key, value in parsed.items():
             if key not in skip_keys and value is not None:
-                session.product_config[key] = value
+                session.product_config[key] = _fact(value, [key], key)
         # Flatten result_single into top-level keys for downstream gates
         result_single = parsed.get("result_single")
         if isinstance(result_single, dict):
             for k, v in result_single.items():
-                if v is not None:
-                    session.product_config[k] = v
-        # Store full response as JSON string keyed by gate number
+                if k not in skip_keys and v is not None:
+                    session.product_config[k] = _fact(v, ["result_single", k], k)
+        # Reference the full response keyed by gate number
         gate_key = f"gate_{session.current_gate}_response"
-        session.product_config[gate_key] = json.dumps(parsed)
+        session.product_config[gate_key] = blob_store.make_ref(digest)
         # Build composite context variables for downstream gates
         self._build_composite_contexts(session)
+        self._update_quote_context(session, facts)
+
+    def _update_quote_context(self, session: SessionState, facts: dict[str, Any]) -> None:
+        """Fold this gate's scalar facts into the quote summary.
+
+        The summary keeps the most recently collected value per key, in
+        collection order; the ``quote_context`` variable is its compact JSON
+        form, built by the resolver. Keys the gate does not declare in
+        ``provides`` (``price``, ``notes``, …) are namespaced as
+        ``gate_<n>.<key>`` so a later gate cannot overwrite an earlier one's
+        fact. When the text exceeds ``quote_context_max_chars`` the oldest
+        unpinned facts are dropped. The summary is replaced, never mutated.
+        """
+        pc = session.product_config
+        summary = pc.get(QUOTE_SUMMARY_KEY)
+        summary = dict(summary) if isinstance(summary, dict) else {}
+        gate = active_registry().gates.get(session.current_gate)
+        owned = set(_QUOTE_PINNED_KEYS).union(gate.provides if gate else ())
+        for key, value in facts.items():
+            if key.endswith("_context") or (
+                isinstance(value, str) and len(value) > _QUOTE_FACT_MAX_CHARS
+            ):
+                continue
+            if key not in owned:
+                key = f"gate_{session.current_gate}.{key}"
+            summary.pop(key, None)
+            summary[key] = value
+
+        # Size of each '"key":value' entry plus its separator, and the braces
+        sizes = {
+            k: len(json.dumps(k)) + len(json.dumps(v)) + 2 for k, v in summary.items()
+        }
+        total = sum(sizes.values()) + 1
+        limit = settings.quote_context_max_chars
+        if total > limit:
+            for key in [k for k in summary if k not in _QUOTE_PINNED_KEYS]:
+                del summary[key]
+                total -= sizes[key]
+                if total <= limit:
+                    break
+
+        pc[QUOTE_SUMMARY_KEY] = summary
+        pc.pop(QUOTE_CONTEXT_KEY, None)   # stored by older versions
 
     def _build_composite_contexts(self, session: SessionState) -> None:
         """Build composite JSON context variables from collected gate data."""
@@ -97,7 +380,7 @@ class GateOrchestrator:
         )
 
         if width is not None and length is not None:
-            dim_rules = json.loads(settings.dimension_context)
+            dim_rules = _dimension_rules(settings.dimension_context)
             r_blade = dim_rules.get("DIMENSION_RULES", {}).get("r_blade", {})
             bay_logic = {
                 "PRODUCT_ID": pc.get("product_id", "r_blade"),
@@ -113,13 +396,216 @@ class GateOrchestrator:
             }
             pc["bay_logic_context"] = json.dumps(bay_logic)
 
+    # ── Snapshots / revisions ───────────────────────────────────────
+
+    @staticmethod
+    def _checkpoint(session: SessionState) -> dict[str, Any]:
+        """Shallow copies to diff against once the current gate has written."""
+        before = {name: copy.copy(getattr(session, name)) for name in _SESSION_EXTRAS}
+        before["product_config"] = dict(session.product_config)
+        return before
+
+    def _record_changes(self, session: SessionState, before: dict[str, Any]) -> None:
+        """Store an undo record of what the current gate changed.
+
+        Only the keys the gate wrote are kept (inline in the session), so a
+        snapshot costs neither a full-state dump nor a blob write. The
+        quote summary is diffed per fact rather than copied whole.
+        """
+        session.gate_snapshots[str(session.current_gate)] = self._changes(session, before)
+
+    @staticmethod
+    def _changes(session: SessionState, before: dict[str, Any]) -> dict[str, Any]:
+        """Record that turns the session back into `before` (a `_checkpoint`)."""
+        config_before = before["product_config"]
+        config_after = session.product_config
+        record: dict[str, Any] = {}
+        summary_before = config_before.get(QUOTE_SUMMARY_KEY)
+        summary_after = config_after.get(QUOTE_SUMMARY_KEY)
+        if isinstance(summary_before, dict) and isinstance(summary_after, dict):
+            summary = _undo_record(summary_before, summary_after, ordered=True)
+            if summary:
+                record["summary"] = summary
+            config_before = {k: v for k, v in config_before.items() if k != QUOTE_SUMMARY_KEY}
+            config_after = {k: v for k, v in config_after.items() if k != QUOTE_SUMMARY_KEY}
+        config = _undo_record(config_before, config_after)
+        if config:
+            record["config"] = config
+        for name in _SESSION_EXTRAS:
+            if getattr(session, name) != before[name]:
+                record[name] = before[name]
+        return record
+
+    @staticmethod
+    def _apply_config(pc: dict[str, Any], record: dict[str, Any]) -> dict[str, Any]:
+        """product_config with the record's config and summary parts applied."""
+        if "summary" in record:
+            pc = {**pc, QUOTE_SUMMARY_KEY: _apply_undo(pc.get(QUOTE_SUMMARY_KEY) or {}, record["summary"])}
+        if "config" in record:
+            pc = _apply_undo(pc, record["config"])
+        return pc
+
+    def _undo(self, session: SessionState, record: dict[str, Any]) -> None:
+        """Reverse one gate's `_record_changes` (or apply a redo record)."""
+        session.product_config = self._apply_config(session.product_config, record)
+        for name in _SESSION_EXTRAS:
+            if name in record:
+                setattr(session, name, record[name])
+
+    async def _restore_full(self, session: SessionState, digest: str, target: int) -> None:
+        """Restore a whole-session snapshot blob (sessions recorded before undo records)."""
+        body = await self._read_blob(session, digest)
+        if body is None:
+            raise ValueError(f"Snapshot for gate {target} is missing")
+        snapshot = json.loads(body)
+        session.product_config = snapshot["product_config"]
+        for name in _SESSION_EXTRAS:
+            setattr(session, name, snapshot[name])
+
+    def _resume_point(self, session: SessionState) -> int:
+        """Gate the user had reached before any rewind currently in progress."""
+        if session.replay_queue:
+            return session.replay_queue[-1]
+        if session.revision is not None:
+            return session.revision["resume_from"]
+        return session.current_gate
+
+    def can_rewind(self, session: SessionState, target: int) -> bool:
+        """True if `target` was completed earlier in this session's flow."""
+        if str(target) not in session.gate_snapshots:
+            return False
+        sequence = session.gate_sequence
+        resume_from = self._resume_point(session)
+        if target not in sequence or resume_from not in sequence:
+            return False
+        return sequence.index(target) < sequence.index(resume_from)
+
+    def revision_target(
+        self, gate: GateConfig, session: SessionState,
+        parsed: Optional[dict[str, Any]],
+    ) -> Optional[int]:
+        """Return the gate a Revisions response asks to go back to, if usable."""
+        if gate.number != _REVISIONS_GATE or not isinstance(parsed, dict):
+            return None
+        target = parsed.get(_REVISION_TARGET_KEY)
+        try:
+            target = int(target)
+        except (TypeError, ValueError):
+            return None
+        return target if self.can_rewind(session, target) else None
+
+    async def rewind(self, conversation_id: str, session: SessionState, target: int) -> None:
+        """Restore the session to how it stood on entry to gate `target` and persist.
+
+        The gates between `target` and the point the user had reached are
+        not re-run blindly: once `target` completes again, only the gates
+        reading a changed key are queued for replay, and what the others
+        wrote is put back (see `_plan_replay`). Raises ValueError if
+        `target` has no usable snapshot.
+        """
+        if not self.can_rewind(session, target):
+            raise ValueError(f"Gate {target} has not been completed in this conversation")
+
+        resume_from = self._resume_point(session)
+        if session.revision is not None:
+            prior = session.revision["prior"]
+            redo = dict(session.revision.get("redo", {}))
+            pending = session.revision.get("pending", [])
+        else:
+            prior = self._store_blob(session, json.dumps(session.product_config))
+            redo = {}
+            # Gates still queued by an unfinished replay have to run regardless
+            pending = session.replay_queue[:-1]
+
+        # Undo every gate from the latest back to the target; their records
+        # (other than the target's) describe a flow that is being redone
+        position = {number: i for i, number in enumerate(session.gate_sequence)}
+        cut = position[target]
+        snapshot = session.gate_snapshots[str(target)]
+        if isinstance(snapshot, str):
+            await self._restore_full(session, snapshot, target)
+        else:
+            recorded = sorted(
+                session.gate_snapshots.items(),
+                key=lambda item: position.get(int(item[0]), len(position)),
+                reverse=True,
+            )
+            for number, record in recorded:
+                if position.get(int(number), len(position)) < cut:
+                    break
+                before = self._checkpoint(session)
+                self._undo(session, record)
+                if int(number) != target:
+                    # Kept to put the gate's writes back if it is not replayed
+                    redo[number] = self._changes(session, before)
+        session.gate_snapshots = {
+            k: v for k, v in session.gate_snapshots.items()
+            if position.get(int(k), len(position)) <= cut
+        }
+        session.current_gate = target
+        session.replay_queue = []
+        session.revision = {
+            "target": target, "resume_from": resume_from, "prior": prior,
+            "redo": redo, "pending": pending,
+        }
+        await self._hydrate(session)
+        await self.save_session(conversation_id, session)
+
+    async def _plan_replay(self, session: SessionState) -> None:
+        """Queue the gates affected by the re-answered revision target.
+
+        The gates undone by the rewind that are not queued get their writes
+        back, and their undo records with them. Changed keys are found by
+        comparing the flow as it stood against the re-answered target with
+        every undone gate's writes put back, so a key only counts as changed
+        if the target's new answer changed it. Keys are compared by resolved
+        value: re-answering stores a new gate response blob, so references
+        into it differ even where the data they point at does not.
+        """
+        revision = session.revision
+        session.revision = None
+        body = await self._read_blob(session, revision["prior"])
+        prior = json.loads(body) if body is not None else {}
+        redo = revision.get("redo", {})
+        position = {number: i for i, number in enumerate(session.gate_sequence)}
+        undone = sorted(redo, key=lambda number: position.get(int(number), len(position)))
+        config = session.product_config
+        for number in undone:
+            config = self._apply_config(config, redo[number])
+        digests = {
+            v[blob_store.BLOB_REF_KEY]
+            for v in (*config.values(), *prior.values())
+            if blob_store.is_ref(v)
+        }
+        blobs = dict(session.blobs)
+        blobs.update(await blob_store.get_many(digests - blobs.keys()))
+        changed = {
+            k for k in config.keys() | prior.keys()
+            if blob_store.deref(config.get(k), blobs) != blob_store.deref(prior.get(k), blobs)
+        }
+        plan = replay_plan(
+            session.gate_sequence, revision["target"], revision["resume_from"], changed,
+        )
+        replayed = set(plan).union(revision.get("pending", ()))
+        session.replay_queue = sorted(replayed, key=position.__getitem__)
+        for number in undone:
+            if int(number) not in replayed:
+                before = self._checkpoint(session)
+                self._undo(session, redo[number])
+                session.gate_snapshots[number] = self._changes(session, before)
+        session.blobs.update(blobs)
+
     async def advance_gate(
         self, conversation_id: str, session: SessionState,
         parsed: Optional[dict[str, Any]] = None,
     ) -> Optional[int]:
         """Advance to the next active gate and persist. Returns new gate number or None."""
+        before = self._checkpoint(session)
         if parsed and isinstance(parsed, dict):
             self.collect_data(session, parsed)
+        self._record_changes(session, before)
+        if session.revision is not None and session.current_gate == session.revision["target"]:
+            await self._plan_replay(session)
         nxt = session.advance()
         await self.save_session(conversation_id, session)
         return nxt
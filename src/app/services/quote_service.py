@@ -2,13 +2,27 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import json
+import logging
+import time
 from typing import Any, AsyncGenerator
 
+from ..config import settings
+from ..gates.registry import pin_registry, registry_for, unpin_registry
+from ..tracing import annotate, current_trace_id, detached_trace, span
 from . import conversation_service as conv_svc
 from . import openai_service
-from .display_builder import build_display
+from .conversation_lock import ConversationLock, conversation_locks
+from .display_builder import build_display, build_error_display
+from .event_bus import event_bus
+from .gate_scheduler import gate_scheduler
+from .opening_cache import opening_cache
 from .orchestrator import orchestrator
+from .task_supervisor import task_supervisor
+
+logger = logging.getLogger(__name__)
 
 # Safety limit to prevent infinite chain-advance loops
 _MAX_CHAIN_ADVANCES = 10
@@ -23,89 +37,251 @@ def _parse_response_text(text: str) -> dict[str, Any] | None:
         return None
 
 
-async def _auto_fetch_and_chain(
+async def _pin_conversation_registry(conversation_id: str) -> contextvars.Token:
+    """Pin the registry version the conversation started on for this turn.
+
+    A new conversation gets the current registry; one whose version has
+    since been evicted (or was loaded by a previous process) moves to it.
+    """
+    return pin_registry(registry_for(await conv_svc.get_registry_version(conversation_id)))
+
+
+async def _chain_gates(
     conversation_id: str,
-    session: Any,
     metadata: dict[str, Any],
-) -> None:
-    """Auto-fetch the next gate's question, chain-advancing through gates that return ok.
+    stream: bool = False,
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Fetch the next gate's question, chain-advancing through gates that return ok.
 
     Mutates `metadata` in place, adding `next_gate` or `next_gate_error`.
     Also persists collected data and session state for each chained gate.
+    With ``stream=True`` yields a ``gate_advanced`` event per chained gate
+    followed by that gate's ``chunk`` deltas as they arrive.
     """
     skipped_gates: list[dict[str, Any]] = []
+    from_gate = metadata.get("gate_number")
 
     for _ in range(_MAX_CHAIN_ADVANCES):
-        try:
-            next_gate, next_session = await orchestrator.resolve_gate(conversation_id)
-            next_variables = orchestrator.resolve_variables(next_gate, next_session)
-            next_history = await conv_svc.get_conversation_history(conversation_id)
-            next_response_text = await openai_service.call_prompt(
-                prompt_id=next_gate.prompt_id,
-                messages=next_history,
-                variables=next_variables or None,
-                version=next_gate.prompt_version,
-            )
-            next_parsed = _parse_response_text(next_response_text)
-
-            # If this gate also auto-completes, collect its data and advance
-            if orchestrator.should_advance(next_parsed):
-                skipped_gates.append({
-                    "gate_number": next_gate.number,
-                    "gate_name": next_gate.name,
-                    "status": next_parsed.get("status") if next_parsed else None,
-                })
-                new_num = await orchestrator.advance_gate(
-                    conversation_id, next_session, next_parsed,
-                )
-                metadata["advanced_to_gate"] = new_num
-                if new_num is None:
-                    # No more gates — use last auto-completed gate as next_gate
-                    metadata["next_gate"] = {
+        with span("chain_gate", from_gate=from_gate):
+            try:
+                next_gate, next_session = await orchestrator.resolve_gate(conversation_id)
+                next_variables = orchestrator.resolve_variables(next_gate, next_session)
+                annotate(gate_number=next_gate.number)
+                if settings.gate_prefetch_enabled:
+                    gate_scheduler.prefetch_ready(conversation_id, next_session)
+                if stream:
+                    yield {
+                        "type": "gate_advanced",
+                        "from_gate": from_gate,
                         "gate_number": next_gate.number,
                         "gate_name": next_gate.name,
-                        "response": next_parsed or next_response_text,
                     }
-                    break
-                # Loop continues to fetch the next gate
-                continue
-
-            # Gate has a question — this is where we stop
-            metadata["next_gate"] = {
-                "gate_number": next_gate.number,
-                "gate_name": next_gate.name,
-                "response": next_parsed or next_response_text,
-            }
-            break
+                    chunks: list[str] = []
+                    async for delta in gate_scheduler.stream(
+                        conversation_id, next_gate, next_variables,
+                    ):
+                        chunks.append(delta)
+                        yield {"type": "chunk", "delta": delta, "gate_number": next_gate.number}
+                    next_response_text = "".join(chunks).strip()
+                else:
+                    next_response_text = await gate_scheduler.fetch(
+                        conversation_id, next_gate, next_variables,
+                    )
+                next_parsed = _parse_response_text(next_response_text)
+                advances = orchestrator.should_advance(next_parsed)
+                gate_scheduler.record_outcome(next_gate, advances)
+
+                # If this gate also auto-completes, collect its data and advance
+                if advances:
+                    skipped_gates.append({
+                        "gate_number": next_gate.number,
+                        "gate_name": next_gate.name,
+                        "status": next_parsed.get("status") if next_parsed else None,
+                    })
+                    with span("advance_gate"):
+                        new_num = await orchestrator.advance_gate(
+                            conversation_id, next_session, next_parsed,
+                        )
+                    metadata["advanced_to_gate"] = new_num
+                    if new_num is None:
+                        # No more gates — use last auto-completed gate as next_gate
+                        metadata["next_gate"] = {
+                            "gate_number": next_gate.number,
+                            "gate_name": next_gate.name,
+                            "response": next_parsed or next_response_text,
+                        }
+                        break
+                    # Loop continues to fetch the next gate
+                    from_gate = next_gate.number
+                    continue
+
+                # Gate has a question — this is where we stop. The answer
+                # changes the history, so no prefetch made so far can be used
+                gate_scheduler.discard(conversation_id)
+                metadata["next_gate"] = {
+                    "gate_number": next_gate.number,
+                    "gate_name": next_gate.name,
+                    "response": next_parsed or next_response_text,
+                }
+                break
 
-        except Exception as e:
-            metadata["next_gate_error"] = str(e)
-            break
+            except Exception as e:
+                metadata["next_gate_error"] = str(e)
+                break
 
     if skipped_gates:
         metadata["skipped_gates"] = skipped_gates
 
 
+async def _auto_fetch_and_chain(conversation_id: str, metadata: dict[str, Any]) -> None:
+    """Non-streaming chain: run `_chain_gates` to completion."""
+    async for _ in _chain_gates(conversation_id, metadata):
+        pass
+
+
+async def _deliver_next_gate(conversation_id: str, from_gate: int) -> dict[str, Any]:
+    """Background half of a deferred turn: chain to the next gate and store it.
+
+    The next gate's response is persisted as a normal assistant message so
+    it shows up in message listings as well as in the next-gate poll. If
+    the chain fails or runs past `chain_background_timeout_seconds`, an
+    error message is stored instead, so pollers never wait on a turn that
+    will not arrive. The work is traced on its own, linked to the turn
+    that deferred it.
+    """
+    with detached_trace("deferred chain"):
+        try:
+            return await asyncio.wait_for(
+                _chain_next_gate(conversation_id, from_gate),
+                settings.chain_background_timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("deferred chain for %s timed out", conversation_id)
+            return await _store_chain_error(
+                conversation_id, from_gate, "Timed out fetching the next gate",
+            )
+        except Exception as exc:
+            logger.exception("deferred chain for %s failed", conversation_id)
+            return await _store_chain_error(conversation_id, from_gate, str(exc))
+
+
+async def _store_chain_error(conversation_id: str, from_gate: int, error: str) -> dict[str, Any]:
+    display = build_error_display("openai_error", error)
+    metadata: dict[str, Any] = {"chained_from_gate": from_gate, "next_gate_error": error}
+    return await conv_svc.add_message(
+        conversation_id, "assistant", "", metadata_json=metadata, display_json=display,
+    )
+
+
+async def _chain_next_gate(conversation_id: str, from_gate: int) -> dict[str, Any]:
+    chain_meta: dict[str, Any] = {"gate_number": from_gate}
+    await _auto_fetch_and_chain(conversation_id, chain_meta)
+
+    next_gate = chain_meta.get("next_gate")
+    if next_gate is None:
+        return await _store_chain_error(
+            conversation_id, from_gate, chain_meta.get("next_gate_error", "No next gate"),
+        )
+
+    response = next_gate["response"]
+    parsed = response if isinstance(response, dict) else None
+    content = json.dumps(response) if parsed is not None else str(response)
+    metadata = {
+        "gate_number": next_gate["gate_number"],
+        "gate_name": next_gate["gate_name"],
+        "chained_from_gate": from_gate,
+    }
+    if (trace_id := current_trace_id()) is not None:
+        metadata["trace_id"] = trace_id
+    if parsed is not None:
+        metadata["parsed_status"] = parsed.get("status")
+    if "skipped_gates" in chain_meta:
+        metadata["skipped_gates"] = chain_meta["skipped_gates"]
+
+    display = build_display(
+        parsed=parsed,
+        raw_text=content,
+        metadata={},
+        gate_number=next_gate["gate_number"],
+        gate_name=next_gate["gate_name"],
+    )
+    msg = await conv_svc.add_message(
+        conversation_id,
+        "assistant",
+        content,
+        response_json=parsed,
+        metadata_json=metadata,
+        display_json=display,
+    )
+    return msg
+
+
 async def handle_message(
     conversation_id: str,
     user_message: str,
+    defer_chain: bool = False,
+) -> dict[str, Any]:
+    """Process a user message: store it, call OpenAI, store + return assistant reply.
+
+    With ``defer_chain`` the reply returns as soon as the current gate is
+    answered; if it advanced, the next gate is fetched in the background and
+    delivered as a separate assistant message (see `wait_for_next_gate`).
+    The whole turn, including any chain it starts, runs on the gate
+    registry the conversation started with, and holds the conversation's
+    cross-worker lock until the chain has landed.
+    """
+    token = await _pin_conversation_registry(conversation_id)
+    try:
+        with span("acquire_lock"):
+            lock = await conversation_locks.acquire(conversation_id)
+        try:
+            with lock.guard():
+                return await _handle_message(conversation_id, user_message, defer_chain, lock)
+        finally:
+            await lock.release()   # no-op if a deferred chain took it over
+    finally:
+        unpin_registry(token)
+
+
+async def _handle_message(
+    conversation_id: str,
+    user_message: str,
+    defer_chain: bool,
+    lock: ConversationLock,
 ) -> dict[str, Any]:
-    """Process a user message: store it, call OpenAI, store + return assistant reply."""
+    # A deferred chain from the previous turn must land before this one starts
+    with span("wait_deferred_chain"):
+        await task_supervisor.wait(conversation_id)
+
     # Store user message
-    await conv_svc.add_message(conversation_id, "user", user_message)
+    with span("store_user_message"):
+        await conv_svc.add_message(conversation_id, "user", user_message)
 
     # Resolve current gate
-    gate, session = await orchestrator.resolve_gate(conversation_id)
-    variables = orchestrator.resolve_variables(gate, session)
-
-    # Build history & call OpenAI
-    history = await conv_svc.get_conversation_history(conversation_id)
-    response_text = await openai_service.call_prompt(
-        prompt_id=gate.prompt_id,
-        messages=history,
-        variables=variables or None,
-        version=gate.prompt_version,
-    )
+    with span("resolve_gate"):
+        gate, session = await orchestrator.resolve_gate(conversation_id)
+        variables = orchestrator.resolve_variables(gate, session)
+        annotate(gate_number=gate.number)
+
+    # Answer locally or from the opening cache when possible, otherwise
+    # build history & call OpenAI
+    local = orchestrator.match_local_response(gate, user_message)
+    cached = None
+    if local is not None:
+        response_text = json.dumps(local)
+    else:
+        with span("get_conversation_history"):
+            history = await conv_svc.get_conversation_history(conversation_id)
+        cached = opening_cache.get_for_start(gate, variables, history)
+        if cached is not None:
+            response_text = cached
+        else:
+            response_text = await openai_service.call_prompt(
+                prompt_id=gate.prompt_id,
+                messages=history,
+                variables=variables or None,
+                version=gate.prompt_version,
+            )
 
     # Parse
     parsed = _parse_response_text(response_text)
@@ -114,67 +290,188 @@ async def handle_message(
         "gate_number": gate.number,
         "gate_name": gate.name,
     }
+    if local is not None:
+        metadata["resolved_locally"] = True
+    elif cached is not None:
+        metadata["opening_cached"] = True
+    if (trace_id := current_trace_id()) is not None:
+        metadata["trace_id"] = trace_id
     if parsed and isinstance(parsed, dict):
         metadata["parsed_status"] = parsed.get("status")
 
-    # Check advancement
-    if orchestrator.should_advance(parsed):
-        new_gate_num = await orchestrator.advance_gate(conversation_id, session, parsed)
+    # Check advancement (a Revisions answer may instead rewind to an earlier gate)
+    rewind_to = orchestrator.revision_target(gate, session, parsed)
+    if rewind_to is not None or orchestrator.should_advance(parsed):
+        if rewind_to is not None:
+            await gate_scheduler.discard_everywhere(conversation_id)
+            with span("rewind", gate_number=rewind_to):
+                await orchestrator.rewind(conversation_id, session, rewind_to)
+            metadata["rewound_to_gate"] = rewind_to
+            new_gate_num = rewind_to
+        else:
+            with span("advance_gate"):
+                new_gate_num = await orchestrator.advance_gate(conversation_id, session, parsed)
         metadata["advanced_to_gate"] = new_gate_num
 
-        # Auto-fetch with chain-advance
+        # Auto-fetch with chain-advance (or hand it to a background task)
         if new_gate_num is not None:
-            await _auto_fetch_and_chain(conversation_id, session, metadata)
+            if defer_chain:
+                metadata["pending_next_gate"] = {"gate_number": new_gate_num}
+            else:
+                await _auto_fetch_and_chain(conversation_id, metadata)
     else:
-        await orchestrator.save_session(conversation_id, session)
+        with span("save_session"):
+            await orchestrator.save_session(conversation_id, session)
 
     # Build unified display object
-    display = build_display(
-        parsed=parsed,
-        raw_text=response_text,
-        metadata=metadata,
-        gate_number=gate.number,
-        gate_name=gate.name,
-    )
+    with span("build_display"):
+        display = build_display(
+            parsed=parsed,
+            raw_text=response_text,
+            metadata=metadata,
+            gate_number=gate.number,
+            gate_name=gate.name,
+        )
 
     # Store assistant message
-    msg = await conv_svc.add_message(
-        conversation_id,
-        "assistant",
-        response_text,
-        response_json=parsed,
-        metadata_json=metadata,
-    )
-    msg["display"] = display
+    with span("store_assistant_message"):
+        msg = await conv_svc.add_message(
+            conversation_id,
+            "assistant",
+            response_text,
+            response_json=parsed,
+            metadata_json=metadata,
+            display_json=display,
+        )
+
+    if "pending_next_gate" in metadata:
+        task_supervisor.start(
+            conversation_id,
+            lock.released_after(_deliver_next_gate(conversation_id, gate.number)),
+            timeout=None,   # bounded inside, so the error message is stored under the lock
+        )
 
     return msg
 
 
+async def wait_for_next_gate(
+    conversation_id: str,
+    after: str | None,
+    timeout: float,
+) -> dict[str, Any] | None:
+    """Long-poll for the next assistant message after message `after`.
+
+    Waits up to `timeout` for a deferred chain running in this worker and
+    returns its message; otherwise returns the first assistant message
+    stored after `after`, waiting for one to be published (by whichever
+    worker runs the chain) until `timeout`. Returns None if nothing has
+    arrived by then.
+    """
+    deadline = time.monotonic() + timeout
+    # Subscribe before reading the table so nothing falls in between
+    with event_bus.subscription(conversation_id) as sub:
+        if task_supervisor.get(conversation_id) is not None:
+            result = await task_supervisor.wait(conversation_id, timeout)
+            if result is not None:
+                return result
+        check_table = after is not None
+        while True:
+            if check_table:
+                for row in await conv_svc.get_messages(conversation_id, after=after, limit=50):
+                    if row["role"] == "assistant":
+                        return row
+            event = await sub.get(max(0.0, deadline - time.monotonic()))
+            if event is None:
+                return None
+            if event["type"] == "message" and event["message"]["role"] == "assistant":
+                return event["message"]
+            # Dropped events (a slow subscriber) have to be re-read
+            check_table = event["type"] == "resync" and after is not None
+
+
+async def rewind_conversation(conversation_id: str, gate_number: int) -> dict[str, Any]:
+    """Rewind the conversation to the start of an earlier, completed gate.
+
+    Raises ValueError if the gate cannot be rewound to.
+    """
+    token = await _pin_conversation_registry(conversation_id)
+    try:
+        async with conversation_locks.hold(conversation_id):
+            await task_supervisor.wait(conversation_id)
+            await gate_scheduler.discard_everywhere(conversation_id)
+            session = await orchestrator.load_session(conversation_id)
+            await orchestrator.rewind(conversation_id, session, gate_number)
+            return {
+                "conversation_id": conversation_id,
+                "current_gate": session.current_gate,
+                "resume_from": session.revision["resume_from"],
+            }
+    finally:
+        unpin_registry(token)
+
+
 async def handle_message_stream(
     conversation_id: str,
     user_message: str,
 ) -> AsyncGenerator[dict[str, Any], None]:
-    """Stream version: yields dicts with type='chunk' or type='done'."""
+    """Stream version: yields dicts with type='chunk', 'gate_advanced' or 'done'."""
+    token = await _pin_conversation_registry(conversation_id)
+    try:
+        with span("acquire_lock"):
+            lock = await conversation_locks.acquire(conversation_id)
+        try:
+            with lock.guard():
+                async for event in _handle_message_stream(conversation_id, user_message):
+                    yield event
+        finally:
+            await lock.release()
+    finally:
+        unpin_registry(token)
+
+
+async def _handle_message_stream(
+    conversation_id: str,
+    user_message: str,
+) -> AsyncGenerator[dict[str, Any], None]:
+    with span("wait_deferred_chain"):
+        await task_supervisor.wait(conversation_id)
+
     # Store user message
-    await conv_svc.add_message(conversation_id, "user", user_message)
+    with span("store_user_message"):
+        await conv_svc.add_message(conversation_id, "user", user_message)
 
     # Resolve current gate
-    gate, session = await orchestrator.resolve_gate(conversation_id)
-    variables = orchestrator.resolve_variables(gate, session)
-
-    # Build history
-    history = await conv_svc.get_conversation_history(conversation_id)
+    with span("resolve_gate"):
+        gate, session = await orchestrator.resolve_gate(conversation_id)
+        variables = orchestrator.resolve_variables(gate, session)
+        annotate(gate_number=gate.number)
 
     chunks: list[str] = []
 
-    async for delta in openai_service.stream_prompt(
-        prompt_id=gate.prompt_id,
-        messages=history,
-        variables=variables or None,
-        version=gate.prompt_version,
-    ):
+    # Answer locally or from the opening cache when possible (single chunk),
+    # otherwise stream OpenAI
+    local = orchestrator.match_local_response(gate, user_message)
+    cached = None
+    if local is not None:
+        delta = json.dumps(local)
         chunks.append(delta)
         yield {"type": "chunk", "delta": delta}
+    else:
+        with span("get_conversation_history"):
+            history = await conv_svc.get_conversation_history(conversation_id)
+        cached = opening_cache.get_for_start(gate, variables, history)
+        if cached is not None:
+            chunks.append(cached)
+            yield {"type": "chunk", "delta": cached}
+        else:
+            async for delta in openai_service.stream_prompt(
+                prompt_id=gate.prompt_id,
+                messages=history,
+                variables=variables or None,
+                version=gate.prompt_version,
+            ):
+                chunks.append(delta)
+                yield {"type": "chunk", "delta": delta}
 
     full_text = "".join(chunks).strip()
     parsed = _parse_response_text(full_text)
@@ -183,37 +480,56 @@ async def handle_message_stream(
         "gate_number": gate.number,
         "gate_name": gate.name,
     }
+    if local is not None:
+        metadata["resolved_locally"] = True
+    elif cached is not None:
+        metadata["opening_cached"] = True
+    if (trace_id := current_trace_id()) is not None:
+        metadata["trace_id"] = trace_id
     if parsed and isinstance(parsed, dict):
         metadata["parsed_status"] = parsed.get("status")
 
-    # Check advancement
-    if orchestrator.should_advance(parsed):
-        new_gate_num = await orchestrator.advance_gate(conversation_id, session, parsed)
+    # Check advancement (a Revisions answer may instead rewind to an earlier gate)
+    rewind_to = orchestrator.revision_target(gate, session, parsed)
+    if rewind_to is not None or orchestrator.should_advance(parsed):
+        if rewind_to is not None:
+            await gate_scheduler.discard_everywhere(conversation_id)
+            with span("rewind", gate_number=rewind_to):
+                await orchestrator.rewind(conversation_id, session, rewind_to)
+            metadata["rewound_to_gate"] = rewind_to
+            new_gate_num = rewind_to
+        else:
+            with span("advance_gate"):
+                new_gate_num = await orchestrator.advance_gate(conversation_id, session, parsed)
         metadata["advanced_to_gate"] = new_gate_num
 
-        # Auto-fetch with chain-advance
+        # Auto-fetch with chain-advance, streaming each chained gate live
         if new_gate_num is not None:
-            await _auto_fetch_and_chain(conversation_id, session, metadata)
+            async for event in _chain_gates(conversation_id, metadata, stream=True):
+                yield event
     else:
-        await orchestrator.save_session(conversation_id, session)
+        with span("save_session"):
+            await orchestrator.save_session(conversation_id, session)
 
     # Build unified display object
-    display = build_display(
-        parsed=parsed,
-        raw_text=full_text,
-        metadata=metadata,
-        gate_number=gate.number,
-        gate_name=gate.name,
-    )
+    with span("build_display"):
+        display = build_display(
+            parsed=parsed,
+            raw_text=full_text,
+            metadata=metadata,
+            gate_number=gate.number,
+            gate_name=gate.name,
+        )
 
     # Store assistant message
-    msg = await conv_svc.add_message(
-        conversation_id,
-        "assistant",
-        full_text,
-        response_json=parsed,
-        metadata_json=metadata,
-    )
-    msg["display"] = display
+    with span("store_assistant_message"):
+        msg = await conv_svc.add_message(
+            conversation_id,
+            "assistant",
+            full_text,
+            response_json=parsed,
+            metadata_json=metadata,
+            display_json=display,
+        )
 
     yield {"type": "done", "message": msg}
@@ -0,0 +1,101 @@
+"""Watch the gate registry file and swap new versions in without a restart.
+
+The file is polled by mtime (no extra dependency); a change is parsed,
+validated and swapped in atomically. Conversations already under way keep
+the registry version they started on while it is retained; new
+conversations pick up the new one.
+An invalid file is logged and ignored, leaving the current registry live.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from ..config import settings
+from ..gates.registry import (
+    RegistrySnapshot,
+    current_registry,
+    load_registry_file,
+    swap_registry,
+)
+from .invalidation import TOPIC_REGISTRY_RELOAD, invalidation_bus
+from .opening_cache import opening_cache
+from .orchestrator import orchestrator
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryReloader:
+    def __init__(self) -> None:
+        self._mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def reload(self, path: Optional[str] = None) -> RegistrySnapshot:
+        """Load the registry file and swap it in if its version is new.
+
+        Raises ValueError / OSError if the file is missing or invalid.
+        """
+        path = path or settings.gate_registry_file
+        if not path:
+            raise ValueError("GATE_REGISTRY_FILE is not configured")
+        self._mtime = os.stat(path).st_mtime
+        snapshot = load_registry_file(path)
+        if snapshot.version == current_registry().version:
+            return current_registry()
+        swap_registry(snapshot)
+        orchestrator.compile()
+        # Prompt ids / versions may have changed: warm the new opening keys
+        opening_cache.schedule_warm()
+        logger.info("gate registry %s loaded from %s", snapshot.version, path)
+        return snapshot
+
+    def start(self) -> None:
+        path = settings.gate_registry_file
+        if not path or self._task is not None:
+            return
+        if os.path.exists(path):
+            try:
+                self.reload(path)
+            except Exception:
+                logger.exception("initial gate registry load from %s failed", path)
+        self._task = asyncio.ensure_future(self._watch(path))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self, path: str) -> None:
+        while True:
+            await asyncio.sleep(settings.gate_registry_poll_seconds)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            if mtime == self._mtime:
+                continue
+            try:
+                self.reload(path)
+            except Exception:
+                logger.exception("gate registry reload from %s failed", path)
+
+
+registry_reloader = RegistryReloader()
+
+
+def _reload_signalled(payload: dict) -> None:
+    # Another worker reloaded through the admin endpoint; follow unless the
+    # mtime watcher got there first
+    if payload.get("version") == current_registry().version:
+        return
+    try:
+        registry_reloader.reload()
+    except Exception:
+        logger.exception("gate registry reload signalled by another worker failed")
+
+
+invalidation_bus.subscribe(TOPIC_REGISTRY_RELOAD, _reload_signalled)
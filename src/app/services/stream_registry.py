@@ -0,0 +1,297 @@
+"""Resumable SSE turns: sequenced events produced independently of the client.
+
+Each streamed turn runs as a background task that appends its SSE events
+to a `TurnStream` under sequence numbers 1, 2, 3... Connections (the
+original POST and any resume) only read from that buffer, so a dropped
+client neither stops the turn nor loses events: it reconnects with
+``Last-Event-ID: <stream_id>:<seq>`` and continues from the next event.
+
+The newest ``stream_buffer_events`` events stay in memory; older ones are
+written to the ``stream_events`` table before being evicted. Finished
+streams are kept for ``stream_retention_seconds``.
+
+With several workers (``workers`` > 1) a resume or an idempotent retry
+can land on a worker other than the one producing the turn. Uvicorn
+workers share one socket, so the proxy cannot route them back. Producers
+therefore also write their events through to the table, at most
+``stream_flush_ms`` apart, and finish with an end marker. Another worker
+follows the stream from the table (`SpilledStream`), polling every
+``stream_follow_poll_ms``. Limitations: such a follower lags by up to the
+flush plus poll interval; a resume that arrives before the first event
+was written gets a 404; and a follower of a producer whose worker died
+gives up after ``stream_retention_seconds`` without new events.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from .. import metrics
+from ..config import settings
+from ..database import get_db_connection
+from ..tracing import detached_trace
+
+logger = logging.getLogger(__name__)
+
+# (seq, event name, JSON data)
+StreamEvent = tuple[int, str, str]
+
+# Event name of the row marking the end of a written-through stream (SSE
+# events always have a name, so it cannot clash)
+_END_EVENT = ""
+
+
+def format_event_id(stream_id: str, seq: int) -> str:
+    return f"{stream_id}:{seq}"
+
+
+def parse_event_id(event_id: Optional[str]) -> tuple[Optional[str], int]:
+    """Split a Last-Event-ID into (stream_id, seq); seq is 0 when absent."""
+    if not event_id:
+        return None, 0
+    stream_id, _, seq = event_id.strip().rpartition(":")
+    try:
+        return stream_id or None, int(seq)
+    except ValueError:
+        return None, 0
+
+
+class TurnStream:
+    def __init__(
+        self, stream_id: str, conversation_id: str, buffer_size: int, shared: bool = False,
+    ) -> None:
+        self.stream_id = stream_id
+        self.conversation_id = conversation_id
+        self.done = False
+        self.last_seq = 0
+        self.written_seq = 0      # events up to here are in stream_events
+        self._buffer: deque[StreamEvent] = deque()
+        self._buffer_size = max(1, buffer_size)
+        self._changed = asyncio.Event()
+        self._table_reads = 0     # reads of stream_events in progress
+        self._shared = shared     # write through for other workers
+        self._written_at = 0.0
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def append(self, event: str, data: str) -> None:
+        self.last_seq += 1
+        self._buffer.append((self.last_seq, event, data))
+        if len(self._buffer) > self._buffer_size:
+            await self._spill()
+        elif self._shared and time.monotonic() - self._written_at >= settings.stream_flush_ms / 1000:
+            await self._write(self.last_seq)
+        self._notify()
+
+    async def _write(self, upto: int, end: bool = False) -> None:
+        """Write buffered events up to seq `upto` not yet in the table."""
+        rows = [item for item in self._buffer if self.written_seq < item[0] <= upto]
+        if end:
+            rows.append((upto + 1, _END_EVENT, ""))
+        if rows:
+            async with get_db_connection() as db:
+                await db.executemany(
+                    "INSERT OR IGNORE INTO stream_events "
+                    "(stream_id, conversation_id, seq, event, data) VALUES (?, ?, ?, ?, ?)",
+                    [(self.stream_id, self.conversation_id, *row) for row in rows],
+                )
+                await db.commit()
+        self.written_seq = max(self.written_seq, upto)
+        self._written_at = time.monotonic()
+
+    async def _spill(self) -> None:
+        """Move the older half of the buffer to SQLite (written before evicted).
+
+        Eviction waits for a later spill while a table read is in progress:
+        that read may have run before this write landed.
+        """
+        count = len(self._buffer) - self._buffer_size // 2
+        await self._write(self._buffer[count - 1][0])
+        if self._table_reads:
+            return
+        for _ in range(count):
+            self._buffer.popleft()
+
+    async def finish(self) -> None:
+        """Write the rest of a shared stream and its end marker."""
+        if self._shared:
+            await self._write(self.last_seq, end=True)
+
+    def close(self) -> None:
+        self.done = True
+        self._notify()
+
+    async def _read_after(self, seq: int) -> list[StreamEvent]:
+        if self._buffer and seq + 1 >= self._buffer[0][0]:
+            return [item for item in self._buffer if item[0] > seq]
+        # Spills during the read write but do not evict, so every event
+        # after `seq` is in the table, the buffer afterwards, or both
+        self._table_reads += 1
+        try:
+            async with get_db_connection() as db:
+                cursor = await db.execute(
+                    """
+                    SELECT seq, event, data FROM stream_events
+                    WHERE stream_id = ? AND seq > ? AND event != ''
+                    ORDER BY seq ASC
+                    """,
+                    (self.stream_id, seq),
+                )
+                spilled = [(r["seq"], r["event"], r["data"]) for r in await cursor.fetchall()]
+        finally:
+            self._table_reads -= 1
+        last_spilled = spilled[-1][0] if spilled else seq
+        return spilled + [item for item in self._buffer if item[0] > last_spilled]
+
+    async def events_after(self, seq: int = 0) -> AsyncIterator[StreamEvent]:
+        """Yield every event after `seq`, then live events until the turn ends."""
+        while True:
+            changed = self._changed
+            batch = await self._read_after(seq) if seq < self.last_seq else []
+            for item in batch:
+                yield item
+                seq = item[0]
+            if batch:
+                continue
+            if self.done:
+                return
+            await changed.wait()
+
+
+class SpilledStream:
+    """A stream produced by another worker, followed through stream_events."""
+
+    def __init__(self, stream_id: str) -> None:
+        self.stream_id = stream_id
+
+    async def events_after(self, seq: int = 0) -> AsyncIterator[StreamEvent]:
+        """Yield every written event after `seq` until the end marker, or
+        until nothing new was written for ``stream_retention_seconds``."""
+        idle_since = time.monotonic()
+        while True:
+            async with get_db_connection() as db:
+                cursor = await db.execute(
+                    "SELECT seq, event, data FROM stream_events "
+                    "WHERE stream_id = ? AND seq > ? ORDER BY seq ASC",
+                    (self.stream_id, seq),
+                )
+                rows = await cursor.fetchall()
+            for row in rows:
+                if row["event"] == _END_EVENT:
+                    return
+                yield row["seq"], row["event"], row["data"]
+                seq = row["seq"]
+            now = time.monotonic()
+            if rows:
+                idle_since = now
+            elif now - idle_since >= settings.stream_retention_seconds:
+                return
+            await asyncio.sleep(settings.stream_follow_poll_ms / 1000)
+
+
+class StreamRegistry:
+    def __init__(self) -> None:
+        self._streams: dict[str, TurnStream] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self, conversation_id: str, source: AsyncIterator[tuple[str, str]]) -> TurnStream:
+        """Run `source` (yielding (event, data) pairs) in the background as a new stream."""
+        stream = TurnStream(
+            f"str_{uuid.uuid4().hex[:12]}", conversation_id, settings.stream_buffer_events,
+            shared=settings.workers > 1,
+        )
+        self._streams[stream.stream_id] = stream
+        task = asyncio.ensure_future(self._produce(stream, source))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return stream
+
+    def running(self) -> int:
+        """Streams whose turn is still producing events."""
+        return sum(1 for stream in self._streams.values() if not stream.done)
+
+    def get(self, conversation_id: str, stream_id: str) -> Optional[TurnStream]:
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.conversation_id != conversation_id:
+            return None
+        return stream
+
+    async def find(
+        self, conversation_id: str, stream_id: str, known: bool = False,
+    ) -> Optional[TurnStream | SpilledStream]:
+        """`get`, falling back to a stream another worker wrote through.
+
+        `known` skips the table check for a stream id this conversation is
+        known to have started (an idempotency record), which another worker
+        may not have written anything for yet.
+        """
+        stream = self.get(conversation_id, stream_id)
+        if stream is not None or settings.workers <= 1:
+            return stream
+        if not known:
+            async with get_db_connection() as db:
+                cursor = await db.execute(
+                    "SELECT 1 FROM stream_events WHERE stream_id = ? AND conversation_id = ? LIMIT 1",
+                    (stream_id, conversation_id),
+                )
+                if await cursor.fetchone() is None:
+                    return None
+        return SpilledStream(stream_id)
+
+    async def _produce(self, stream: TurnStream, source: AsyncIterator[tuple[str, str]]) -> None:
+        try:
+            # The turn's own trace: the SSE request lasts as long as the
+            # client stays connected, so it is not ranked
+            with detached_trace("stream turn"):
+                async for event, data in source:
+                    await stream.append(event, data)
+        except Exception:
+            logger.exception("Stream %s failed", stream.stream_id)
+        finally:
+            stream.close()
+            try:
+                await stream.finish()
+            except Exception:
+                logger.exception("Stream %s: writing the end failed", stream.stream_id)
+            asyncio.get_running_loop().call_later(
+                settings.stream_retention_seconds, self._expire, stream.stream_id,
+            )
+
+    def _expire(self, stream_id: str) -> None:
+        stream = self._streams.pop(stream_id, None)
+        if stream is not None and stream.written_seq:
+            task = asyncio.ensure_future(self._delete_spilled(stream_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _delete_spilled(stream_id: str) -> None:
+        async with get_db_connection() as db:
+            await db.execute("DELETE FROM stream_events WHERE stream_id = ?", (stream_id,))
+            await db.commit()
+
+    async def purge_stale(self) -> None:
+        """Drop spilled events left behind by earlier processes."""
+        async with get_db_connection() as db:
+            await db.execute(
+                "DELETE FROM stream_events WHERE created_at < datetime('now', ?)",
+                (f"-{int(settings.stream_retention_seconds)} seconds",),
+            )
+            await db.commit()
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+stream_registry = StreamRegistry()
+metrics.TURN_STREAMS.set_function(lambda: len(stream_registry._streams))
@@ -0,0 +1,81 @@
+"""Supervised background tasks keyed by conversation.
+
+Used for work that continues after a request has returned (e.g. deferred
+gate chaining). At most one task runs per conversation; each is bounded by
+a timeout (or bounds itself), failures are logged rather than lost, and
+everything still running is cancelled on shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TaskSupervisor:
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, key: str, coro: Awaitable[Any], timeout: Optional[float]) -> asyncio.Task:
+        """Run `coro` in the background under `key`, replacing nothing still running."""
+        if key in self._tasks and not self._tasks[key].done():
+            raise RuntimeError(f"background task already running for {key}")
+        task = asyncio.ensure_future(self._run(key, coro, timeout))
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    def running(self) -> int:
+        return sum(1 for task in self._tasks.values() if not task.done())
+
+    def get(self, key: str) -> Optional[asyncio.Task]:
+        return self._tasks.get(key)
+
+    async def wait(self, key: str, timeout: float | None = None) -> Any:
+        """Wait for the task under `key` (if any) without cancelling it on timeout.
+
+        Returns the task result, or None if there is no task, it failed or was
+        cancelled, or the timeout expired first. Cancelling the caller still
+        cancels the caller.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                raise
+            return None  # the awaited task was cancelled, not us
+        except Exception:
+            return None
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    @staticmethod
+    async def _run(key: str, coro: Awaitable[Any], timeout: float) -> Any:
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("background task for %s failed", key)
+            raise
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+
+task_supervisor = TaskSupervisor()
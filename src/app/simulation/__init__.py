@@ -0,0 +1,11 @@
+"""End-to-end quote-flow simulation against a fake LLM.
+
+Drives scripted conversations through the real ``quote_service`` /
+orchestrator / SQLite stack with OpenAI replaced by `FakeLLM`, and reports
+per-gate and per-stage timings. Run ``python -m src.app.simulation --help``.
+"""
+
+from .fake_llm import FakeLLM, LatencyModel
+from .harness import SimulationConfig, run_simulation
+
+__all__ = ["FakeLLM", "LatencyModel", "SimulationConfig", "run_simulation"]
@@ -0,0 +1,77 @@
+"""CLI: python -m src.app.simulation [options]"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+
+from .fake_llm import LatencyModel
+from .harness import STAGES, SimulationConfig, run_simulation
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m src.app.simulation", description=__doc__)
+    p.add_argument("--conversations", type=int, default=3)
+    p.add_argument("--concurrency", type=int, default=1)
+    p.add_argument("--stream", action="store_true", help="drive handle_message_stream")
+    p.add_argument("--prefetch", action="store_true", help="enable gate prefetching")
+    p.add_argument("--llm-median-ms", type=float, default=2000.0)
+    p.add_argument("--llm-sigma", type=float, default=0.5)
+    p.add_argument("--auto-complete", default="", help="comma-separated gates that return ok unasked")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--db", default=None, help="SQLite path (default: temporary file)")
+    p.add_argument("--out", default=None, help="write the JSON report here")
+    p.add_argument("--compare", default=None, help="earlier JSON report to diff against")
+    return p.parse_args(argv)
+
+
+def _print_summary(report: dict, baseline: dict | None) -> None:
+    totals = report["totals"]
+    print(
+        f"{totals['turns']} turns, {totals['completed_conversations']} completed, "
+        f"{totals['db_queries']} DB queries, {totals['llm_calls']} LLM calls, "
+        f"{totals['errors']} errors, wall {totals['wall_s']:.2f}s"
+    )
+    print(f"turn wall p50 {report['turn_wall_s']['p50']:.3f}s  p95 {report['turn_wall_s']['p95']:.3f}s")
+    print("stage totals (s):")
+    for stage in (*STAGES, "other"):
+        line = f"  {stage:<13}{report['stages_s'][stage]:10.3f}"
+        if baseline:
+            line += f"   (was {baseline['stages_s'].get(stage, 0.0):.3f})"
+        print(line)
+    print("per gate:         turns   p50 wall   db   llm")
+    for gate, stats in report["gates"].items():
+        w = stats["turn_wall_s"]
+        print(f"  gate {gate:<10}{w['count']:6d} {w['p50']:9.3f}s {stats['db_queries']:5d} {stats['llm_calls']:5d}")
+    if baseline:
+        before = baseline["totals"]["wall_s"]
+        print(f"wall: {before:.2f}s → {totals['wall_s']:.2f}s")
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    cfg = SimulationConfig(
+        conversations=args.conversations,
+        concurrency=args.concurrency,
+        stream=args.stream,
+        prefetch=args.prefetch,
+        seed=args.seed,
+        latency=LatencyModel(median_s=args.llm_median_ms / 1000.0, sigma=args.llm_sigma),
+        auto_complete=frozenset(int(g) for g in args.auto_complete.split(",") if g.strip()),
+        db_path=args.db,
+    )
+    report = asyncio.run(run_simulation(cfg))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    _print_summary(report, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Scripted stand-in for the OpenAI prompt calls, with realistic latency."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import json
+import random
+import re
+from typing import Any, AsyncGenerator, Optional
+
+from ..gates.registry import active_registry
+
+# Scripted user answers name the gate they answer: "gate 5: B"
+ANSWER_RE = re.compile(r"\bgate (\d+):")
+
+
+@dataclasses.dataclass
+class LatencyModel:
+    """Log-normal latency: `median_s` with spread `sigma` (0 = constant)."""
+    median_s: float = 2.0
+    sigma: float = 0.5
+    first_token_fraction: float = 0.3   # streaming: share spent before the first delta
+
+    def sample(self, rng: random.Random) -> float:
+        if self.sigma <= 0:
+            return self.median_s
+        return self.median_s * rng.lognormvariate(0.0, self.sigma)
+
+
+def _gate_facts(number: int) -> dict[str, Any]:
+    """Data a completed gate hands to downstream gates."""
+    if number == 2:
+        return {"state": "FL", "width_ft_assumed": 14, "length_ft_assumed": 20}
+    if number == 19:
+        return {"width_ft_confirmed": 14, "length_ft_confirmed": 20, "comparison_mode": False}
+    if number == 3:
+        return {"total_bays": 2}
+    if number == 4:
+        return {"structure_type": "freestanding"}
+    return {
+        "result_single": {
+            f"gate_{number}_choice": "standard",
+            "price": 1000.0 + number,
+            "items": [{"sku": f"SKU-{number}-{i}", "qty": 1} for i in range(3)],
+        }
+    }
+
+
+class FakeLLM:
+    """Replaces ``openai_service.call_prompt`` / ``stream_prompt``.
+
+    A gate asks one question with lettered options; once the last user
+    message answers that gate ("gate N: …") it returns ``status: ok`` with
+    some facts. Gates in `auto_complete` return ok immediately.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyModel] = None,
+        seed: int = 0,
+        auto_complete: frozenset[int] = frozenset(),
+    ) -> None:
+        self.latency = latency or LatencyModel()
+        self.rng = random.Random(seed)
+        self.auto_complete = auto_complete
+        self.calls: list[dict[str, Any]] = []
+
+    def _gate_for(self, prompt_id: str) -> int:
+        for number, gate in active_registry().gates.items():
+            if gate.prompt_id == prompt_id:
+                return number
+        return 0
+
+    def respond(self, prompt_id: str, messages: list[dict[str, str]]) -> str:
+        number = self._gate_for(prompt_id)
+        last_user = next(
+            (m["content"] for m in reversed(messages) if m["role"] == "user"), "",
+        )
+        m = ANSWER_RE.search(last_user)
+        answered = m is not None and int(m.group(1)) == number
+        if answered or number in self.auto_complete:
+            return json.dumps({"status": "ok", **_gate_facts(number)})
+        return json.dumps({
+            "status": "needs_info",
+            "questions": [f"Gate {number}: pick one A) Standard B) Premium C) Skip"],
+        })
+
+    async def call_prompt(
+        self,
+        prompt_id: str,
+        messages: list[dict[str, str]],
+        variables: dict[str, str] | None = None,
+        version: str | None = None,
+    ) -> str:
+        delay = self.latency.sample(self.rng)
+        self.calls.append({"prompt_id": prompt_id, "latency_s": delay, "stream": False})
+        await asyncio.sleep(delay)
+        return self.respond(prompt_id, messages)
+
+    async def stream_prompt(
+        self,
+        prompt_id: str,
+        messages: list[dict[str, str]],
+        variables: dict[str, str] | None = None,
+        version: str | None = None,
+    ) -> AsyncGenerator[str, None]:
+        delay = self.latency.sample(self.rng)
+        self.calls.append({"prompt_id": prompt_id, "latency_s": delay, "stream": True})
+        text = self.respond(prompt_id, messages)
+        pieces = [text[i : i + 16] for i in range(0, len(text), 16)] or [""]
+        await asyncio.sleep(delay * self.latency.first_token_fraction)
+        rest = delay * (1 - self.latency.first_token_fraction) / len(pieces)
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(rest)
+            yield piece
@@ -0,0 +1,298 @@
+"""Scripted conversation driver with per-gate / per-stage instrumentation.
+
+Stages are measured by temporarily wrapping the functions that implement
+them; each conversation runs in its own task, so a context variable ties
+every measurement to the turn that caused it (including prefetch tasks the
+turn spawned):
+
+    db            aiosqlite execute / executemany / commit / fetch*
+    json          JSON encode/decode in conversation_service
+    session       SessionState.from_dict / to_dict
+    prompt_build  orchestrator.resolve_variables
+    llm           FakeLLM calls (async wall time, overlaps under prefetch)
+    display       build_display
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import functools
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import aiosqlite
+
+from ..config import settings
+from ..database import init_db
+from ..gates.session_state import SessionState
+from ..services import conversation_service as conv_svc
+from ..services import openai_service, quote_service
+from ..services.orchestrator import GateOrchestrator
+from .fake_llm import FakeLLM, LatencyModel
+
+STAGES = ("db", "json", "session", "prompt_build", "llm", "display")
+
+
+@dataclasses.dataclass
+class SimulationConfig:
+    conversations: int = 3
+    concurrency: int = 1
+    stream: bool = False
+    prefetch: bool = False
+    max_turns: int = 60
+    seed: int = 0
+    latency: LatencyModel = dataclasses.field(default_factory=LatencyModel)
+    auto_complete: frozenset[int] = frozenset()
+    db_path: Optional[str] = None
+
+
+@dataclasses.dataclass
+class _TurnStats:
+    stages: dict[str, float] = dataclasses.field(
+        default_factory=lambda: dict.fromkeys(STAGES, 0.0)
+    )
+    db_queries: int = 0
+    llm_calls: int = 0
+
+
+_turn: contextvars.ContextVar[Optional[_TurnStats]] = contextvars.ContextVar(
+    "sim_turn", default=None,
+)
+
+
+def _add(stage: str, elapsed: float) -> None:
+    stats = _turn.get()
+    if stats is not None:
+        stats.stages[stage] += elapsed
+
+
+def _timed_sync(stage: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _add(stage, time.perf_counter() - t0)
+    return wrapper
+
+
+def _timed_async(stage: str, fn: Callable, query: bool = False, llm: bool = False) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        stats = _turn.get()
+        if stats is not None:
+            stats.db_queries += query
+            stats.llm_calls += llm
+        t0 = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            _add(stage, time.perf_counter() - t0)
+    return wrapper
+
+
+def _timed_stream(stage: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        stats = _turn.get()
+        if stats is not None:
+            stats.llm_calls += 1
+        t0 = time.perf_counter()
+        try:
+            async for item in fn(*args, **kwargs):
+                yield item
+        finally:
+            _add(stage, time.perf_counter() - t0)
+    return wrapper
+
+
+class _TimedJSON:
+    """Stand-in for the ``json`` module inside conversation_service."""
+    JSONDecodeError = json.JSONDecodeError
+    dumps = staticmethod(_timed_sync("json", json.dumps))
+    loads = staticmethod(_timed_sync("json", json.loads))
+
+
+@contextlib.contextmanager
+def _patched(patches: list[tuple[Any, str, Any]]) -> Iterator[None]:
+    saved = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+    try:
+        for obj, name, value in patches:
+            setattr(obj, name, value)
+        yield
+    finally:
+        for obj, name, value in reversed(saved):
+            setattr(obj, name, value)
+
+
+def _instrumentation(llm: FakeLLM) -> list[tuple[Any, str, Any]]:
+    conn, cur = aiosqlite.Connection, aiosqlite.Cursor
+    return [
+        (conn, "execute", _timed_async("db", conn.execute, query=True)),
+        (conn, "executemany", _timed_async("db", conn.executemany, query=True)),
+        (conn, "commit", _timed_async("db", conn.commit)),
+        (cur, "fetchone", _timed_async("db", cur.fetchone)),
+        (cur, "fetchall", _timed_async("db", cur.fetchall)),
+        (conv_svc, "json", _TimedJSON),
+        (SessionState, "from_dict", classmethod(_timed_sync("session", SessionState.from_dict.__func__))),
+        (SessionState, "to_dict", _timed_sync("session", SessionState.to_dict)),
+        (GateOrchestrator, "resolve_variables", _timed_sync("prompt_build", GateOrchestrator.resolve_variables)),
+        (openai_service, "call_prompt", _timed_async("llm", llm.call_prompt, llm=True)),
+        (openai_service, "stream_prompt", _timed_stream("llm", llm.stream_prompt)),
+        (quote_service, "build_display", _timed_sync("display", quote_service.build_display)),
+    ]
+
+
+async def _run_turn(cfg: SimulationConfig, conversation_id: str, message: str) -> dict[str, Any]:
+    if not cfg.stream:
+        return await quote_service.handle_message(conversation_id, message)
+    msg: dict[str, Any] = {}
+    async for event in quote_service.handle_message_stream(conversation_id, message):
+        if event["type"] == "done":
+            msg = event["message"]
+    return msg
+
+
+async def _run_conversation(cfg: SimulationConfig, index: int) -> dict[str, Any]:
+    conv = await conv_svc.create_conversation(client_id=index, user_id=index)
+    conversation_id = conv["conversation_id"]
+    turns: list[dict[str, Any]] = []
+    message = "Hi"
+    completed = False
+    t_conv = time.perf_counter()
+
+    for _ in range(cfg.max_turns):
+        stats = _TurnStats()
+        token = _turn.set(stats)
+        t0 = time.perf_counter()
+        try:
+            msg = await _run_turn(cfg, conversation_id, message)
+        finally:
+            _turn.reset(token)
+        wall = time.perf_counter() - t0
+
+        meta = msg.get("metadata") or {}
+        display = msg.get("display") or {}
+        turns.append({
+            "gate_number": meta.get("gate_number"),
+            "next_gate_number": display.get("gate_number"),
+            "wall_s": wall,
+            "stages": stats.stages,
+            "db_queries": stats.db_queries,
+            "llm_calls": stats.llm_calls,
+            "error": meta.get("next_gate_error"),
+        })
+        if "advanced_to_gate" in meta and meta["advanced_to_gate"] is None:
+            completed = True
+            break
+        gate = display.get("gate_number")
+        message = "A" if gate == 1 else f"gate {gate}: A"
+
+    state = await conv_svc.get_session_state(conversation_id)
+    return {
+        "conversation_id": conversation_id,
+        "wall_s": time.perf_counter() - t_conv,
+        "turns": turns,
+        "completed": completed,
+        "session_bytes": len(json.dumps(state)),
+    }
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+        "total": sum(ordered),
+    }
+
+
+def _report(cfg: SimulationConfig, conversations: list[dict[str, Any]], wall: float) -> dict[str, Any]:
+    turns = [t for c in conversations for t in c["turns"]]
+    by_gate: dict[str, list[dict[str, Any]]] = {}
+    for t in turns:
+        by_gate.setdefault(str(t["gate_number"]), []).append(t)
+
+    def _stage_totals(items: list[dict[str, Any]]) -> dict[str, float]:
+        totals = {s: sum(t["stages"][s] for t in items) for s in STAGES}
+        totals["other"] = max(0.0, sum(t["wall_s"] for t in items) - sum(totals.values()))
+        return totals
+
+    return {
+        "config": {
+            "conversations": cfg.conversations,
+            "concurrency": cfg.concurrency,
+            "stream": cfg.stream,
+            "prefetch": cfg.prefetch,
+            "seed": cfg.seed,
+            "latency": dataclasses.asdict(cfg.latency),
+            "auto_complete": sorted(cfg.auto_complete),
+        },
+        "totals": {
+            "wall_s": wall,
+            "turns": len(turns),
+            "completed_conversations": sum(c["completed"] for c in conversations),
+            "db_queries": sum(t["db_queries"] for t in turns),
+            "llm_calls": sum(t["llm_calls"] for t in turns),
+            "errors": sum(1 for t in turns if t["error"]),
+            "session_bytes_mean": statistics.fmean(c["session_bytes"] for c in conversations),
+        },
+        "conversation_wall_s": _summary([c["wall_s"] for c in conversations]),
+        "turn_wall_s": _summary([t["wall_s"] for t in turns]),
+        "stages_s": _stage_totals(turns),
+        "gates": {
+            gate: {
+                "turn_wall_s": _summary([t["wall_s"] for t in items]),
+                "stages_s": _stage_totals(items),
+                "db_queries": sum(t["db_queries"] for t in items),
+                "llm_calls": sum(t["llm_calls"] for t in items),
+            }
+            for gate, items in by_gate.items()
+        },
+    }
+
+
+async def run_simulation(cfg: SimulationConfig) -> dict[str, Any]:
+    """Run `cfg.conversations` scripted quotes and return the report dict."""
+    llm = FakeLLM(latency=cfg.latency, seed=cfg.seed, auto_complete=cfg.auto_complete)
+    tmpdir = None
+    db_path = cfg.db_path
+    if db_path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmpdir.name, "simulation.db")
+
+    saved = (settings.database_url, settings.gate_prefetch_enabled)
+    settings.database_url = db_path
+    settings.gate_prefetch_enabled = cfg.prefetch
+    try:
+        await init_db()
+        semaphore = asyncio.Semaphore(max(1, cfg.concurrency))
+
+        async def _one(index: int) -> dict[str, Any]:
+            async with semaphore:
+                return await _run_conversation(cfg, index)
+
+        with _patched(_instrumentation(llm)):
+            t0 = time.perf_counter()
+            conversations = await asyncio.gather(
+                *(_one(i) for i in range(cfg.conversations))
+            )
+            wall = time.perf_counter() - t0
+        return _report(cfg, list(conversations), wall)
+    finally:
+        settings.database_url, settings.gate_prefetch_enabled = saved
+        if tmpdir is not None:
+            tmpdir.cleanup()
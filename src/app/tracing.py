@@ -0,0 +1,277 @@
+"""Request-scoped tracing spans.
+
+A trace is started per HTTP request by `TracingMiddleware` and carried in a
+contextvar, so anything awaited on behalf of the request, including tasks
+it spawns, can open child spans with ``with span("name"):``. Work that
+outlives the request (a deferred chain, a stream producer) runs under its
+own trace from `detached_trace`, linked to the request's by
+``parent_trace_id``; a span opened after its trace has finished does
+nothing. Outside a trace `span` does nothing either.
+
+Finished traces are kept in memory only if they are among the slowest
+`trace_retain_slowest` seen, and are optionally re-emitted through
+OpenTelemetry when it is installed. Requests that are slow by design are
+never retained: long-polls, SSE responses and admin calls (a profile
+request lasts as long as it samples). A streamed turn is ranked by its
+producer's detached trace instead of by how long the client stayed
+connected.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import re
+import time
+import uuid
+from typing import Any, Iterator, Optional
+
+from .config import settings
+
+try:  # optional: export finished traces through the OpenTelemetry API
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - depends on the deployment
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{16,32}$")
+_UNRANKED_ROUTES = frozenset({
+    "GET /api/v1/conversations/{conversation_id}/events",
+    "GET /api/v1/conversations/{conversation_id}/messages/next-gate",
+})
+_UNRANKED_PREFIX = "/api/v1/admin/"
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(
+        self, name: str, parent_id: Optional[str], attributes: dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+
+class Trace:
+    __slots__ = (
+        "trace_id", "name", "started_at", "start", "end", "spans", "dropped", "status", "ranked",
+        "parent_trace_id",
+    )
+
+    def __init__(self, trace_id: str, name: str, parent_trace_id: Optional[str] = None) -> None:
+        self.trace_id = trace_id
+        self.name = name
+        self.parent_trace_id = parent_trace_id   # request that started detached work
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self.status: Optional[int] = None
+        self.ranked = True     # eligible for the slowest-N retention
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "trace", default=None,
+)
+_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "trace_span", default=None,
+)
+_slowest: list[tuple[float, int, Trace]] = []   # min-heap on duration
+_tiebreak = itertools.count()
+
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token, value: Any) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # An async generator finalised from another context; just restore
+        var.set(value)
+
+
+# ── Spans ───────────────────────────────────────────────────────────
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span."""
+    trace = _trace.get()
+    if trace is None or trace.end is not None:
+        yield None
+        return
+    parent = _span.get()
+    current = Span(name, parent.span_id if parent else None, attributes)
+    if len(trace.spans) < settings.trace_max_spans:
+        trace.spans.append(current)
+    else:
+        trace.dropped += 1
+    token = _span.set(current)
+    try:
+        yield current
+    except Exception as exc:
+        current.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _reset(_span, token, parent)
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes to the current span (no-op outside a trace)."""
+    current = _span.get()
+    trace = _trace.get()
+    if current is not None and trace is not None and trace.end is None:
+        current.attributes.update(attributes)
+
+
+# ── Traces ──────────────────────────────────────────────────────────
+
+def start_trace(
+    name: str, trace_id: Optional[str] = None, parent_trace_id: Optional[str] = None,
+) -> tuple[Trace, contextvars.Token]:
+    trace = Trace(trace_id or uuid.uuid4().hex, name, parent_trace_id)
+    return trace, _trace.set(trace)
+
+
+@contextlib.contextmanager
+def detached_trace(name: str) -> Iterator[Optional[Trace]]:
+    """Trace the enclosed block as its own (ranked) trace.
+
+    For work that runs on after the request that started it has returned;
+    the new trace records the request's trace id as ``parent_trace_id``.
+    """
+    if not settings.tracing_enabled:
+        yield None
+        return
+    parent = _trace.get()
+    trace, token = start_trace(name, parent_trace_id=parent.trace_id if parent else None)
+    span_token = _span.set(None)
+    try:
+        yield trace
+    finally:
+        _reset(_span, span_token, None)
+        finish_trace(trace, token)
+
+
+def finish_trace(trace: Trace, token: contextvars.Token) -> None:
+    trace.end = time.perf_counter()
+    _reset(_trace, token, None)
+    _retain(trace)
+    if settings.trace_otel_export and otel_trace is not None:
+        try:
+            _export_otel(trace)
+        except Exception:
+            logger.exception("OpenTelemetry export failed for trace %s", trace.trace_id)
+
+
+def _retain(trace: Trace) -> None:
+    limit = settings.trace_retain_slowest
+    if limit <= 0 or not trace.ranked:
+        return
+    item = (trace.duration, next(_tiebreak), trace)
+    if len(_slowest) < limit:
+        heapq.heappush(_slowest, item)
+    elif item[0] > _slowest[0][0]:
+        heapq.heapreplace(_slowest, item)
+
+
+def slowest_traces() -> list[Trace]:
+    """Retained traces, slowest first."""
+    return [trace for _, _, trace in sorted(_slowest, reverse=True)]
+
+
+def _export_otel(trace: Trace) -> None:
+    """Re-emit a finished trace (root plus every closed span) via OpenTelemetry."""
+    tracer = otel_trace.get_tracer("quoteapp")
+
+    def ns(t: float) -> int:
+        return int((trace.started_at + t - trace.start) * 1e9)
+
+    root = tracer.start_span(
+        trace.name,
+        start_time=ns(trace.start),
+        attributes={
+            "quoteapp.trace_id": trace.trace_id,
+            "quoteapp.parent_trace_id": trace.parent_trace_id or "",
+            "http.status_code": trace.status or 0,
+        },
+    )
+    contexts = {None: otel_trace.set_span_in_context(root)}
+    for item in trace.spans:           # parents are appended before children
+        if item.end is None:
+            continue
+        exported = tracer.start_span(
+            item.name,
+            context=contexts.get(item.parent_id, contexts[None]),
+            start_time=ns(item.start),
+            attributes=item.attributes,
+        )
+        exported.end(end_time=ns(item.end))
+        contexts[item.span_id] = otel_trace.set_span_in_context(exported)
+    root.end(end_time=ns(trace.end))
+
+
+# ── Middleware ──────────────────────────────────────────────────────
+
+class TracingMiddleware:
+    """Trace every HTTP request and return its id in ``X-Trace-Id``.
+
+    A well-formed incoming ``X-Trace-Id`` (16–32 hex chars) is reused so a
+    caller can correlate its own logs.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"x-trace-id":
+                incoming = value.decode("latin-1").strip().lower()
+                break
+        trace, token = start_trace(
+            f"{scope['method']} {scope['path']}",
+            incoming if _TRACE_ID_RE.match(incoming) else None,
+        )
+
+        async def send_wrapper(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+                        trace.ranked = False
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-trace-id", trace.trace_id.encode("ascii")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                trace.name = f"{scope['method']} {route.path}"
+            if trace.name in _UNRANKED_ROUTES or scope["path"].startswith(_UNRANKED_PREFIX):
+                trace.ranked = False
+            finish_trace(trace, token)
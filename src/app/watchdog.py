@@ -0,0 +1,102 @@
+"""Event-loop lag monitor and blocked-loop watchdog.
+
+`LoopLagMonitor` ticks on the event loop and records how late each tick
+fires; every tick also refreshes a heartbeat. A separate watchdog thread
+watches that heartbeat: when the loop has not ticked for
+`loop_stall_dump_seconds` it logs the loop thread's current stack, which
+names whatever is blocking it, once per stall.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from . import metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires; that delay is the loop lag."""
+
+    interval = 0.1
+    window = 50   # ticks remembered for `peak_lag` (about five seconds)
+
+    def __init__(self) -> None:
+        self.lag = 0.0
+        self._recent: deque[float] = deque(maxlen=self.window)
+        self.last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._loop_thread: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def current_lag(self) -> float:
+        """The last measured lag, or how long the loop has been silent if that is longer."""
+        silent = time.monotonic() - self.last_beat - self.interval
+        return max(self.lag, silent)
+
+    @property
+    def peak_lag(self) -> float:
+        """The worst lag over the last few seconds, including an ongoing stall."""
+        return max(self.current_lag, max(self._recent, default=0.0))
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._task = asyncio.ensure_future(self._run())
+        if settings.loop_stall_dump_seconds > 0:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="quoteapp-loop-watchdog", daemon=True,
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._watchdog = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last_beat = time.monotonic()
+            self.lag = max(0.0, self.last_beat - start - self.interval)
+            self._recent.append(self.lag)
+
+    def _watch(self) -> None:
+        dumped = False
+        threshold = settings.loop_stall_dump_seconds
+        while not self._stopping.wait(self.interval):
+            stalled = time.monotonic() - self.last_beat
+            if stalled < threshold:
+                dumped = False
+                continue
+            if dumped:
+                continue
+            dumped = True
+            metrics.LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>\n"
+            logger.error(
+                "Event loop blocked for %.2fs; loop thread stack:\n%s", stalled, stack,
+            )
+
+
+loop_lag = LoopLagMonitor()
+metrics.LOOP_LAG_SECONDS.set_function(lambda: loop_lag.current_lag)
@@ -0,0 +1,89 @@
+"""Hard deletes take every dependent row along; shared blobs stay while referenced."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+from src.app.config import settings
+from src.app.database import get_db_connection, init_db
+from src.app.services import blob_store
+from src.app.services import conversation_service as conv_svc
+
+SHARED = "sha256:" + "a" * 64
+OWN = "sha256:" + "b" * 64
+DEPENDENT_TABLES = (
+    "messages", "stream_events", "idempotency_keys", "conversation_locks", "websocket_tickets",
+)
+
+
+async def _count(table: str, where: str = "1", params: tuple = ()) -> int:
+    async with get_db_connection() as db:
+        cursor = await db.execute(f"SELECT COUNT(*) AS n FROM {table} WHERE {where}", params)
+        return (await cursor.fetchone())["n"]
+
+
+async def _conversation(*digests: str) -> str:
+    cid = (await conv_svc.create_conversation(1, 1))["conversation_id"]
+    state = {"product_config": {f"k{i}": {"$blob": d} for i, d in enumerate(digests)}}
+    await conv_svc.update_session_state(cid, state)
+    return cid
+
+
+def test_hard_delete_and_blob_gc(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "delete.db"))
+
+    async def run() -> None:
+        await init_db()
+        await blob_store.put_many({SHARED: json.dumps({"x": 1}), OWN: json.dumps({"y": 2})})
+        keep = await _conversation(SHARED)
+        gone = await _conversation(SHARED, OWN)
+        await conv_svc.add_message(gone, "user", "hi")
+        async with get_db_connection() as db:
+            await db.execute(
+                "INSERT INTO stream_events (stream_id, conversation_id, seq, event, data) "
+                "VALUES ('str_1', ?, 1, 'chunk', '{}')", (gone,),
+            )
+            await db.execute(
+                "INSERT INTO idempotency_keys (conversation_id, key, fingerprint, status, expires_at) "
+                "VALUES (?, 'k', 'f', 'done', 0)", (gone,),
+            )
+            await db.execute(
+                "INSERT INTO conversation_locks (conversation_id, owner, expires_at) VALUES (?, 'o', 0)",
+                (gone,),
+            )
+            await db.execute(
+                "INSERT INTO websocket_tickets (ticket, conversation_id, expires_at) VALUES ('t', ?, 0)",
+                (gone,),
+            )
+            # Past the grace period
+            await db.execute("UPDATE blobs SET created_at = datetime('now', '-2 hours')")
+            await db.commit()
+
+        await conv_svc.hard_delete_conversation(gone)
+        for table in DEPENDENT_TABLES:
+            assert await _count(table, "conversation_id = ?", (gone,)) == 0, table
+        assert await _count("blobs", "hash = ?", (OWN,)) == 0
+        assert await _count("blobs", "hash = ?", (SHARED,)) == 1
+
+        # Nothing references the shared blob once the other conversation goes
+        async with get_db_connection() as db:
+            await db.execute("DELETE FROM conversations WHERE id = ?", (keep,))
+            await db.commit()
+        assert await blob_store.collect_garbage() == 1
+        assert await _count("blobs") == 0
+
+    asyncio.run(run())
+
+
+def test_gc_keeps_recently_written_blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "gc.db"))
+
+    async def run() -> None:
+        await init_db()
+        # Written by a turn that has not saved its state yet
+        await blob_store.put_many({OWN: json.dumps({"y": 2})})
+        assert await blob_store.collect_garbage() == 0
+        assert await _count("blobs") == 1
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+"""Conversation lease lock: one holder at a time, hand-off, and lost leases."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.app.config import settings
+from src.app.database import get_db_connection, init_db
+from src.app.services.conversation_lock import (
+    ConversationBusyError,
+    ConversationLockLostError,
+    ConversationLocks,
+)
+
+CONVERSATION = "conv_lock"
+
+
+@pytest.fixture(autouse=True)
+def _database(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "locks.db"))
+    asyncio.run(init_db())
+
+
+def test_second_holder_waits_until_release():
+    async def run() -> None:
+        worker_a, worker_b = ConversationLocks(), ConversationLocks()
+        lock = await worker_a.acquire(CONVERSATION)
+        with pytest.raises(ConversationBusyError):
+            await worker_b.acquire(CONVERSATION, timeout=0.1)
+        waiter = asyncio.ensure_future(worker_b.acquire(CONVERSATION, timeout=5))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await lock.release()
+        await (await waiter).release()
+
+    asyncio.run(run())
+
+
+def test_handed_off_lock_is_held_until_the_background_work_ends():
+    async def run() -> None:
+        locks = ConversationLocks()
+        lock = await locks.acquire(CONVERSATION)
+        finish = asyncio.Event()
+        background = asyncio.ensure_future(lock.released_after(finish.wait()))
+        await lock.release()            # the request returns
+        with pytest.raises(ConversationBusyError):
+            await locks.acquire(CONVERSATION, timeout=0.1)
+        finish.set()
+        await background
+        await (await locks.acquire(CONVERSATION, timeout=1)).release()
+
+    asyncio.run(run())
+
+
+def test_holder_that_loses_its_lease_stops_with_lock_lost(monkeypatch):
+    monkeypatch.setattr(settings, "conversation_lock_ttl_seconds", 1)
+
+    async def run() -> None:
+        locks = ConversationLocks()
+
+        async def turn() -> None:
+            async with locks.hold(CONVERSATION):
+                # Another worker takes over the expired lease meanwhile
+                async with get_db_connection() as db:
+                    await db.execute(
+                        "UPDATE conversation_locks SET owner = 'other' WHERE conversation_id = ?",
+                        (CONVERSATION,),
+                    )
+                    await db.commit()
+                await asyncio.sleep(5)
+
+        with pytest.raises(ConversationLockLostError):
+            await asyncio.wait_for(turn(), 3)
+        # The new owner's lease is left alone
+        async with get_db_connection() as db:
+            cursor = await db.execute(
+                "SELECT owner FROM conversation_locks WHERE conversation_id = ?", (CONVERSATION,),
+            )
+            assert (await cursor.fetchone())["owner"] == "other"
+
+    asyncio.run(run())
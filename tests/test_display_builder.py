@@ -0,0 +1,65 @@
+"""Option parsing: the linear scanner must agree with the regex it backs up."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from src.app.services import display_builder
+from src.app.services.display_builder import parse_options
+
+FUZZ_CASES = 50_000
+FUZZ_ALPHABET = "ABCDZa x\n\t ).-,;:"
+
+
+def _random_texts(seed: int, cases: int, max_len: int):
+    rng = random.Random(seed)
+    for _ in range(cases):
+        yield "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+def test_scanner_matches_regex_on_random_text():
+    for text in _random_texts(seed=0, cases=FUZZ_CASES, max_len=24):
+        assert display_builder._scan_options(text) == display_builder._regex_options(text), text
+
+
+def test_scanner_matches_regex_with_long_whitespace_runs():
+    rng = random.Random(1)
+    for text in _random_texts(seed=1, cases=2_000, max_len=12):
+        run = " " * rng.randint(17, 40) if rng.random() < 0.5 else "\n" * rng.randint(17, 40)
+        cut = rng.randint(0, len(text))
+        text = text[:cut] + run + text[cut:]
+        assert display_builder._scan_options(text) == display_builder._regex_options(text), text
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Which product?\nA) R-Blade\nB) R-Breeze\nC) K-Bana",
+        "A) Yes, B) No",
+        "A) x" + " " * 5000 + "y",
+        "A) " + "B . " * 2000,
+        "B) starts at B",
+        "",
+    ],
+)
+def test_parse_options_is_path_independent(text):
+    matches = display_builder._regex_options(text)
+    expected = [
+        {
+            "key": letter,
+            "label": label.strip().rstrip(","),
+            "value": display_builder._NON_ALNUM_RE.sub("_", label.strip().rstrip(",").lower()).strip("_"),
+        }
+        for letter, label in (matches or [])
+    ]
+    assert parse_options(text) == expected
+
+
+def test_parse_options_typical_question():
+    options = parse_options("Which product?\nA) R-Blade\nB) Sky-Tilt")
+    assert options == [
+        {"key": "A", "label": "R-Blade", "value": "r_blade"},
+        {"key": "B", "label": "Sky-Tilt", "value": "sky_tilt"},
+    ]
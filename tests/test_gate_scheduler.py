@@ -0,0 +1,65 @@
+"""Gate prefetching: prefetched answers are used along auto-completing runs."""
+
+from __future__ import annotations
+
+import asyncio
+
+from src.app import metrics
+from src.app.gates.models import GateConfig, GateStatus, GateType
+from src.app.services.gate_scheduler import GateScheduler, _fingerprint
+from src.app.simulation.fake_llm import LatencyModel
+from src.app.simulation.harness import SimulationConfig, run_simulation
+
+
+def _prefetch_lookups() -> dict[str, float]:
+    return {
+        labels[1]: value
+        for labels, value in metrics.CACHE_REQUESTS._values().items()
+        if labels[0] == "prefetch"
+    }
+
+
+def _simulate(prefetch: bool) -> tuple[dict, dict[str, float]]:
+    before = _prefetch_lookups()
+    cfg = SimulationConfig(
+        conversations=3,
+        prefetch=prefetch,
+        latency=LatencyModel(median_s=0.002, sigma=0.0),
+        auto_complete=frozenset({6, 7, 8}),
+    )
+    report = asyncio.run(run_simulation(cfg))
+    after = _prefetch_lookups()
+    return report, {k: after.get(k, 0.0) - before.get(k, 0.0) for k in ("hit", "miss")}
+
+
+def test_prefetch_hits_along_auto_completing_gates_without_extra_calls():
+    baseline, _ = _simulate(prefetch=False)
+    report, lookups = _simulate(prefetch=True)
+    assert report["totals"]["errors"] == 0
+    assert report["totals"]["completed_conversations"] == 3
+    assert lookups["hit"] > 0
+    assert report["totals"]["llm_calls"] <= baseline["totals"]["llm_calls"]
+
+
+def test_fingerprint_ignores_advisory_inputs_only():
+    gate = GateConfig(
+        number=7,
+        name="Test",
+        gate_type=GateType.UNIVERSAL,
+        prompt_id="pmpt_test",
+        variables_template={"product": "product_id", "context": "quote_context"},
+        status=GateStatus.ACTIVE,
+    )
+    base = _fingerprint(gate, {"product": "r_blade", "context": "{}"})
+    assert _fingerprint(gate, {"product": "r_blade", "context": '{"a":1}'}) == base
+    assert _fingerprint(gate, {"product": "sky_tilt", "context": "{}"}) != base
+
+
+def test_nothing_is_prefetched_past_a_gate_that_asks():
+    scheduler = GateScheduler()
+
+    class _Session:
+        gate_sequence = [1, 2, 3]
+        current_gate = 1
+
+    assert scheduler.ready_gates(_Session()) == []
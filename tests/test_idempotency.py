@@ -0,0 +1,94 @@
+"""Idempotency keys: retries replay the first attempt instead of re-running it."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.app.config import settings
+from src.app.database import init_db
+from src.app.services.idempotency import (
+    STATUS_COMPLETED,
+    IdempotencyError,
+    IdempotencyStore,
+    fingerprint,
+)
+
+CONVERSATION = "conv_idem"
+KEY = "key-1"
+REQUEST = fingerprint("send", {"message": "hello", "defer_chain": False})
+RESPONSE = {"message_id": "msg_1", "content": "Which product?"}
+
+
+@pytest.fixture(autouse=True)
+def _database(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "idempotency.db"))
+    asyncio.run(init_db())
+
+
+def test_completed_key_replays_the_stored_response():
+    async def run():
+        store = IdempotencyStore()
+        assert await store.begin(CONVERSATION, KEY, REQUEST) is None
+        await store.complete(CONVERSATION, KEY, RESPONSE)
+        # Another worker sees the same result
+        return await IdempotencyStore().begin(CONVERSATION, KEY, REQUEST)
+
+    record = asyncio.run(run())
+    assert record.status == STATUS_COMPLETED
+    assert record.response == RESPONSE
+
+
+def test_key_reused_with_a_different_request_is_rejected():
+    async def run() -> None:
+        store = IdempotencyStore()
+        await store.begin(CONVERSATION, KEY, REQUEST)
+        other = fingerprint("send", {"message": "goodbye", "defer_chain": False})
+        with pytest.raises(IdempotencyError) as err:
+            await store.begin(CONVERSATION, KEY, other)
+        assert (err.value.status_code, err.value.code) == (422, "idempotency_key_mismatch")
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("same_worker", [True, False])
+def test_retry_during_the_first_attempt_waits_for_its_result(same_worker):
+    async def run():
+        owner = IdempotencyStore()
+        retrier = owner if same_worker else IdempotencyStore()
+        assert await owner.begin(CONVERSATION, KEY, REQUEST) is None
+        retry = asyncio.ensure_future(retrier.begin(CONVERSATION, KEY, REQUEST))
+        await asyncio.sleep(0.05)
+        assert not retry.done()
+        await owner.complete(CONVERSATION, KEY, RESPONSE)
+        return await retry
+
+    assert asyncio.run(run()).response == RESPONSE
+
+
+def test_abandoned_key_is_recomputed_and_same_worker_waiters_see_the_error():
+    async def run() -> None:
+        store = IdempotencyStore()
+        await store.begin(CONVERSATION, KEY, REQUEST)
+        retry = asyncio.ensure_future(store.begin(CONVERSATION, KEY, REQUEST))
+        await asyncio.sleep(0.05)
+        await store.abandon(CONVERSATION, KEY, RuntimeError("llm failed"))
+        with pytest.raises(RuntimeError, match="llm failed"):
+            await retry
+        # A later retry owns the key again
+        assert await store.begin(CONVERSATION, KEY, REQUEST) is None
+
+    asyncio.run(run())
+
+
+def test_retry_attaches_to_the_original_stream():
+    async def run():
+        store = IdempotencyStore()
+        await store.begin(CONVERSATION, KEY, REQUEST)
+        retry = asyncio.ensure_future(IdempotencyStore().begin(CONVERSATION, KEY, REQUEST))
+        await store.attach_stream(CONVERSATION, KEY, "str_1")
+        return await retry
+
+    record = asyncio.run(run())
+    assert (record.stream_id, record.response) == ("str_1", None)
@@ -0,0 +1,43 @@
+"""Opening cache: only the first gate is warmed, by one worker."""
+
+from __future__ import annotations
+
+import asyncio
+
+from src.app.config import settings
+from src.app.database import init_db
+from src.app.gates.registry import current_registry
+from src.app.services import openai_service
+from src.app.services.opening_cache import OpeningCache
+
+
+def test_only_the_first_gate_is_servable():
+    first = current_registry().sequence[0]
+    assert [gate.number for gate, _ in OpeningCache.servable_gates()] == [first]
+
+
+def test_one_worker_warms_and_every_worker_serves(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "opening.db"))
+    monkeypatch.setattr(settings, "opening_cache_enabled", True)
+    calls = []
+
+    async def call_prompt(**kwargs):
+        calls.append(kwargs["prompt_id"])
+        await asyncio.sleep(0.01)
+        return " Which product? "
+
+    monkeypatch.setattr(openai_service, "call_prompt", call_prompt)
+
+    async def run() -> list:
+        await init_db()
+        workers = [OpeningCache(), OpeningCache()]
+        await asyncio.gather(*(w.warm() for w in workers))
+        # The worker that lost the claim picks the stored response up next tick
+        await asyncio.gather(*(w.warm() for w in workers))
+        gate, variables = OpeningCache.servable_gates()[0]
+        history = [{"role": "user", "content": settings.opening_cache_seed_message}]
+        return [w.get_for_start(gate, variables, history) for w in workers]
+
+    served = asyncio.run(run())
+    assert len(calls) == 1
+    assert served == ["Which product?", "Which product?"]
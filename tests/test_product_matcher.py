@@ -0,0 +1,63 @@
+"""Gate 1 answers resolved locally, without the prompt."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.app.config import settings
+from src.app.services.orchestrator import match_product_option
+
+
+def _pick(answer: str):
+    option = match_product_option(answer, settings.product_options)
+    return option["label"] if option is not None else None
+
+
+@pytest.mark.parametrize(
+    ("answer", "expected"),
+    [
+        # Letter keys
+        ("A", "R-Blade"),
+        ("b)", "R-Breeze"),
+        ("option e", "Sky-Tilt"),
+        ("  f.  ", "Kitchens"),
+        ("Z", None),
+        # Exact names in any spelling
+        ("r-blade", "R-Blade"),
+        ("Sky Tilt", "Sky-Tilt"),
+        ("KBANA!", "K-Bana"),
+        ("x blast.", "X-Blast"),
+        # Close misspellings of the whole answer
+        ("r-blaed", "R-Blade"),
+        ("sky tlit", "Sky-Tilt"),
+        ("kitchns", "Kitchens"),
+    ],
+)
+def test_whole_answer_picks(answer, expected):
+    assert _pick(answer) == expected
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        # Ambiguous or unknown
+        "r-b",
+        "r-breade",
+        "pergola",
+        "",
+        # Questions
+        "what is r-blade?",
+        "r-blade?",
+        "which is cheaper, sky tilt or k-bana",
+        # Negations
+        "I do not want sky tilt",
+        "no kbana",
+        "not a",
+        "no, sky tilt",
+        # Longer sentences mentioning a product
+        "the sky tilt please",
+        "r-blade and a kitchen",
+    ],
+)
+def test_anything_but_a_whole_answer_goes_to_the_prompt(answer):
+    assert _pick(answer) is None
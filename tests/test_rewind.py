@@ -0,0 +1,68 @@
+"""Rewinds replay only the gates a changed answer affects; the rest keep their data."""
+
+from __future__ import annotations
+
+import asyncio
+
+from src.app.config import settings
+from src.app.database import init_db
+from src.app.gates.resolvers import QUOTE_SUMMARY_KEY
+from src.app.services import conversation_service as conv_svc
+from src.app.services.orchestrator import orchestrator
+
+PROVIDED = {1: {"product_id": "r_blade"}, 3: {"total_bays": 2}, 4: {"structure_type": "attached"}}
+
+
+def _answer(gate: int, **overrides) -> dict:
+    return {**PROVIDED.get(gate, {}), f"note_{gate}": f"answer {gate}", **overrides}
+
+
+async def _complete_through(last: int):
+    cid = (await conv_svc.create_conversation(1, 1))["conversation_id"]
+    session = await orchestrator.load_session(cid)
+    while True:
+        gate = session.current_gate
+        if gate == last:
+            return cid, session
+        await orchestrator.advance_gate(cid, session, _answer(gate))
+
+
+def _rewind_and_reanswer(tmp_path, monkeypatch, **overrides):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "rewind.db"))
+
+    async def run():
+        await init_db()
+        cid, session = await _complete_through(17)
+        before = dict(session.product_config)
+        await orchestrator.rewind(cid, session, 3)
+        assert "structure_type" not in session.product_config
+        await orchestrator.advance_gate(cid, session, _answer(3, **overrides))
+        return before, session, await orchestrator.load_session(cid)
+
+    return asyncio.run(run())
+
+
+def test_same_answer_keeps_every_later_gate(tmp_path, monkeypatch):
+    before, session, stored = _rewind_and_reanswer(tmp_path, monkeypatch)
+    assert session.current_gate == 17
+    assert session.replay_queue == []
+    assert stored.product_config["structure_type"] == "attached"
+    for gate in (5, 6, 12, 16):
+        assert stored.product_config[f"note_{gate}"] == f"answer {gate}"
+    assert stored.product_config[QUOTE_SUMMARY_KEY] == before[QUOTE_SUMMARY_KEY]
+    # Gates put back can be rewound to again
+    assert orchestrator.can_rewind(stored, 6)
+
+
+def test_changed_answer_replays_only_its_readers(tmp_path, monkeypatch):
+    _, session, stored = _rewind_and_reanswer(tmp_path, monkeypatch, total_bays=3)
+    # Gates 20, 21 and 4 read gate 3's response, 5 reads gate 4's output
+    # and 13 reads total_bays
+    assert session.current_gate == 20
+    assert stored.replay_queue == [21, 4, 5, 13, 17]
+    for gate in (20, 4, 5, 13):
+        assert f"note_{gate}" not in stored.product_config
+    assert "structure_type" not in stored.product_config
+    for gate in (22, 6, 12, 16):
+        assert stored.product_config[f"note_{gate}"] == f"answer {gate}"
+    assert not orchestrator.can_rewind(stored, 13)
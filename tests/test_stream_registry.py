@@ -0,0 +1,100 @@
+"""Resumed stream reads must not lose or repeat events spilled mid-read."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+
+from src.app.config import settings
+from src.app.database import get_db_connection, init_db
+from src.app.services import stream_registry as registry_module
+from src.app.services.stream_registry import TurnStream
+
+BUFFER_SIZE = 4
+EVENTS = 30
+
+
+class _SlowReads:
+    """Connection wrapper whose SELECTs complete only after `release` is set."""
+
+    def __init__(self, db, started: asyncio.Event, release: asyncio.Event) -> None:
+        self._db = db
+        self._started = started
+        self._release = release
+
+    async def execute(self, sql, params=()):
+        if sql.lstrip().upper().startswith("SELECT"):
+            cursor = await self._db.execute(sql, params)
+            rows = await cursor.fetchall()
+            self._started.set()
+            await self._release.wait()
+            return _Rows(rows)
+        return await self._db.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class _Rows:
+    def __init__(self, rows) -> None:
+        self._rows = rows
+
+    async def fetchall(self):
+        return self._rows
+
+
+def test_read_during_spill_returns_every_event_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "streams.db"))
+
+    async def run() -> list[int]:
+        await init_db()
+        started, release = asyncio.Event(), asyncio.Event()
+
+        @contextlib.asynccontextmanager
+        async def slow_connection():
+            async with get_db_connection() as db:
+                yield _SlowReads(db, started, release)
+
+        monkeypatch.setattr(registry_module, "get_db_connection", slow_connection)
+        stream = TurnStream("str_test", "conv_test", BUFFER_SIZE)
+        for i in range(BUFFER_SIZE * 2):
+            await stream.append("chunk", str(i))
+
+        # A resume from the start has to go to the table; the producer keeps
+        # spilling while that read is held open
+        reader = asyncio.ensure_future(stream._read_after(0))
+        await started.wait()
+        for i in range(BUFFER_SIZE * 2, EVENTS):
+            await stream.append("chunk", str(i))
+        release.set()
+        return [seq for seq, _, _ in await reader]
+
+    seqs = asyncio.run(run())
+    assert seqs == list(range(1, EVENTS + 1))
+
+
+def test_another_worker_follows_a_written_through_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "streams.db"))
+    monkeypatch.setattr(settings, "workers", 2)
+    monkeypatch.setattr(settings, "stream_flush_ms", 5)
+    monkeypatch.setattr(settings, "stream_follow_poll_ms", 5)
+
+    async def source():
+        for i in range(EVENTS):
+            await asyncio.sleep(0.001)
+            yield "chunk", str(i)
+
+    async def run() -> tuple[list[int], list[int], object]:
+        await init_db()
+        producer, other = registry_module.StreamRegistry(), registry_module.StreamRegistry()
+        stream = producer.start("conv_test", source())
+        follower = await other.find("conv_test", stream.stream_id, known=True)
+        followed = [seq async for seq, _, _ in follower.events_after(0)]
+        resumed = await other.find("conv_test", stream.stream_id)
+        after = [seq async for seq, _, _ in resumed.events_after(EVENTS - 3)]
+        return followed, after, await other.find("conv_other", stream.stream_id)
+
+    followed, after, foreign = asyncio.run(run())
+    assert followed == list(range(1, EVENTS + 1))
+    assert after == [EVENTS - 2, EVENTS - 1, EVENTS]
+    assert foreign is None
@@ -0,0 +1,33 @@
+"""Detached work gets its own ranked trace, linked to the request that started it."""
+
+from __future__ import annotations
+
+import asyncio
+
+from src.app import tracing
+from src.app.services.stream_registry import StreamRegistry
+from src.app.tracing import finish_trace, slowest_traces, span, start_trace
+
+
+def test_stream_producer_is_traced_and_ranked_after_the_request_ends(monkeypatch):
+    monkeypatch.setattr(tracing, "_slowest", [])
+
+    async def source():
+        await asyncio.sleep(0.01)       # past the end of the request below
+        with span("call_prompt"):
+            yield "chunk", "hello"
+
+    async def run() -> str:
+        request, token = start_trace("POST /messages/stream")
+        request.ranked = False          # an SSE response
+        registry = StreamRegistry()
+        registry.start("conv_test", source())
+        finish_trace(request, token)
+        await asyncio.gather(*registry._tasks)
+        return request.trace_id
+
+    request_id = asyncio.run(run())
+    [turn] = slowest_traces()
+    assert turn.name == "stream turn"
+    assert turn.parent_trace_id == request_id
+    assert [s.name for s in turn.spans] == ["call_prompt"]